@@ -13,6 +13,7 @@ a = Analysis(
     binaries=[],
     datas=[
         ('templates', 'templates'),  # Include HTML templates
+        ('static', 'static'),  # Chart script inlined into the page
     ] + matplotlib_datas,
     hiddenimports=[
         'matplotlib',
@@ -20,6 +21,11 @@ a = Analysis(
         'matplotlib.figure',
         'matplotlib.pyplot',
         'numpy',
+        'stats',
+        'plot_render',
+        'plot_cache',
+        'channel_index',
+        'session',
         'webview',
         'webview.platforms.winforms',
         'webview.platforms.cef',
@@ -1,49 +1,52 @@
 import webview
 import os
+import sys
 import json
+import base64
 from functools import lru_cache
 import threading
-from scan import collect_data_with_test_cycle
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-import io
-import base64
-import numpy as np
+import time
+import uuid
+from scan import iter_channel_summaries, set_execution_mode, RawCurve, channel_metrics, discover_channel_files
+from metrics_cache import get_metrics_cache, clear_metrics_cache
+from metrics import set_operating_points, operating_currents, metrics_signature
+from stats import MetricCube, DriftIndex, chart_payload
+from channel_index import ChannelIndex, DEFAULT_QUERY_LIMIT
+from plot_render import render_board_plot, render_channel_plot, preview_format, EXPORT_FORMATS
+from plot_cache import PlotCache
+from session import save_session, load_session, SESSION_SUFFIX
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 
 # File to store last visited path
 LAST_PATH_FILE = os.path.join(os.path.expanduser('~'), '.test_cycle_analyzer_last_path.json')
 
+# How plots reach the page: 'canvas' sends numeric series drawn in the browser
+# (static/charts.js), 'image' renders matplotlib PNGs on the Python side
+RENDER_MODES = ('canvas', 'image')
+
+# Process pool for background plot rendering - created once, reused across analyses
+_render_executor = None
+_render_workers = 0
+
+
+def _get_render_executor():
+    global _render_executor, _render_workers
+    if _render_executor is None:
+        # Leave a core for the UI and file parsing
+        _render_workers = max(1, min((os.cpu_count() or 2) - 1, 4))
+        _render_executor = ProcessPoolExecutor(max_workers=_render_workers)
+    return _render_executor
+
+# Minimum seconds between analysis progress pushes to the page
+_PROGRESS_INTERVAL = 0.2
+
 # Cache for folder listings: {path: {'items': [...], 'timestamp': float}}
 _folder_cache = {}
 _folder_cache_lock = threading.Lock()
 _FOLDER_CACHE_TTL = 5.0  # seconds
 
 
-def _analyze_single_channel(board, ch, path_list):
-    """
-    Analyze a single channel's data. Returns dict with vf, pf, ith lists.
-    This function is designed to run in a thread pool.
-    """
-    try:
-        temp_summary = collect_data_with_test_cycle(path_list)
-        vf = []
-        pf = []
-        ith = []
-        for test_cycle in range(1, 6):
-            vf.append(temp_summary[test_cycle]["Vf"])
-            pf.append(temp_summary[test_cycle]["Pf"])
-            ith.append(temp_summary[test_cycle]["ith"])
-        return {
-            'vf': vf,
-            'pf': pf,
-            'ith': ith
-        }
-    except Exception as e:
-        print(f"Error analyzing board {board} channel {ch}: {e}")
-        return None
-
-
 class API:
     def __init__(self):
         self.selected_folders = []
@@ -52,10 +55,26 @@ class API:
         self.last_browsed_path = None
         self._current_board = None  # Track currently selected board for plot caching
         # Cache for computed statistics (outlier detection data)
-        self._stats_cache = {}  # {(board, ch): {pf_mean, vf_mean, ith_mean, ...}}
-        self._board_stats_cache = {}  # {board: {pf_mean, vf_mean, ith_mean, pf_std, ...}}
-        self._plot_cache = {}  # {(board, channel_str): base64_image}
+        self._stats_cache = {}  # {(board, ch): {pf_mean, pf_robust_z, is_outlier_pf, is_robust_outlier_pf, ...}}
+        self._board_stats_cache = {}  # {board: {pf_mean, pf_std, pf_median, pf_mad, ...}}
+        self._drift_index = None  # stats.DriftIndex of every channel, rebuilt with the statistics
+        self._channel_index = None  # channel_index.ChannelIndex for query_channels, rebuilt with the statistics
+        self._plot_cache = PlotCache()  # {(board, channel_str): (cache_version, base64_image)}, byte-bounded LRU
+        self._channel_paths = {}  # {(board, ch): {test_cycle: csv_path}} for lazy raw curve loading
+        self.analyzed_folders = []  # Folders of the current analysis, one per test cycle
+        self.test_cycles = []  # [1..N] for the current analysis
+        self._window = None  # pywebview window, used to push live updates to the page
+        self._watch_thread = None
+        self._watch_stop = None
+        self._csv_stats = {}  # CSV stats taken when the current analysis started; watch mode baseline
+        self._job = None  # Current background analysis: {'id', 'cancel', 'state', 'done', 'total', 'result'}
+        self._apply_lock = threading.Lock()  # Serializes swapping a finished job's results in
+        self._generation = 0  # Bumped under _apply_lock whenever results are swapped in
         self._cache_version = 0  # Increment when analyze() is called to invalidate plot cache
+        self._render_mode = 'canvas'
+        self._prerender_futures = {}  # {plot cache key: (cache_version, future)} of background renders
+        self._progressive = True  # Image mode: answer with a quick preview while the full plot renders
+        self._preview_keys = set()  # Plot cache keys shown as a preview, waiting for onPlotReady
         
     def get_initial_path(self):
         """Get the initial path to load"""
@@ -158,13 +177,9 @@ class API:
             return {'success': False, 'error': str(e)}
     
     def select_folder(self, path):
-        """Add a folder to selection"""
+        """Add a folder to selection. Folders are test cycles 1..N in selection order."""
         if path not in self.selected_folders:
-            if len(self.selected_folders) < 5:
-                self.selected_folders.append(path)
-                return {'success': True, 'folders': self.selected_folders}
-            else:
-                return {'success': False, 'error': 'Maximum 5 folders allowed'}
+            self.selected_folders.append(path)
         return {'success': True, 'folders': self.selected_folders}
     
     def remove_folder(self, index):
@@ -181,262 +196,368 @@ class API:
         self.selected_folders = []
         return {'success': True, 'folders': []}
     
-    def _compute_and_cache_statistics(self):
-        """Compute and cache statistics (mean, std, outliers) for all boards and channels."""
-        self._stats_cache = {}
-        self._board_stats_cache = {}
-
-        for board, channels_data in self.boards_data.items():
-            # Compute per-channel means
-            board_channel_means = {}
-            for ch, data in channels_data.items():
-                board_channel_means[ch] = {
-                    'pf': np.mean(data['pf']),
-                    'vf': np.mean(data['vf']),
-                    'ith': np.mean(data['ith'])
-                }
+    def clear_cache(self):
+        """Clear the per-file metrics cache (memory and disk)"""
+        try:
+            clear_metrics_cache()
+            return {'success': True}
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
 
-            # Compute overall stats for this board
-            pf_vals = [m['pf'] for m in board_channel_means.values()]
-            vf_vals = [m['vf'] for m in board_channel_means.values()]
-            ith_vals = [m['ith'] for m in board_channel_means.values()]
-
-            self._board_stats_cache[board] = {
-                'pf_mean': np.mean(pf_vals),
-                'pf_std': np.std(pf_vals),
-                'vf_mean': np.mean(vf_vals),
-                'vf_std': np.std(vf_vals),
-                'ith_mean': np.mean(ith_vals),
-                'ith_std': np.std(ith_vals),
-            }
+    def get_cache_stats(self):
+        """Return metrics cache hit/miss counters"""
+        return {'success': True, 'stats': get_metrics_cache().stats()}
 
-            # Compute outlier flags for each channel
-            outlier_threshold = 2
-            for ch, means in board_channel_means.items():
-                is_outlier_pf = abs(means['pf'] - self._board_stats_cache[board]['pf_mean']) > outlier_threshold * self._board_stats_cache[board]['pf_std']
-                is_outlier_vf = abs(means['vf'] - self._board_stats_cache[board]['vf_mean']) > outlier_threshold * self._board_stats_cache[board]['vf_std']
-                is_outlier_ith = abs(means['ith'] - self._board_stats_cache[board]['ith_mean']) > outlier_threshold * self._board_stats_cache[board]['ith_std']
-                self._stats_cache[(board, ch)] = {
-                    'is_outlier_pf': is_outlier_pf,
-                    'is_outlier_vf': is_outlier_vf,
-                    'is_outlier_ith': is_outlier_ith,
-                }
+    def set_execution_mode(self, mode, workers=None):
+        """Parse with a 'thread' or 'process' pool; workers=None uses the default size"""
+        try:
+            set_execution_mode(mode, int(workers) if workers else None)
+            return {'success': True, 'mode': mode}
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
 
-    def _generate_all_channels_plot(self):
-        """Generate plot with all channels. Uses cached statistics for performance."""
-        current_board = self._current_board or (sorted(self.boards_data.keys())[0] if self.boards_data else None)
-        if current_board is None:
+    def set_operating_points(self, current=7.5, extra=None):
+        """
+        Report Vf/Pf at current (A) plus vf@I/pf@I metrics at each extra current.
+        Takes effect on the next analysis; cached summaries are recomputed.
+        """
+        try:
+            set_operating_points(float(current), [float(c) for c in (extra or [])])
+            return {'success': True, 'currents': list(operating_currents())}
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+
+    def set_render_mode(self, mode, progressive=None):
+        """
+        Draw plots in the browser from numeric series ('canvas') or as matplotlib PNGs ('image').
+        progressive: in image mode, show a low-dpi (or SVG) preview until the full PNG is ready.
+        """
+        if mode not in RENDER_MODES:
+            return {'success': False, 'error': f"Unknown render mode '{mode}', use one of {', '.join(RENDER_MODES)}"}
+        self._render_mode = mode
+        if progressive is not None:
+            self._progressive = bool(progressive)
+        self._start_prerender()
+        return {'success': True, 'mode': mode, 'progressive': self._progressive}
+
+    def configure_plot_cache(self, max_mb=None, spill=None):
+        """
+        Memory budget of the plot cache in MB; with spill=True plots evicted from
+        memory are kept in a temp directory and loaded back when shown again.
+        """
+        try:
+            self._plot_cache.configure(
+                max_bytes=int(float(max_mb) * 1024 * 1024) if max_mb is not None else None,
+                spill=bool(spill) if spill is not None else None,
+            )
+            return {'success': True, 'stats': self._plot_cache.stats()}
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+
+    def get_plot_cache_stats(self):
+        """Hit, miss, eviction and spill counters and the memory/disk size of the plot cache"""
+        return {'success': True, 'stats': self._plot_cache.stats()}
+
+    def _board_series(self, board=None):
+        """Chart payload (stats.chart_payload) of a board, default the current one."""
+        board = board or self._current_board
+        channels_data = self.boards_data.get(board)
+        if channels_data is None:
             return None
+        channel_stats = {ch: self._stats_cache.get((board, ch), {}) for ch in channels_data}
+        return chart_payload(board, channels_data, self.test_cycles,
+                             self._board_stats_cache.get(board, {}), channel_stats)
+
+    def get_board_series(self, board=None):
+        """Numeric series, board statistics and outlier flags of a board for client-side charts"""
+        series = self._board_series(board)
+        if series is None:
+            return {'success': False, 'error': f'Board {board} not found'}
+        return {'success': True, 'series': series}
+
+    def _compute_and_cache_statistics(self, boards=None):
+        """
+        Compute and cache statistics (mean, std, median, MAD, outliers) for all boards and channels,
+        or only for the given boards (entries of other boards are kept).
+        The caches are rebuilt off to the side and swapped in, so concurrent plot calls
+        never see a half-filled cache.
+        """
+        if boards is None:
+            stats_cache = {}
+            board_stats_cache = {}
+        else:
+            boards = set(boards)
+            stats_cache = {key: value for key, value in self._stats_cache.items() if key[0] not in boards}
+            board_stats_cache = {key: value for key, value in self._board_stats_cache.items() if key not in boards}
+            boards = sorted(boards, key=str)
+
+        # Every channel metric of the analyzed boards in one array, solved in one vectorized pass
+        cube = MetricCube(self.boards_data, boards)
+        board_stats, channel_stats = cube.statistics()
+        board_stats_cache.update(board_stats)
+        stats_cache.update(channel_stats)
+
+        # Drift ranking and query indexes always cover the whole lot
+        lot = cube if boards is None else MetricCube(self.boards_data)
+        self._drift_index = DriftIndex(lot)
+        self._channel_index = ChannelIndex(lot, self._drift_index)
+        self._stats_cache = stats_cache
+        self._board_stats_cache = board_stats_cache
+
+    def get_drift_ranking(self, metric='pf', k=20, by='change'):
+        """
+        The k channels of the lot degrading most in metric ('pf', 'vf' or 'ith'), ranked by
+        percent change from the first to the last test cycle ('change') or by slope per cycle ('slope').
+        """
+        if self._drift_index is None:
+            return {'success': False, 'error': 'No analysis results'}
+        try:
+            return {'success': True, 'metric': metric, 'by': by,
+                    'channels': self._drift_index.worst(metric, int(k), by)}
+        except ValueError as e:
+            return {'success': False, 'error': str(e)}
 
-        cache_key = (current_board, 'all')
+    def query_channels(self, where=None, sort=None, descending=False, limit=DEFAULT_QUERY_LIMIT, boards=None):
+        """
+        Channels of every board matching metric predicates, e.g. where=[['pf', '<', 600]],
+        sort='ith', descending=True, limit=20. See channel_index for the fields.
+        """
+        if self._channel_index is None:
+            return {'success': False, 'error': 'No analysis results'}
+        try:
+            total, channels = self._channel_index.query(where, sort, bool(descending),
+                                                        None if limit is None else int(limit), boards)
+            return {'success': True, 'total': total, 'channels': channels}
+        except (ValueError, TypeError) as e:
+            return {'success': False, 'error': str(e)}
+
+    def _render_args(self, key):
+        """(render function, args) for a plot cache key (board, 'all' | str(channel)), or None."""
+        board, view = key
+        channels_data = self.boards_data.get(board)
+        if not channels_data:
+            return None
+        board_stats = self._board_stats_cache.get(board, {})
+        if view == 'all':
+            channel_stats = {ch: self._stats_cache.get((board, ch), {}) for ch in channels_data}
+            return render_board_plot, (self.test_cycles, channels_data, board_stats, channel_stats)
+        channel = int(view)
+        if channel not in channels_data:
+            return None
+        return render_channel_plot, (channel, channels_data[channel], self.test_cycles, board_stats,
+                                     self._stats_cache.get((board, channel), {}))
+
+    def _get_plot(self, key):
+        """
+        Plot for a cache key: from the plot cache, from a background render already
+        in flight, or rendered here. Returns None for an unknown board/channel.
+        """
         cache_ver = self._cache_version
 
         # Check if we have a cached plot
-        cached = self._plot_cache.get(cache_key)
+        cached = self._plot_cache.get(key)
         if cached is not None and cached[0] == cache_ver:
             return cached[1]
 
-        test_cycles = [1, 2, 3, 4, 5]
-        fig, axs = plt.subplots(3, 1, figsize=(10, 14))
-
-        # Use cached statistics
-        board_stats = self._board_stats_cache.get(current_board, {})
-        overall_mean_pf = board_stats.get('pf_mean', 0)
-        overall_std_pf = board_stats.get('pf_std', 0)
-        overall_mean_vf = board_stats.get('vf_mean', 0)
-        overall_std_vf = board_stats.get('vf_std', 0)
-        overall_mean_ith = board_stats.get('ith_mean', 0)
-        overall_std_ith = board_stats.get('ith_std', 0)
-        
-        # Plot Pf
-        axs[0].set_title(f'Pf over Test (Mean: {overall_mean_pf:.2f} ± {overall_std_pf:.2f})')
-        axs[0].set_xlabel('Test Cycle')
-        axs[0].set_ylabel('Pf')
-        axs[0].set_xlim(0.5, 5.5)
-        axs[0].grid(True, alpha=0.3)
-        axs[0].axhline(y=overall_mean_pf, color='red', linestyle='--', alpha=0.5, label='Overall Mean')
-        axs[0].axhline(y=overall_mean_pf + 2*overall_std_pf, color='orange', linestyle=':', alpha=0.5, label='±2σ')
-        axs[0].axhline(y=overall_mean_pf - 2*overall_std_pf, color='orange', linestyle=':', alpha=0.5)
-        
-        # Plot Vf
-        axs[1].set_title(f'Vf over Test (Mean: {overall_mean_vf:.2f} ± {overall_std_vf:.2f})')
-        axs[1].set_xlabel('Test Cycle')
-        axs[1].set_ylabel('Vf')
-        axs[1].set_xlim(0.5, 5.5)
-        axs[1].grid(True, alpha=0.3)
-        axs[1].axhline(y=overall_mean_vf, color='red', linestyle='--', alpha=0.5, label='Overall Mean')
-        axs[1].axhline(y=overall_mean_vf + 2*overall_std_vf, color='orange', linestyle=':', alpha=0.5, label='±2σ')
-        axs[1].axhline(y=overall_mean_vf - 2*overall_std_vf, color='orange', linestyle=':', alpha=0.5)
-        
-        # Plot Ith
-        axs[2].set_title(f'Ith over Test (Mean: {overall_mean_ith:.2f} ± {overall_std_ith:.2f})')
-        axs[2].set_xlabel('Test Cycle')
-        axs[2].set_ylabel('Ith')
-        axs[2].set_xlim(0.5, 5.5)
-        axs[2].grid(True, alpha=0.3)
-        axs[2].axhline(y=overall_mean_ith, color='red', linestyle='--', alpha=0.5, label='Overall Mean')
-        axs[2].axhline(y=overall_mean_ith + 2*overall_std_ith, color='orange', linestyle=':', alpha=0.5, label='±2σ')
-        axs[2].axhline(y=overall_mean_ith - 2*overall_std_ith, color='orange', linestyle=':', alpha=0.5)
-        
-        # Plot each channel
-        for ch in sorted(self.channels_data.keys()):
-            data = self.channels_data[ch]
-
-            # Use cached outlier flags
-            ch_stats = self._stats_cache.get((current_board, ch), {})
-            is_outlier_pf = ch_stats.get('is_outlier_pf', False)
-            is_outlier_vf = ch_stats.get('is_outlier_vf', False)
-            is_outlier_ith = ch_stats.get('is_outlier_ith', False)
-            
-            # Only show label for outliers
-            label_pf = f'Channel {ch} (outlier)' if is_outlier_pf else None
-            label_vf = f'Channel {ch} (outlier)' if is_outlier_vf else None
-            label_ith = f'Channel {ch} (outlier)' if is_outlier_ith else None
-            
-            line_style = '-' if not is_outlier_pf else '--'
-            line_width = 2 if not is_outlier_pf else 3
-            axs[0].plot(test_cycles, data['pf'], marker='o', label=label_pf, 
-                       linewidth=line_width, linestyle=line_style, 
-                       markeredgewidth=2 if is_outlier_pf else 1,
-                       markeredgecolor='red' if is_outlier_pf else None)
-            
-            line_style = '-' if not is_outlier_vf else '--'
-            line_width = 2 if not is_outlier_vf else 3
-            axs[1].plot(test_cycles, data['vf'], marker='o', label=label_vf, 
-                       linewidth=line_width, linestyle=line_style,
-                       markeredgewidth=2 if is_outlier_vf else 1,
-                       markeredgecolor='red' if is_outlier_vf else None)
-            
-            line_style = '-' if not is_outlier_ith else '--'
-            line_width = 2 if not is_outlier_ith else 3
-            axs[2].plot(test_cycles, data['ith'], marker='o', label=label_ith, 
-                       linewidth=line_width, linestyle=line_style,
-                       markeredgewidth=2 if is_outlier_ith else 1,
-                       markeredgecolor='red' if is_outlier_ith else None)
-        
-        axs[0].legend(loc='best', fontsize=8)
-        axs[1].legend(loc='best', fontsize=8)
-        axs[2].legend(loc='best', fontsize=8)
-        
-        plt.tight_layout()
-
-        buffer = io.BytesIO()
-        plt.savefig(buffer, format='png', dpi=120)
-        buffer.seek(0)
-        image_base64 = base64.b64encode(buffer.read()).decode()
-        plt.close(fig)
-
+        pending = self._prerender_futures.get(key)
+        if pending is not None and pending[0] == cache_ver:
+            try:
+                image = pending[1].result()
+                self._plot_cache[key] = (cache_ver, image)
+                return image
+            except Exception as e:
+                print(f"Background render of {key} failed, rendering again: {e}")
+
+        render = self._render_args(key)
+        if render is None:
+            return None
+        func, args = render
+        image = func(*args)
         # Cache the plot
-        self._plot_cache[cache_key] = (cache_ver, f'data:image/png;base64,{image_base64}')
+        self._plot_cache[key] = (cache_ver, image)
+        return image
+
+    def _submit_render(self, key, cache_ver):
+        """
+        Render a plot on the render process pool. The result goes into the plot
+        cache and, if the page shows a preview of it, to onPlotReady. Returns the
+        future, or None for an unknown board/channel or a shut down pool.
+        """
+        render = self._render_args(key)
+        if render is None:
+            return None
+        try:
+            future = _get_render_executor().submit(render[0], *render[1])
+        except RuntimeError:
+            return None  # pool shut down (interpreter exiting)
+        self._prerender_futures[key] = (cache_ver, future)
+        future.add_done_callback(lambda f: self._on_render_done(key, cache_ver, f))
+        return future
+
+    def _on_render_done(self, key, cache_ver, future):
+        # Not registered any more: the board's data changed (watch mode) while rendering
+        if self._prerender_futures.get(key, (None, None))[1] is not future:
+            return
+        self._prerender_futures.pop(key, None)
+        if future.cancelled():
+            return
+        try:
+            image = future.result()
+        except Exception as e:
+            print(f"Background render of {key} failed: {e}")
+            return
+        if self._cache_version != cache_ver:
+            return
+        self._plot_cache[key] = (cache_ver, image)
+        if key in self._preview_keys:
+            self._preview_keys.discard(key)
+            self._push_js('onPlotReady', {'board': key[0], 'channel': key[1], 'plot': image})
+
+    def _plot_view(self, key):
+        """
+        {'plot': data URL} of a plot cache key. With progressive plots and no full
+        render cached yet, the plot is a quick preview ('preview': True) and the
+        full PNG follows through onPlotReady. None for an unknown board/channel.
+        """
+        cache_ver = self._cache_version
+        cached = self._plot_cache.get(key)
+        if cached is not None and cached[0] == cache_ver:
+            return {'plot': cached[1]}
+        render = self._render_args(key)
+        if render is None:
+            return None
+        if not self._progressive or self._window is None:
+            return {'plot': self._get_plot(key)}
+
+        self._preview_keys.add(key)
+        pending = self._prerender_futures.get(key)
+        if (pending is None or pending[0] != cache_ver) and self._submit_render(key, cache_ver) is None:
+            self._preview_keys.discard(key)
+            return {'plot': self._get_plot(key)}
+        func, args = render
+        points = len(self.test_cycles) * (len(self.boards_data[key[0]]) if key[1] == 'all' else 1)
+        dpi, fmt = preview_format(points)
+        preview = func(*args, dpi=dpi, fmt=fmt)
+        # The full render may have finished while the preview was drawn
+        cached = self._plot_cache.get(key)
+        if cached is not None and cached[0] == cache_ver:
+            self._preview_keys.discard(key)
+            return {'plot': cached[1]}
+        return {'plot': preview, 'preview': True}
+
+    def export_plot(self, channel='all', fmt='png', path=None, board=None):
+        """
+        Save a plot of the current (or given) board as PNG, SVG or lossless WebP.
+        Without a path a save dialog is shown; with neither a path nor a window
+        the image is returned as a data URL.
+        """
+        try:
+            if fmt not in EXPORT_FORMATS:
+                return {'success': False, 'error': f"Unknown format '{fmt}', use one of {', '.join(EXPORT_FORMATS)}"}
+            board = board or self._current_board
+            key = (board, 'all' if channel == 'all' else str(int(channel)))
+            render = self._render_args(key)
+            if render is None:
+                return {'success': False, 'error': f'Plot {board}/{channel} not found'}
+            func, args = render
+            image = func(*args, fmt=fmt)
+            if path is None and self._window is not None:
+                name = f'board_{board}_{key[1]}.{fmt}'
+                chosen = self._window.create_file_dialog(webview.SAVE_DIALOG, save_filename=name)
+                if not chosen:
+                    return {'success': False, 'error': 'Export cancelled'}
+                path = chosen if isinstance(chosen, str) else chosen[0]
+            if path is None:
+                return {'success': True, 'plot': image}
+            with open(path, 'wb') as f:
+                f.write(base64.b64decode(image.split(',', 1)[1]))
+            return {'success': True, 'path': path}
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
 
-        return f'data:image/png;base64,{image_base64}'
+    def _generate_all_channels_plot(self):
+        """Plot view (see _plot_view) with all channels of the current board. Uses cached statistics for performance."""
+        current_board = self._current_board or (sorted(self.boards_data.keys())[0] if self.boards_data else None)
+        if current_board is None:
+            return None
+        return self._plot_view((current_board, 'all'))
 
     def _generate_single_channel_plot(self, channel):
-        """Generate plot for a single channel. Uses cached statistics for performance."""
+        """Plot view (see _plot_view) for a single channel of the current board. Uses cached statistics for performance."""
         if channel not in self.channels_data:
             return None
-
         current_board = self._current_board or (sorted(self.boards_data.keys())[0] if self.boards_data else None)
         if current_board is None:
             return None
-
-        cache_key = (current_board, str(channel))
+        return self._plot_view((current_board, str(channel)))
+
+    def _start_prerender(self):
+        """
+        Render every board's 'all' plot and every channel plot that isn't cached yet
+        on the render process pool. Each board is queued 'all' view first; the
+        current board goes first, then the boards after it in dropdown order. The
+        order follows board switches made while rendering. A newer analysis stops it.
+        """
+        if self._render_mode != 'image' or not self.boards_data:
+            return
         cache_ver = self._cache_version
+        boards = sorted(self.boards_data)
+        queues = {
+            board: deque([(board, 'all')] + [(board, str(ch)) for ch in sorted(self.boards_data[board])])
+            for board in boards
+        }
+        threading.Thread(target=self._prerender_loop, args=(cache_ver, boards, queues), daemon=True).start()
+
+    def _prerender_loop(self, cache_ver, boards, queues):
+        def next_key():
+            current = self._current_board
+            start = boards.index(current) if current in boards else 0
+            for board in boards[start:] + boards[:start]:
+                queue = queues[board]
+                while queue:
+                    key = queue.popleft()
+                    pending = self._prerender_futures.get(key)
+                    if pending is not None and pending[0] == cache_ver:
+                        continue  # already rendering for a preview
+                    if self._plot_cache.version(key) != cache_ver:
+                        return key
+            return None
 
-        # Check if we have a cached plot
-        cached = self._plot_cache.get(cache_key)
-        if cached is not None and cached[0] == cache_ver:
-            return cached[1]
-
-        data = self.channels_data[channel]
-        test_cycles = [1, 2, 3, 4, 5]
-        fig, axs = plt.subplots(3, 1, figsize=(8, 12))
-
-        # Use cached statistics
-        board_stats = self._board_stats_cache.get(current_board, {})
-        overall_mean_pf = board_stats.get('pf_mean', 0)
-        overall_std_pf = board_stats.get('pf_std', 0)
-        overall_mean_vf = board_stats.get('vf_mean', 0)
-        overall_std_vf = board_stats.get('vf_std', 0)
-        overall_mean_ith = board_stats.get('ith_mean', 0)
-        overall_std_ith = board_stats.get('ith_std', 0)
-
-        # Use cached outlier flags
-        ch_stats = self._stats_cache.get((current_board, channel), {})
-        is_outlier_pf = ch_stats.get('is_outlier_pf', False)
-        is_outlier_vf = ch_stats.get('is_outlier_vf', False)
-        is_outlier_ith = ch_stats.get('is_outlier_ith', False)
-
-        # Plot Pf
-        title_suffix_pf = " ⚠️ OUTLIER" if is_outlier_pf else ""
-        axs[0].set_title(f'Pf over Test Cycles - Channel {channel}{title_suffix_pf}')
-        axs[0].set_xlabel('Test Cycle')
-        axs[0].set_ylabel('Pf')
-        axs[0].axhline(y=overall_mean_pf, color='red', linestyle='--', alpha=0.5, label='Overall Mean')
-        axs[0].axhline(y=overall_mean_pf + 2*overall_std_pf, color='orange', linestyle=':', alpha=0.5, label='±2σ')
-        axs[0].axhline(y=overall_mean_pf - 2*overall_std_pf, color='orange', linestyle=':', alpha=0.5)
-        axs[0].plot(test_cycles, data['pf'], marker='o', linewidth=2, color='#667eea',
-                   markeredgewidth=2 if is_outlier_pf else 1,
-                   markeredgecolor='red' if is_outlier_pf else None, markersize=8)
-        axs[0].grid(True, alpha=0.3)
-        axs[0].legend(loc='best')
-
-        # Plot Vf
-        title_suffix_vf = " ⚠️ OUTLIER" if is_outlier_vf else ""
-        axs[1].set_title(f'Vf over Test Cycles - Channel {channel}{title_suffix_vf}')
-        axs[1].set_xlabel('Test Cycle')
-        axs[1].set_ylabel('Vf')
-        axs[1].axhline(y=overall_mean_vf, color='red', linestyle='--', alpha=0.5, label='Overall Mean')
-        axs[1].axhline(y=overall_mean_vf + 2*overall_std_vf, color='orange', linestyle=':', alpha=0.5, label='±2σ')
-        axs[1].axhline(y=overall_mean_vf - 2*overall_std_vf, color='orange', linestyle=':', alpha=0.5)
-        axs[1].plot(test_cycles, data['vf'], marker='o', linewidth=2, color='#764ba2',
-                   markeredgewidth=2 if is_outlier_vf else 1,
-                   markeredgecolor='red' if is_outlier_vf else None, markersize=8)
-        axs[1].grid(True, alpha=0.3)
-        axs[1].legend(loc='best')
-
-        # Plot Ith
-        title_suffix_ith = " ⚠️ OUTLIER" if is_outlier_ith else ""
-        axs[2].set_title(f'Ith over Test Cycles - Channel {channel}{title_suffix_ith}')
-        axs[2].set_xlabel('Test Cycle')
-        axs[2].set_ylabel('Ith')
-        axs[2].axhline(y=overall_mean_ith, color='red', linestyle='--', alpha=0.5, label='Overall Mean')
-        axs[2].axhline(y=overall_mean_ith + 2*overall_std_ith, color='orange', linestyle=':', alpha=0.5, label='±2σ')
-        axs[2].axhline(y=overall_mean_ith - 2*overall_std_ith, color='orange', linestyle=':', alpha=0.5)
-        axs[2].plot(test_cycles, data['ith'], marker='o', linewidth=2, color='#f093fb',
-                   markeredgewidth=2 if is_outlier_ith else 1,
-                   markeredgecolor='red' if is_outlier_ith else None, markersize=8)
-        axs[2].grid(True, alpha=0.3)
-        axs[2].legend(loc='best')
-
-        plt.tight_layout()
-
-        buffer = io.BytesIO()
-        plt.savefig(buffer, format='png', dpi=120)
-        buffer.seek(0)
-        image_base64 = base64.b64encode(buffer.read()).decode()
-        plt.close(fig)
-
-        # Cache the plot
-        self._plot_cache[cache_key] = (cache_ver, f'data:image/png;base64,{image_base64}')
+        executor = _get_render_executor()
+        in_flight = {}  # {future: key}
+        while self._cache_version == cache_ver:
+            while len(in_flight) < _render_workers * 2:
+                key = next_key()
+                if key is None:
+                    break
+                future = self._submit_render(key, cache_ver)
+                if future is not None:
+                    in_flight[future] = key
+            if not in_flight:
+                break
+            # Results are stored by _on_render_done
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                in_flight.pop(future)
+        # Superseded by a newer analysis: drop what hasn't started yet
+        for future in in_flight:
+            future.cancel()
 
-        return f'data:image/png;base64,{image_base64}'
-    
     def plot_channel(self, channel):
         """Generate plot for a specific channel or all channels"""
         try:
+            if self._render_mode == 'canvas':
+                if channel != 'all' and int(channel) not in self.channels_data:
+                    return {'success': False, 'error': f'Channel {channel} not found'}
+                return {'success': True, 'series': self._board_series(), 'channel': channel}
             if channel == 'all':
-                plot_image = self._generate_all_channels_plot()
+                view = self._generate_all_channels_plot()
             else:
-                plot_image = self._generate_single_channel_plot(int(channel))
-                if plot_image is None:
+                view = self._generate_single_channel_plot(int(channel))
+                if view is None:
                     return {'success': False, 'error': f'Channel {channel} not found'}
             
-            return {
-                'success': True,
-                'plot': plot_image,
-                'channel': channel
-            }
+            return dict(view or {'plot': None}, success=True, channel=channel)
         except Exception as e:
             import traceback
             return {'success': False, 'error': f'{str(e)}\n{traceback.format_exc()}'}
@@ -454,140 +575,563 @@ class API:
             # Update current channels_data to selected board
             self.channels_data = self.boards_data[board]
 
-            # Generate plot for all channels of this board
-            plot_image = self._generate_all_channels_plot()
-
-            return {
+            result = {
                 'success': True,
-                'plot': plot_image,
                 'channels': list(self.channels_data.keys()),
                 'currentBoard': board
             }
+            result.update(self._board_view())
+            return result
         except Exception as e:
             import traceback
             return {'success': False, 'error': f'{str(e)}\n{traceback.format_exc()}'}
     
-    def analyze(self):
-        """Analyze the selected folders. Uses parallel processing for channels."""
-        folders = self.selected_folders
-
-        if len(folders) != 5:
-            return {'success': False, 'error': 'Need exactly 5 folders'}
-
+    def _board_view(self):
+        """All-channels view of the current board: {'series': ...} in canvas mode, else a plot view (see _plot_view)."""
+        if self._render_mode == 'canvas':
+            return {'series': self._board_series()}
+        return self._generate_all_channels_plot() or {'plot': None}
+
+    def _push_js(self, function, payload):
+        """Call a JS function on the page with a JSON payload (no-op without a window)."""
+        window = self._window
+        if window is None:
+            return
         try:
-            board_ch_csv_list = {}  # {board: {ch: [csv_paths]}}
-            for test_cycle in range(1, 6):
-                folder_path = folders[test_cycle - 1]
-                subfolder = os.path.join(folder_path, f"{os.path.basename(folder_path)}-1")
-
-                if not os.path.exists(subfolder):
-                    return {
-                        'success': False,
-                        'error': f'Subfolder {subfolder} not found for Test Cycle {test_cycle}'
-                    }
+            window.evaluate_js(f'{function}({json.dumps(payload)})')
+        except Exception as e:
+            print(f"Error pushing {function} to page: {e}")
 
-                csv_files = [f for f in os.listdir(subfolder) if f.endswith('.csv')]
-                if not csv_files:
-                    return {
-                        'success': False,
-                        'error': f'No CSV files found in {subfolder}'
-                    }
+    def _scan_csv_stats(self, folders=None):
+        """{csv_path: (size, mtime_ns)} for every CSV in the given (default: analyzed) test cycle folders."""
+        stats = {}
+        for folder_path in (self.analyzed_folders if folders is None else folders):
+            subfolder = os.path.join(folder_path, f"{os.path.basename(os.path.normpath(folder_path))}-1")
+            try:
+                with os.scandir(subfolder) as entries:
+                    for entry in entries:
+                        if entry.name.endswith('.csv'):
+                            try:
+                                st = entry.stat()
+                                stats[entry.path] = (st.st_size, st.st_mtime_ns)
+                            except OSError:
+                                pass
+            except OSError as e:
+                print(f"[watch] Cannot list {subfolder}: {e}")
+        return stats
+
+    def start_watch(self, interval=2.0):
+        """
+        Poll the analyzed folders and re-analyze only new or changed CSVs.
+        A file is picked up once its size and mtime are unchanged for one poll
+        interval, so files still being written by the tester are not parsed early.
+        Updates are pushed to the page via onLiveUpdate(payload).
+        """
+        if not self.analyzed_folders:
+            return {'success': False, 'error': 'Run an analysis before starting watch mode'}
+        if self._watch_thread is not None and self._watch_thread.is_alive():
+            return {'success': True, 'watching': True}
+
+        self._watch_stop = threading.Event()
+        self._watch_thread = threading.Thread(
+            target=self._watch_loop, args=(max(float(interval), 0.2), self._watch_stop), daemon=True
+        )
+        self._watch_thread.start()
+        return {'success': True, 'watching': True}
+
+    def stop_watch(self):
+        """Stop watch mode"""
+        if self._watch_stop is not None:
+            self._watch_stop.set()
+        self._watch_thread = None
+        return {'success': True, 'watching': False}
+
+    def _watch_loop(self, interval, stop_event):
+        processed = dict(self._csv_stats)  # state already reflected in boards_data
+        last_seen = dict(processed)
+        while not stop_event.wait(interval):
+            current = self._scan_csv_stats()
+            settled = [path for path, st in current.items()
+                       if processed.get(path) != st and last_seen.get(path) == st]
+            last_seen = current
+            if not settled or stop_event.is_set():
+                continue
+            generation = self._generation
+            try:
+                payload = self._apply_live_changes(settled, stop_event)
+            except Exception as e:
+                print(f"[watch] Error applying changes: {e}")
+                continue
+            if payload is None and self._generation != generation:
+                # Dropped: newer results were applied meanwhile; look at these files again next poll
+                continue
+            for path in settled:
+                processed[path] = current[path]
+            if payload is not None:
+                self._push_js('onLiveUpdate', payload)
+
+    def _apply_live_changes(self, changed_paths, stop_event=None):
+        """
+        Re-read the channels owning changed_paths and update boards_data, the stats
+        of affected boards and only those boards' plot cache entries.
+        Returns the payload for the page, or None if nothing changed. The update is
+        dropped (None) if stop_event is set or other results were applied while reading.
+        """
+        generation = self._generation
+        board_ch_csv_list = discover_channel_files(self.analyzed_folders)
+        path_owner = {
+            path: (board, ch)
+            for board, channels in board_ch_csv_list.items()
+            for ch, path_list in channels.items()
+            for path in path_list.values()
+        }
+        affected = sorted({path_owner[path] for path in changed_paths if path in path_owner})
+        if not affected:
+            return None
 
-                for ch_csv in csv_files:
-                    try:
-                        # Extract board (as string)
-                        board = ch_csv.split("_")[0][5:]
-                        # Extract channel number
-                        ch = int((ch_csv.split("_")[-1].split(".")[0])[2:])
-
-                        if board not in board_ch_csv_list:
-                            board_ch_csv_list[board] = {}
-                        if ch not in board_ch_csv_list[board]:
-                            board_ch_csv_list[board][ch] = [None]
-                        board_ch_csv_list[board][ch].append(os.path.join(subfolder, ch_csv))
-                    except (ValueError, IndexError) as e:
-                        print(f"Warning: Skipping invalid CSV filename: {ch_csv}")
-                        continue
+        tasks = [(board, ch, board_ch_csv_list[board][ch]) for board, ch in affected]
+        boards_data = {board: dict(channels) for board, channels in self.boards_data.items()}
+        channel_paths = {}
+        updated = []
+        for board, ch, temp_summary, error in iter_channel_summaries(tasks, self.test_cycles):
+            channel_paths[(board, ch)] = dict(board_ch_csv_list[board][ch])
+            if temp_summary is None:
+                # Still incomplete (e.g. a later cycle not written yet) - keep previous data if any
+                continue
+            boards_data.setdefault(board, {})[ch] = channel_metrics(temp_summary)
+            updated.append((board, ch))
+        get_metrics_cache().flush()
+
+        with self._apply_lock:
+            if (stop_event is not None and stop_event.is_set()) or self._generation != generation:
+                return None
+            self._channel_paths.update(channel_paths)
+            if not updated:
+                return None
+            self._generation += 1
+            updated_boards = sorted({board for board, _ in updated})
+            self.boards_data = boards_data
+            self._compute_and_cache_statistics(updated_boards)
+
+            # Board statistics changed, so every cached plot of an updated board is stale
+            for key in [key for key in list(self._plot_cache) if key[0] in updated_boards]:
+                self._plot_cache.pop(key, None)
+            for key in [key for key in list(self._prerender_futures) if key[0] in updated_boards]:
+                self._prerender_futures.pop(key, None)
+            self._start_prerender()
+
+            current_board = self._current_board
+            if current_board in self.boards_data:
+                self.channels_data = self.boards_data[current_board]
 
-            # Collect data for all boards and channels using parallel processing
-            self.boards_data = {}
-            skipped_channels = []  # Track skipped channels
-
-            # Build list of all (board, ch, path_list) tuples for parallel processing
-            all_channel_tasks = []
-            for board in sorted(board_ch_csv_list.keys()):
-                for ch in sorted(board_ch_csv_list[board].keys()):
-                    all_channel_tasks.append((board, ch, {i: board_ch_csv_list[board][ch][i] for i in range(1, 6)}))
-
-            # Process channels in parallel using ThreadPoolExecutor
-            from concurrent.futures import ThreadPoolExecutor, as_completed
-            import os as _os
-            max_workers = min(_os.cpu_count() or 4, 8)
-            with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                future_to_task = {
-                    executor.submit(_analyze_single_channel, board, ch, path_list): (board, ch)
-                    for board, ch, path_list in all_channel_tasks
+        return {
+            'boards': list(self.boards_data.keys()),
+            'updatedBoards': updated_boards,
+            'updatedChannels': [[board, ch] for board, ch in updated],
+            'currentBoard': current_board,
+            'channels': list(self.channels_data.keys()),
+        }
+
+    def get_raw_curve(self, board, channel, test_cycle=None):
+        """Load the raw Cur/Power/Voltage sweep of one channel (all cycles, or one) for LIV plots"""
+        try:
+            path_list = self._channel_paths.get((board, int(channel)))
+            if path_list is None:
+                return {'success': False, 'error': f'Board {board} Channel {channel} not found'}
+            cycles = [int(test_cycle)] if test_cycle is not None else sorted(path_list)
+            curves = {}
+            for tc in cycles:
+                raw = RawCurve(path_list[tc], tc).load()
+                curves[tc] = {
+                    'cur': [float(x) for x in raw['Cur']],
+                    'power': [float(x) for x in raw['Power']],
+                    'voltage': [float(x) for x in raw['Voltage']],
+                    'date': raw['date'],
                 }
+            return {'success': True, 'board': board, 'channel': int(channel), 'curves': curves}
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+
+    def analyze(self, background=True):
+        """
+        Analyze the selected folders (one per test cycle) in a background job.
+        Returns {'success': True, 'jobId': ...} right away. Progress and finished
+        channels are pushed to the page via onAnalysisProgress(payload), the final
+        result via onAnalysisDone(result). A job that is still running is cancelled.
+        background=False runs the analysis in the calling thread and returns its result.
+        """
+        folders = list(self.selected_folders)
+
+        if not folders:
+            return {'success': False, 'error': 'Select at least one test cycle folder'}
+
+        # A new analysis replaces the watched folder set and any running job
+        self.stop_watch()
+        self.cancel_analysis()
+
+        job = {'id': uuid.uuid4().hex[:12], 'cancel': threading.Event(), 'state': 'running',
+               'done': 0, 'total': 0, 'result': None}
+        self._job = job
+        if not background:
+            return self._run_analysis(job, folders)
+        threading.Thread(target=self._run_analysis, args=(job, folders), daemon=True).start()
+        return {'success': True, 'jobId': job['id']}
+
+    def cancel_analysis(self, job_id=None):
+        """Cancel the running analysis job (or only job_id); its pending file reads are dropped"""
+        # Under the apply lock: a job is either cancelled before its results are swapped in or not at all
+        with self._apply_lock:
+            job = self._job
+            if job is None or job['state'] != 'running' or (job_id is not None and job['id'] != job_id):
+                return {'success': False, 'error': 'No running analysis'}
+            job['cancel'].set()
+        return {'success': True, 'jobId': job['id']}
+
+    def get_analysis_status(self, job_id=None):
+        """State of the current analysis job: running/done/failed/cancelled, progress and final result"""
+        job = self._job
+        if job is None or (job_id is not None and job['id'] != job_id):
+            return {'success': False, 'error': 'Unknown analysis job'}
+        return {'success': True, 'jobId': job['id'], 'state': job['state'],
+                'done': job['done'], 'total': job['total'], 'result': job['result']}
+
+    def _run_analysis(self, job, folders):
+        """Job body: run the analysis, record the outcome on the job and push it to the page."""
+        try:
+            result = self._analyze_folders(job, folders)
+        except Exception as e:
+            import traceback
+            result = {'success': False, 'error': f'{str(e)}\n{traceback.format_exc()}'}
+        with self._apply_lock:
+            # Still running unless _analyze_folders settled it when swapping the results in
+            if job['state'] == 'running':
+                if job['cancel'].is_set():
+                    result = {'success': False, 'cancelled': True, 'error': 'Analysis cancelled'}
+                    job['state'] = 'cancelled'
+                else:
+                    job['state'] = 'done' if result['success'] else 'failed'
+        result['jobId'] = job['id']
+        job['result'] = result
+        self._push_js('onAnalysisDone', result)
+        return result
+
+    def _analyze_folders(self, job, folders):
+        """Read every channel of folders through one bounded work queue. State is only replaced if not cancelled."""
+        csv_stats = self._scan_csv_stats(folders)
+        try:
+            board_ch_csv_list = discover_channel_files(folders)  # {board: {ch: {test_cycle: path}}}
+        except FileNotFoundError as e:
+            return {'success': False, 'error': str(e)}
 
-                for future in as_completed(future_to_task):
-                    board, ch = future_to_task[future]
-                    try:
-                        result_data = future.result()
-                        if result_data is not None:
-                            if board not in self.boards_data:
-                                self.boards_data[board] = {}
-                            self.boards_data[board][ch] = result_data
-                        else:
-                            skipped_channels.append(f'Board {board} - Channel {ch}: parse error')
-                    except Exception as e:
-                        skipped_channels.append(f'Board {board} - Channel {ch}: {str(e)}')
-                        print(f"Warning: Skipping Board {board} - Channel {ch} due to error: {str(e)}")
-
-            # Remove empty boards (all channels failed)
-            self.boards_data = {board: channels for board, channels in self.boards_data.items() if channels}
-
-            if not self.boards_data:
-                return {
-                    'success': False,
-                    'error': f'No valid data found. Skipped channels:\n' + '\n'.join(skipped_channels[:10])
+        test_cycles = list(range(1, len(folders) + 1))
+
+        # Build list of all (board, ch, path_list) tuples for parallel processing
+        all_channel_tasks = []
+        for board in sorted(board_ch_csv_list.keys()):
+            for ch in sorted(board_ch_csv_list[board].keys()):
+                all_channel_tasks.append((board, ch, board_ch_csv_list[board][ch]))
+
+        boards_data = {}
+        skipped_channels = []  # Track skipped channels
+        remaining = {board: len(channels) for board, channels in board_ch_csv_list.items()}
+        job['total'] = len(all_channel_tasks)
+        completed, completed_boards = [], []
+        last_push = 0.0
+
+        # Every file read goes through one bounded queue; channels are aggregated as they complete
+        for board, ch, temp_summary, error in iter_channel_summaries(all_channel_tasks, test_cycles, job['cancel']):
+            job['done'] += 1
+            remaining[board] -= 1
+            if remaining[board] == 0:
+                completed_boards.append(board)
+            if temp_summary is None:
+                skipped_channels.append(f'Board {board} - Channel {ch}: {error}')
+                print(f"Warning: Skipping Board {board} - Channel {ch} due to error: {error}")
+            else:
+                boards_data.setdefault(board, {})[ch] = channel_metrics(temp_summary)
+                completed.append([board, ch])
+
+            now = time.monotonic()
+            if now - last_push >= _PROGRESS_INTERVAL or job['done'] == job['total']:
+                last_push = now
+                self._push_js('onAnalysisProgress', {
+                    'jobId': job['id'],
+                    'done': job['done'],
+                    'total': job['total'],
+                    'skipped': len(skipped_channels),
+                    'completedChannels': completed,
+                    'completedBoards': completed_boards,
+                })
+                completed, completed_boards = [], []
+        # Persist newly parsed per-file metrics, also for a cancelled or failed analysis
+        get_metrics_cache().flush()
+
+        # Cancelled or applied is decided here, under the same lock cancel_analysis() takes
+        with self._apply_lock:
+            if job['cancel'].is_set():
+                job['state'] = 'cancelled'
+                return {'success': False, 'cancelled': True, 'error': 'Analysis cancelled'}
+            self.boards_data = boards_data
+            # Only summaries are kept; raw sweeps are re-read on demand via get_raw_curve()
+            self._channel_paths = {(board, ch): dict(path_list) for board, ch, path_list in all_channel_tasks}
+            self.analyzed_folders = list(folders)
+            self.test_cycles = test_cycles
+            self._csv_stats = csv_stats
+            error = self._apply_analysis(skipped_channels)
+            job['state'] = 'failed' if error else 'done'
+        return error or self._finish_analysis(skipped_channels)
+
+    def _analysis_view(self):
+        """Boards, channels and the current board's all-channels view of the current analysis."""
+        result = {
+            'success': True,
+            'boards': list(self.boards_data.keys()),
+            'channels': list(self.channels_data.keys()),
+            'currentBoard': self._current_board,
+            'testCycles': len(self.test_cycles)
+        }
+        result.update(self._board_view())
+        return result
+
+    def get_current_view(self):
+        """The current analysis as returned by analyze(), e.g. for a page (re)loaded after a session was opened"""
+        if not self.boards_data:
+            return {'success': False, 'error': 'No analysis results'}
+        return dict(self._analysis_view(), folders=list(self.selected_folders))
+
+    def save_session(self, path=None, include_plots=False):
+        """
+        Save the current analysis (folders, per-channel metrics, CSV paths and mtimes) to a
+        .tcsession file; include_plots also keeps the rendered plots. Without a path a save
+        dialog is shown.
+        """
+        if not self.boards_data:
+            return {'success': False, 'error': 'Run an analysis before saving a session'}
+        try:
+            if path is None:
+                if self._window is None:
+                    return {'success': False, 'error': 'No session path given'}
+                chosen = self._window.create_file_dialog(
+                    webview.SAVE_DIALOG, save_filename=f'session{SESSION_SUFFIX}',
+                    file_types=(f'Test cycle sessions (*{SESSION_SUFFIX})',))
+                if not chosen:
+                    return {'success': False, 'error': 'Save cancelled'}
+                path = chosen if isinstance(chosen, str) else chosen[0]
+            plots = {}
+            if include_plots:
+                for key in self._plot_cache:
+                    cached = self._plot_cache.get(key)
+                    if cached is not None and cached[0] == self._cache_version:
+                        plots[key] = cached[1]
+            with self._apply_lock:
+                state = {
+                    'selected_folders': self.selected_folders,
+                    'analyzed_folders': self.analyzed_folders,
+                    'test_cycles': self.test_cycles,
+                    'current_board': self._current_board,
+                    'boards_data': self.boards_data,
+                    'channel_paths': self._channel_paths,
+                    'csv_stats': self._csv_stats,
+                    'metrics_signature': metrics_signature(),
                 }
+                save_session(path, state, plots)
+            return {'success': True, 'path': path, 'plots': len(plots)}
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
 
-            # Compute and cache statistics for all boards
-            self._compute_and_cache_statistics()
+    def load_session(self, path=None):
+        """
+        Open a saved session. If no source CSV changed since it was saved (sizes and mtimes
+        match) nothing is parsed; new or modified CSVs are re-read like in watch mode. Removed
+        CSVs or different metric settings re-analyze the saved folders. Without a path an
+        open dialog is shown. Returns the same result as analyze(), plus 'session' details.
+        """
+        if self._job is not None and self._job['state'] == 'running':
+            return {'success': False, 'error': 'Wait for the running analysis to finish'}
+        try:
+            if path is None:
+                if self._window is None:
+                    return {'success': False, 'error': 'No session path given'}
+                chosen = self._window.create_file_dialog(
+                    webview.OPEN_DIALOG, file_types=(f'Test cycle sessions (*{SESSION_SUFFIX})',))
+                if not chosen:
+                    return {'success': False, 'error': 'Open cancelled'}
+                path = chosen if isinstance(chosen, str) else chosen[0]
+            state = load_session(path)
+            self.stop_watch()
+
+            current = self._scan_csv_stats(state['analyzed_folders'])
+            removed = [csv_path for csv_path in state['csv_stats'] if csv_path not in current]
+            if state['metrics_signature'] != metrics_signature() or removed:
+                reason = 'metric settings changed' if not removed else f'{len(removed)} CSV files removed'
+                self.selected_folders = list(state['analyzed_folders'])
+                result = self.analyze(background=False)
+                result['session'] = {'path': path, 'reanalyzed': True, 'reason': reason}
+                result['folders'] = list(self.selected_folders)
+                return result
+
+            with self._apply_lock:
+                self.selected_folders = list(state['selected_folders'])
+                self.boards_data = state['boards_data']
+                self._channel_paths = state['channel_paths']
+                self.analyzed_folders = list(state['analyzed_folders'])
+                self.test_cycles = list(state['test_cycles'])
+                self._csv_stats = state['csv_stats']
+                error = self._apply_analysis([], plots=state['plots'], current_board=state['current_board'])
+            if error:
+                return error
+            result = self._finish_analysis([])
+
+            # Only what changed since the save is read again
+            changed = [csv_path for csv_path, st in current.items() if state['csv_stats'].get(csv_path) != st]
+            updated = []
+            if changed:
+                payload = self._apply_live_changes(changed)
+                self._csv_stats = current
+                if payload is not None:
+                    updated = payload['updatedChannels']
+                    result = self._analysis_view()
+            result['session'] = {'path': path, 'reanalyzed': False, 'changedFiles': len(changed),
+                                 'updatedChannels': len(updated)}
+            result['folders'] = list(self.selected_folders)
+            return result
+        except Exception as e:
+            import traceback
+            return {'success': False, 'error': f'{str(e)}\n{traceback.format_exc()}'}
 
-            # Invalidate plot cache since we have new data
-            self._plot_cache.clear()
-            self._cache_version += 1
+    def append_folder(self, path):
+        """
+        Add one more test cycle folder to the current analysis. Only the new
+        folder's CSVs are parsed; existing channels get one more point per metric.
+        Channels without a CSV in the new folder are dropped and reported as skipped.
+        """
+        if not self.boards_data:
+            return {'success': False, 'error': 'Run an analysis before appending a test cycle'}
+        if self._job is not None and self._job['state'] == 'running':
+            return {'success': False, 'error': 'Wait for the running analysis to finish'}
+        if path in self.analyzed_folders:
+            return {'success': False, 'error': f'{path} is already part of the analysis'}
 
-            # Set first board as default for display
-            first_board = sorted(self.boards_data.keys())[0]
-            self._current_board = first_board
-            self.channels_data = self.boards_data[first_board]
+        try:
+            generation = self._generation
+            new_cycle = len(self.test_cycles) + 1
+            new_stats = self._scan_csv_stats([path])
+            try:
+                new_files = discover_channel_files([path], first_cycle=new_cycle)
+            except FileNotFoundError as e:
+                return {'success': False, 'error': str(e)}
+
+            tasks = []
+            skipped_channels = []
+            for board in sorted(self.boards_data):
+                for ch in sorted(self.boards_data[board]):
+                    new_path = new_files.get(board, {}).get(ch, {}).get(new_cycle)
+                    if new_path is None:
+                        skipped_channels.append(f'Board {board} - Channel {ch}: missing file for test cycle {new_cycle}')
+                        continue
+                    tasks.append((board, ch, {new_cycle: new_path}))
+
+            new_data = {}
+            for board, ch, temp_summary, error in iter_channel_summaries(tasks):
+                if temp_summary is None:
+                    skipped_channels.append(f'Board {board} - Channel {ch}: {error}')
+                    continue
+                new_data[(board, ch)] = channel_metrics(temp_summary)
+            get_metrics_cache().flush()
+
+            with self._apply_lock:
+                if self._generation != generation:
+                    return {'success': False, 'error': 'The analysis changed while appending, try again'}
+                # Extend surviving channels, drop the rest
+                boards_data = {}
+                for board, channels in self.boards_data.items():
+                    for ch, data in channels.items():
+                        extra = new_data.get((board, ch))
+                        if extra is None:
+                            self._channel_paths.pop((board, ch), None)
+                            continue
+                        merged = {name: values + extra[name] for name, values in data.items() if name in extra}
+                        boards_data.setdefault(board, {})[ch] = merged
+                        self._channel_paths[(board, ch)][new_cycle] = new_files[board][ch][new_cycle]
+                self.boards_data = boards_data
+
+                self.analyzed_folders.append(path)
+                if path not in self.selected_folders:
+                    self.selected_folders.append(path)
+                self.test_cycles.append(new_cycle)
+                self._csv_stats.update(new_stats)
+                error = self._apply_analysis(skipped_channels)
+            return error or self._finish_analysis(skipped_channels)
 
-            # Generate plot for all channels of first board
-            plot_image = self._generate_all_channels_plot()
+        except Exception as e:
+            import traceback
+            return {'success': False, 'error': f'{str(e)}\n{traceback.format_exc()}'}
 
-            result = {
-                'success': True,
-                'plot': plot_image,
-                'boards': list(self.boards_data.keys()),
-                'channels': list(self.channels_data.keys()),
-                'currentBoard': first_board
+    def _apply_analysis(self, skipped_channels, plots=None, current_board=None):
+        """
+        Shared state swap of analyze()/append_folder()/load_session(): stats, cache invalidation
+        and the current board (current_board if it still exists). plots is {plot cache key: data
+        URL} to restore. Returns the error result if no board has valid data, else None.
+        Callers hold _apply_lock, then call _finish_analysis() after releasing it.
+        """
+        self._generation += 1
+        # Remove empty boards (all channels failed)
+        self.boards_data = {board: channels for board, channels in self.boards_data.items() if channels}
+
+        if not self.boards_data:
+            return {
+                'success': False,
+                'error': f'No valid data found. Skipped channels:\n' + '\n'.join(skipped_channels[:10])
             }
 
-            # Add warning message if any channels were skipped
-            if skipped_channels:
-                result['warning'] = f'跳過 {len(skipped_channels)} 個有問題的通道'
-                result['skippedChannels'] = skipped_channels
+        # Compute and cache statistics for all boards
+        self._compute_and_cache_statistics()
+
+        # Invalidate plot cache since we have new data
+        self._plot_cache.clear()
+        self._preview_keys.clear()
+        self._cache_version += 1
+        for key, image in (plots or {}).items():
+            self._plot_cache[key] = (self._cache_version, image)
+
+        # Set first board as default for display
+        if current_board not in self.boards_data:
+            current_board = sorted(self.boards_data.keys())[0]
+        self._current_board = current_board
+        self.channels_data = self.boards_data[current_board]
+        return None
 
-            return result
+    def _finish_analysis(self, skipped_channels):
+        """
+        Result of an analysis swapped in by _apply_analysis(): the current board's view (in
+        image mode its first plot is rendered here, outside _apply_lock) and prerendering of
+        the rest.
+        """
+        # Plot (or series) for all channels of first board
+        result = self._analysis_view()
+        # Render everything else in the background so later clicks are cache hits
+        self._start_prerender()
+
+        # Add warning message if any channels were skipped
+        if skipped_channels:
+            result['warning'] = f'跳過 {len(skipped_channels)} 個有問題的通道'
+            result['skippedChannels'] = skipped_channels
+
+        return result
+
+def _resource_path(relative_path):
+    """Path of a file shipped with the app, also inside a PyInstaller build"""
+    base = getattr(sys, '_MEIPASS', os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(base, relative_path)
 
-        except Exception as e:
-            import traceback
-            return {'success': False, 'error': f'{str(e)}\n{traceback.format_exc()}'}
 
 def get_html():
-    return '''
+    with open(_resource_path(os.path.join('static', 'charts.js')), encoding='utf-8') as f:
+        charts_js = f.read()
+    return PAGE_HTML.replace('/* charts.js */', charts_js)
+
+
+PAGE_HTML = '''
 <!DOCTYPE html>
 <html lang="zh-TW">
 <head>
@@ -959,6 +1503,12 @@ def get_html():
             border-bottom: 2px solid #e0e0e0;
         }
         
+        .plot-export {
+            float: right;
+            font-weight: normal;
+            font-size: 14px;
+        }
+        
         .plot-image {
             width: 100%;
             display: block;
@@ -989,7 +1539,7 @@ def get_html():
     <div class="container">
         <div class="header">
             <h1>🔬 Test Cycle Data Analyzer</h1>
-            <p>選擇 5 個測試週期資料夾並分析數據</p>
+            <p>依週期順序選擇測試週期資料夾並分析數據</p>
         </div>
         
         <div class="content">
@@ -1009,7 +1559,7 @@ def get_html():
             </div>
             
             <div class="selected-folders">
-                <h3>已選擇的資料夾 (<span id="folderCount">0</span>/5)</h3>
+                <h3>已選擇的資料夾 (<span id="folderCount">0</span> 個測試週期)</h3>
                 <div class="folder-chips" id="selectedFolders"></div>
             </div>
             
@@ -1018,6 +1568,11 @@ def get_html():
             <div class="action-buttons">
                 <button class="btn btn-secondary" onclick="clearSelection()">清除全部</button>
                 <button class="btn btn-primary" id="analyzeBtn" onclick="analyze()" disabled>開始分析</button>
+                <button class="btn btn-secondary" id="cancelBtn" onclick="cancelAnalysis()" disabled>取消分析</button>
+                <button class="btn btn-secondary" id="appendBtn" onclick="appendCycle()" disabled>追加最後選擇的資料夾為新週期</button>
+                <button class="btn btn-secondary" id="watchBtn" onclick="toggleWatch()" disabled>▶️ 即時監看</button>
+                <button class="btn btn-secondary" id="saveSessionBtn" onclick="saveSession()" disabled>💾 儲存工作階段</button>
+                <button class="btn btn-secondary" id="loadSessionBtn" onclick="loadSession()">📂 開啟工作階段</button>
             </div>
             
             <div class="board-selector" id="boardSelector">
@@ -1038,10 +1593,19 @@ def get_html():
         </div>
     </div>
     
+    <script>
+/* charts.js */
+    </script>
     <script>
         let currentPath = '';
         let selectedFolders = [];
         let allFolderItems = [];  // Store all folder items for searching
+        let currentChannel = 'all';  // Channel currently shown ('all' or a channel number)
+        let watching = false;
+        let boardSeries = null;  // Series of the shown board in canvas mode (see get_board_series)
+        let previewKey = null;  // 'board/channel' of a preview image waiting for onPlotReady
+        let analysisJobId = null;  // Background analysis job whose updates are shown
+        const finishedJobs = {};  // Results that arrived before their job id
         
         async function loadFolders(path = null) {
             try {
@@ -1161,7 +1725,7 @@ def get_html():
             });
             
             document.getElementById('folderCount').textContent = selectedFolders.length;
-            document.getElementById('analyzeBtn').disabled = selectedFolders.length !== 5;
+            document.getElementById('analyzeBtn').disabled = selectedFolders.length === 0;
         }
         
         async function removeFolder(index) {
@@ -1222,63 +1786,27 @@ def get_html():
         }
         
         async function analyze() {
-            if (selectedFolders.length !== 5) {
-                showStatus('請選擇恰好 5 個資料夾', 'error');
+            if (selectedFolders.length === 0) {
+                showStatus('請至少選擇 1 個資料夾', 'error');
                 return;
             }
             
             const results = document.getElementById('results');
-            results.innerHTML = '<div class="loading"><div class="spinner"></div><p>分析數據中...</p></div>';
+            results.innerHTML = '<div class="loading"><div class="spinner"></div><p id="analysisProgress">分析數據中...</p><p id="analysisBoards"></p></div>';
             showStatus('處理數據中...', 'info');
+            analysisJobId = null;
             
             try {
                 const data = await pywebview.api.analyze();
-                
-                if (data.success) {
-                    let statusMsg = `分析完成！找到 ${data.boards.length} 個 Boards, ${data.channels.length} 個通道`;
-                    
-                    // Show warning if any channels were skipped
-                    if (data.warning) {
-                        statusMsg += ` (⚠️ ${data.warning})`;
-                        console.log('Skipped channels:', data.skippedChannels);
-                    }
-                    
-                    showStatus(statusMsg, 'success');
-                    
-                    // Show board selector
-                    const boardSelector = document.getElementById('boardSelector');
-                    boardSelector.classList.add('show');
-                    
-                    // Populate board dropdown
-                    const boardSelect = document.getElementById('boardSelect');
-                    boardSelect.innerHTML = '';
-                    data.boards.forEach(board => {
-                        const option = document.createElement('option');
-                        option.value = board;
-                        option.textContent = `Board ${board}`;
-                        if (board === data.currentBoard) {
-                            option.selected = true;
-                        }
-                        boardSelect.appendChild(option);
-                    });
-                    
-                    // Show channel selector
-                    const channelSelector = document.getElementById('channelSelector');
-                    channelSelector.classList.add('show');
-                    
-                    // Create channel buttons
-                    updateChannelButtons(data.channels);
-                    
-                    // Display initial plot (all channels of current board)
-                    results.innerHTML = `
-                        <div class="plot-container">
-                            <div class="plot-header">Board ${data.currentBoard} - 所有通道 (Channels: ${data.channels.join(', ')})</div>
-                            <img src="${data.plot}" class="plot-image" alt="All channels plot">
-                        </div>
-                    `;
-                } else {
-                    showStatus('錯誤: ' + data.error, 'error');
-                    results.innerHTML = '';
+                if (!data.success) {
+                    showAnalysisResult(data);
+                    return;
+                }
+                analysisJobId = data.jobId;
+                document.getElementById('cancelBtn').disabled = false;
+                // Small lots can finish before the job id comes back
+                if (finishedJobs[data.jobId]) {
+                    onAnalysisDone(finishedJobs[data.jobId]);
                 }
             } catch (error) {
                 showStatus('分析數據錯誤: ' + error.message, 'error');
@@ -1286,6 +1814,192 @@ def get_html():
             }
         }
         
+        async function cancelAnalysis() {
+            if (analysisJobId) {
+                await pywebview.api.cancel_analysis(analysisJobId);
+            }
+        }
+        
+        // Called from Python while an analysis job runs
+        function onAnalysisProgress(data) {
+            if (analysisJobId !== null && data.jobId !== analysisJobId) return;
+            const progress = document.getElementById('analysisProgress');
+            if (!progress) return;
+            progress.textContent = `分析數據中... ${data.done} / ${data.total} 個通道` + (data.skipped ? ` (跳過 ${data.skipped})` : '');
+            if (data.completedBoards.length) {
+                const boards = document.getElementById('analysisBoards');
+                boards.textContent = (boards.textContent ? boards.textContent + ', ' : '已完成 Boards: ') + data.completedBoards.join(', ');
+            }
+        }
+        
+        // Called from Python when an analysis job has finished, failed or been cancelled
+        function onAnalysisDone(data) {
+            if (data.jobId !== analysisJobId) {
+                finishedJobs[data.jobId] = data;
+                return;
+            }
+            delete finishedJobs[data.jobId];
+            analysisJobId = null;
+            document.getElementById('cancelBtn').disabled = true;
+            if (data.cancelled) {
+                showStatus('分析已取消', 'info');
+                document.getElementById('results').innerHTML = '';
+                return;
+            }
+            showAnalysisResult(data);
+        }
+        
+        async function appendCycle() {
+            if (selectedFolders.length === 0) {
+                showStatus('請先選擇要追加的資料夾', 'error');
+                return;
+            }
+            
+            const results = document.getElementById('results');
+            results.innerHTML = '<div class="loading"><div class="spinner"></div><p>分析新週期中...</p></div>';
+            showStatus('處理新週期數據中...', 'info');
+            
+            try {
+                const data = await pywebview.api.append_folder(selectedFolders[selectedFolders.length - 1]);
+                showAnalysisResult(data);
+            } catch (error) {
+                showStatus('追加週期錯誤: ' + error.message, 'error');
+                results.innerHTML = '';
+            }
+        }
+        
+        async function saveSession() {
+            // Image mode (no canvas series): keep the rendered plots too
+            const data = await pywebview.api.save_session(null, !boardSeries);
+            if (data.success) {
+                showStatus(`已儲存工作階段 ${data.path}`, 'success');
+            } else if (data.error !== 'Save cancelled') {
+                showStatus('儲存工作階段錯誤: ' + data.error, 'error');
+            }
+        }
+        
+        async function loadSession() {
+            const results = document.getElementById('results');
+            const previous = results.innerHTML;
+            results.innerHTML = '<div class="loading"><div class="spinner"></div><p>開啟工作階段中...</p></div>';
+            try {
+                const data = await pywebview.api.load_session();
+                if (!data.success && data.error === 'Open cancelled') {
+                    results.innerHTML = previous;
+                    return;
+                }
+                showAnalysisResult(data);
+                if (data.success) {
+                    selectedFolders = data.folders;
+                    updateSelectedDisplay();
+                    const session = data.session;
+                    showStatus(session.reanalyzed
+                        ? `已重新分析工作階段 (${session.reason})`
+                        : `已開啟工作階段 ${session.path}` + (session.changedFiles ? `，更新 ${session.updatedChannels} 個通道` : ''), 'success');
+                }
+            } catch (error) {
+                showStatus('開啟工作階段錯誤: ' + error.message, 'error');
+                results.innerHTML = previous;
+            }
+        }
+        
+        function showAnalysisResult(data) {
+            const results = document.getElementById('results');
+            if (data.success) {
+                let statusMsg = `分析完成！${data.testCycles} 個測試週期，找到 ${data.boards.length} 個 Boards, ${data.channels.length} 個通道`;
+                
+                // Show warning if any channels were skipped
+                if (data.warning) {
+                    statusMsg += ` (⚠️ ${data.warning})`;
+                    console.log('Skipped channels:', data.skippedChannels);
+                }
+                
+                showStatus(statusMsg, 'success');
+                document.getElementById('appendBtn').disabled = false;
+                document.getElementById('watchBtn').disabled = false;
+                document.getElementById('saveSessionBtn').disabled = false;
+                currentChannel = 'all';
+                
+                // Show board selector
+                const boardSelector = document.getElementById('boardSelector');
+                boardSelector.classList.add('show');
+                
+                // Populate board dropdown
+                const boardSelect = document.getElementById('boardSelect');
+                boardSelect.innerHTML = '';
+                data.boards.forEach(board => {
+                    const option = document.createElement('option');
+                    option.value = board;
+                    option.textContent = `Board ${board}`;
+                    if (board === data.currentBoard) {
+                        option.selected = true;
+                    }
+                    boardSelect.appendChild(option);
+                });
+                
+                // Show channel selector
+                const channelSelector = document.getElementById('channelSelector');
+                channelSelector.classList.add('show');
+                
+                // Create channel buttons
+                updateChannelButtons(data.channels);
+                
+                // Display initial plot (all channels of current board)
+                showPlot(data, `Board ${data.currentBoard} - 所有通道 (Channels: ${data.channels.join(', ')})`, 'all');
+            } else {
+                showStatus('錯誤: ' + data.error, 'error');
+                results.innerHTML = '';
+            }
+        }
+        
+        // Show a board view: canvas charts from data.series, or the image in data.plot.
+        // A preview image (data.preview) is replaced by onPlotReady when the full PNG is done.
+        function showPlot(data, title, channel) {
+            const results = document.getElementById('results');
+            boardSeries = data.series || null;
+            previewKey = data.preview ? `${document.getElementById('boardSelect').value}/${channel}` : null;
+            results.innerHTML = `
+                <div class="plot-container">
+                    <div class="plot-header">${title}
+                        <span class="plot-export">
+                            <select id="exportFormat">
+                                <option value="png">PNG</option>
+                                <option value="svg">SVG</option>
+                                <option value="webp">WebP</option>
+                            </select>
+                            <button class="btn btn-secondary" onclick="exportPlot('${channel}')">💾 匯出</button>
+                        </span>
+                    </div>
+                    ${boardSeries ? '<div class="plot-charts"></div>' : `<img src="${data.plot}" class="plot-image" alt="Plot for ${title}">`}
+                </div>
+            `;
+            if (boardSeries) {
+                renderCharts(results.querySelector('.plot-charts'), boardSeries, channel);
+            }
+        }
+        
+        // Called from Python when the full-resolution image of a previewed plot is ready
+        function onPlotReady(data) {
+            if (previewKey !== `${data.board}/${data.channel}`) {
+                return;
+            }
+            previewKey = null;
+            const img = document.querySelector('#results .plot-image');
+            if (img) {
+                img.src = data.plot;
+            }
+        }
+        
+        async function exportPlot(channel) {
+            const fmt = document.getElementById('exportFormat').value;
+            const data = await pywebview.api.export_plot(channel, fmt);
+            if (data.success) {
+                showStatus(`已匯出 ${data.path}`, 'success');
+            } else if (data.error !== 'Export cancelled') {
+                showStatus('匯出錯誤: ' + data.error, 'error');
+            }
+        }
+        
         function updateChannelButtons(channels) {
             const channelButtons = document.getElementById('channelButtons');
             channelButtons.innerHTML = '';
@@ -1320,17 +2034,13 @@ def get_html():
                 
                 if (data.success) {
                     showStatus(`已切換到 Board ${selectedBoard}`, 'success');
+                    currentChannel = 'all';
                     
                     // Update channel buttons
                     updateChannelButtons(data.channels);
                     
                     // Display plot for all channels of new board
-                    results.innerHTML = `
-                        <div class="plot-container">
-                            <div class="plot-header">Board ${selectedBoard} - 所有通道 (Channels: ${data.channels.join(', ')})</div>
-                            <img src="${data.plot}" class="plot-image" alt="All channels plot">
-                        </div>
-                    `;
+                    showPlot(data, `Board ${selectedBoard} - 所有通道 (Channels: ${data.channels.join(', ')})`, 'all');
                 } else {
                     showStatus('錯誤: ' + data.error, 'error');
                     results.innerHTML = '';
@@ -1341,6 +2051,7 @@ def get_html():
         }
         
         async function selectChannel(channel) {
+            currentChannel = channel;
             // Update button states
             const buttons = document.querySelectorAll('.channel-btn');
             buttons.forEach(btn => {
@@ -1351,6 +2062,15 @@ def get_html():
                 }
             });
             
+            const currentBoard = document.getElementById('boardSelect').value;
+            const title = channel === 'all' ? `Board ${currentBoard} - 所有通道` : `Board ${currentBoard} - Channel ${channel}`;
+            
+            // Canvas mode: the board's series are already here, draw without a round trip
+            if (boardSeries && boardSeries.board === currentBoard) {
+                showPlot({series: boardSeries}, title, channel);
+                return;
+            }
+            
             // Show loading
             const results = document.getElementById('results');
             results.innerHTML = '<div class="loading"><div class="spinner"></div><p>生成圖表中...</p></div>';
@@ -1359,15 +2079,7 @@ def get_html():
                 const data = await pywebview.api.plot_channel(channel);
                 
                 if (data.success) {
-                    const boardSelect = document.getElementById('boardSelect');
-                    const currentBoard = boardSelect.value;
-                    const title = channel === 'all' ? `Board ${currentBoard} - 所有通道` : `Board ${currentBoard} - Channel ${channel}`;
-                    results.innerHTML = `
-                        <div class="plot-container">
-                            <div class="plot-header">${title}</div>
-                            <img src="${data.plot}" class="plot-image" alt="Plot for ${title}">
-                        </div>
-                    `;
+                    showPlot(data, title, channel);
                 } else {
                     showStatus('錯誤: ' + data.error, 'error');
                 }
@@ -1376,10 +2088,55 @@ def get_html():
             }
         }
         
+        async function toggleWatch() {
+            const watchBtn = document.getElementById('watchBtn');
+            const data = watching ? await pywebview.api.stop_watch() : await pywebview.api.start_watch(2.0);
+            if (data.success) {
+                watching = data.watching;
+                watchBtn.textContent = watching ? '⏸️ 停止監看' : '▶️ 即時監看';
+                showStatus(watching ? '即時監看中，新的 CSV 會自動分析' : '已停止即時監看', 'info');
+            } else {
+                showStatus('錯誤: ' + data.error, 'error');
+            }
+        }
+        
+        // Called from Python (watch mode) when new or changed CSVs have been analyzed
+        function onLiveUpdate(data) {
+            showStatus(`即時更新: ${data.updatedChannels.length} 個通道 (Boards: ${data.updatedBoards.join(', ')})`, 'info');
+            
+            // Add boards that appeared since the last update
+            const boardSelect = document.getElementById('boardSelect');
+            const known = Array.from(boardSelect.options).map(option => option.value);
+            data.boards.forEach(board => {
+                if (!known.includes(board)) {
+                    const option = document.createElement('option');
+                    option.value = board;
+                    option.textContent = `Board ${board}`;
+                    boardSelect.appendChild(option);
+                }
+            });
+            
+            // Refresh the visible plot only if its board changed
+            if (data.updatedBoards.includes(boardSelect.value)) {
+                const channel = currentChannel;
+                boardSeries = null;  // stale, fetched again by selectChannel
+                updateChannelButtons(data.channels);
+                selectChannel(channel);
+            }
+        }
+        
         // Initialize when window is ready
-        window.addEventListener('pywebviewready', function() {
+        window.addEventListener('pywebviewready', async function() {
             loadFolders();
             
+            // Show a session opened at startup (TCA_SESSION)
+            const view = await pywebview.api.get_current_view();
+            if (view.success) {
+                showAnalysisResult(view);
+                selectedFolders = view.folders;
+                updateSelectedDisplay();
+            }
+            
             // Add Enter key support for path input
             const pathInput = document.getElementById('currentPath');
             pathInput.addEventListener('keypress', function(e) {
@@ -1398,7 +2155,22 @@ def get_html():
     '''
 
 if __name__ == '__main__':
+    # Required for the process-pool execution mode in frozen (PyInstaller) builds
+    import multiprocessing
+    multiprocessing.freeze_support()
+    if os.environ.get('TCA_EXECUTION_MODE'):
+        set_execution_mode(os.environ['TCA_EXECUTION_MODE'], int(os.environ.get('TCA_WORKERS', 0)) or None)
     api = API()
+    if os.environ.get('TCA_RENDER_MODE'):
+        api.set_render_mode(os.environ['TCA_RENDER_MODE'])
+    if os.environ.get('TCA_PLOT_CACHE_MB') or os.environ.get('TCA_PLOT_CACHE_SPILL'):
+        api.configure_plot_cache(os.environ.get('TCA_PLOT_CACHE_MB') or None,
+                                 os.environ.get('TCA_PLOT_CACHE_SPILL', '') not in ('', '0') or None)
+    if os.environ.get('TCA_SESSION'):
+        # Open a saved session before the window so the page shows it right away
+        loaded = api.load_session(os.environ['TCA_SESSION'])
+        if not loaded['success']:
+            print(f"Cannot open session {os.environ['TCA_SESSION']}: {loaded['error']}")
     window = webview.create_window(
         'Test Cycle Data Analyzer',
         html=get_html(),
@@ -1406,4 +2178,5 @@ if __name__ == '__main__':
         width=1200,
         height=900
     )
+    api._window = window
     webview.start(debug=True)
@@ -0,0 +1,317 @@
+"""
+Headless batch analysis: the parsing and statistics of app.API.analyze() for
+many lots, without a window or browser (does not import app.py / webview).
+
+Usage:
+    python batch.py --out results LOT_TC1 LOT_TC2 LOT_TC3 LOT_TC4 LOT_TC5
+    python batch.py --out results --lot A=/data/A/TC1,/data/A/TC2 --lot B=/data/B/TC1,/data/B/TC2
+    python batch.py --out results --manifest lots.json [--plots boards|all] [--plot-format svg]
+
+A manifest is JSON: [{"name": "A", "folders": [...]}, ...] (or {"lots": [...]}),
+a lot without a name is named after the directory holding its folders; names
+must be unique (ignoring case), as each lot has its own output directory. Each
+lot's folders are its test cycles, in order. Per lot, <out>/<name>/ gets:
+    channels.csv   one row per channel: means, robust z-scores, outlier flags and drift
+    cycles.csv     one row per channel and test cycle with every metric
+    summary.json   folders, board statistics, per-channel series, flags and drift, skipped channels
+    plots/         with --plots: board_<board>.<fmt> and, with 'all', board_<board>_ch<channel>.<fmt>
+
+CSVs are parsed on a process pool using every core (see scan.set_execution_mode)
+and plots are rendered on a second process pool. Several lots run at once
+(--concurrent-lots) and finished lots and channels are checkpointed in <out>/,
+so rerunning an interrupted batch with the same --out resumes it (--restart
+starts over); see batch_scheduler.py.
+"""
+import os
+import sys
+import csv
+import json
+import math
+import time
+import base64
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from scan import iter_channel_summaries, set_execution_mode, channel_metrics, discover_channel_files
+from metrics_cache import get_metrics_cache
+from metrics import metrics_signature
+from stats import MetricCube, DriftIndex, STAT_METRICS
+from plot_render import render_board_plot, render_channel_plot, EXPORT_FORMATS
+
+PLOT_CHOICES = ('none', 'boards', 'all')
+
+
+def lot_name(folders):
+    """Default lot name: the directory holding the lot's test cycle folders."""
+    parent = os.path.basename(os.path.dirname(os.path.normpath(folders[0])))
+    return parent or os.path.basename(os.path.normpath(folders[0]))
+
+
+def check_lot_names(lots):
+    """
+    Raise ValueError if two lots of [(name, folders), ...] share a name. A lot's name is
+    its output directory and checkpoint entry, so the second lot would overwrite the
+    first (or be skipped as finished). Names are compared ignoring case, as on Windows.
+    """
+    seen = {}
+    clashes = []
+    for name, folders in lots:
+        other = seen.get(name.casefold())
+        if other is None:
+            seen[name.casefold()] = (name, folders)
+        else:
+            clashes.append(f"'{name}' ({os.path.dirname(os.path.normpath(folders[0]))}) and "
+                           f"'{other[0]}' ({os.path.dirname(os.path.normpath(other[1][0]))})")
+    if clashes:
+        raise ValueError('Lots with the same name: ' + '; '.join(clashes) +
+                         '. Name them with --lot NAME=... or "name" in the manifest.')
+
+
+def load_manifest(path):
+    """[(name, folders), ...] from a JSON manifest (see module docstring)."""
+    with open(path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if isinstance(manifest, dict):
+        manifest = manifest.get('lots', [])
+    base = os.path.dirname(os.path.abspath(path))
+    lots = []
+    for entry in manifest:
+        folders = entry['folders'] if isinstance(entry, dict) else entry
+        # Relative folders are relative to the manifest
+        folders = [os.path.join(base, folder) for folder in folders]
+        name = entry.get('name') if isinstance(entry, dict) else None
+        lots.append((name or lot_name(folders), folders))
+    return lots
+
+
+def analyze_lot(folders, cancel=None, on_channel=None, done=None):
+    """
+    Parse every channel of one lot like API.analyze(). Returns {'folders', 'testCycles',
+    'boardsData' ({board: {ch: metrics}}), 'channelPaths' ({(board, ch): {test_cycle: path}}),
+    'skipped' (messages), 'files' (CSVs in the lot), 'resumedFiles' (of those, not re-read)}.
+    on_channel(board, ch, metrics or None, error, paths) is called as each channel completes.
+    done is {(board, ch): (paths, metrics or None, error)} of channels already analyzed (a
+    checkpoint); they are not re-read when their paths are still the channel's CSVs.
+    Raises FileNotFoundError for a bad folder.
+    """
+    board_ch_csv_list = discover_channel_files(folders)
+    test_cycles = list(range(1, len(folders) + 1))
+    tasks = [(board, ch, board_ch_csv_list[board][ch])
+             for board in sorted(board_ch_csv_list) for ch in sorted(board_ch_csv_list[board])]
+
+    results = {}  # {(board, ch): (metrics or None, error)}
+    resumed_files = 0
+    remaining = []
+    for board, ch, path_list in tasks:
+        previous = (done or {}).get((board, ch))
+        if previous is not None and previous[0] == path_list:
+            results[(board, ch)] = previous[1:]
+            resumed_files += len(path_list)
+        else:
+            remaining.append((board, ch, path_list))
+
+    paths = {(board, ch): path_list for board, ch, path_list in remaining}
+    for board, ch, temp_summary, error in iter_channel_summaries(remaining, test_cycles, cancel):
+        data = None if temp_summary is None else channel_metrics(temp_summary)
+        results[(board, ch)] = (data, error)
+        if on_channel is not None:
+            on_channel(board, ch, data, error, paths[(board, ch)])
+    get_metrics_cache().flush()
+
+    boards_data = {}
+    skipped = []
+    for board, ch, _ in tasks:
+        data, error = results.get((board, ch), (None, 'cancelled'))
+        if data is None:
+            skipped.append(f'Board {board} - Channel {ch}: {error}')
+        else:
+            boards_data.setdefault(board, {})[ch] = data
+    return {
+        'folders': list(folders),
+        'testCycles': test_cycles,
+        'boardsData': boards_data,
+        'channelPaths': {(board, ch): dict(path_list) for board, ch, path_list in tasks},
+        'skipped': skipped,
+        'files': sum(len(path_list) for _, _, path_list in tasks),
+        'resumedFiles': resumed_files,
+    }
+
+
+def lot_statistics(boards_data):
+    """(board_stats, channel_stats, drift) of a lot, as in the desktop app (see stats.MetricCube)."""
+    cube = MetricCube(boards_data)
+    board_stats, channel_stats = cube.statistics()
+    drift = DriftIndex(cube)
+    drift_by_key = {key: drift.entry(i) for i, key in enumerate(drift.keys)}
+    return board_stats, channel_stats, drift_by_key
+
+
+def _metric_names(boards_data):
+    """pf, vf, ith first, then every extra metric in name order."""
+    extra = sorted({name for channels in boards_data.values() for data in channels.values()
+                    for name in data} - set(STAT_METRICS))
+    return list(STAT_METRICS) + extra
+
+
+def write_lot(out_dir, name, result, board_stats, channel_stats, drift):
+    """Write channels.csv, cycles.csv and summary.json of one analyzed lot into out_dir."""
+    os.makedirs(out_dir, exist_ok=True)
+    boards_data = result['boardsData']
+    keys = [(board, ch) for board in sorted(boards_data) for ch in sorted(boards_data[board])]
+
+    columns = []
+    for metric in STAT_METRICS:
+        columns += [f'{metric}_mean', f'{metric}_robust_z', f'is_outlier_{metric}', f'is_robust_outlier_{metric}']
+    drift_columns = [(f'{metric}_change_pct', f'{metric}Change') for metric in STAT_METRICS] + \
+                    [(f'{metric}_slope', f'{metric}Slope') for metric in STAT_METRICS]
+    with open(os.path.join(out_dir, 'channels.csv'), 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['board', 'channel'] + columns + [column for column, _ in drift_columns])
+        for key in keys:
+            stats, channel_drift = channel_stats[key], drift[key]
+            writer.writerow(list(key) + [stats[column] for column in columns] +
+                            ['' if channel_drift[field] is None else channel_drift[field] for _, field in drift_columns])
+
+    names = _metric_names(boards_data)
+    with open(os.path.join(out_dir, 'cycles.csv'), 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['board', 'channel', 'test_cycle', 'folder'] + names)
+        for board, ch in keys:
+            data = boards_data[board][ch]
+            for i, test_cycle in enumerate(result['testCycles']):
+                values = [data[name][i] if name in data and i < len(data[name]) else '' for name in names]
+                writer.writerow([board, ch, test_cycle, result['folders'][i]] + values)
+
+    summary = {
+        'lot': name,
+        'folders': result['folders'],
+        'testCycles': result['testCycles'],
+        'metricsSignature': metrics_signature(),
+        'boards': {board: board_stats[board] for board in sorted(boards_data)},
+        'channels': [{
+            'board': board,
+            'channel': ch,
+            'series': boards_data[board][ch],
+            'stats': channel_stats[(board, ch)],
+            'drift': {field: value for field, value in drift[(board, ch)].items() if field not in ('board', 'channel')},
+        } for board, ch in keys],
+        'skipped': result['skipped'],
+    }
+    with open(os.path.join(out_dir, 'summary.json'), 'w', encoding='utf-8') as f:
+        json.dump(_json_safe(summary), f, indent=1, allow_nan=False)
+
+
+def _json_safe(value):
+    """Plain JSON values: numpy scalars as Python numbers, NaN/inf as null."""
+    if isinstance(value, dict):
+        return {key: _json_safe(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_json_safe(item) for item in value]
+    if hasattr(value, 'item'):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def submit_lot_plots(executor, out_dir, result, board_stats, channel_stats, which='boards', fmt='png'):
+    """
+    Queue the plots of one lot on executor (a process pool). Returns [(future, path)];
+    write_plots() saves them when done.
+    """
+    plot_dir = os.path.join(out_dir, 'plots')
+    os.makedirs(plot_dir, exist_ok=True)
+    boards_data, test_cycles = result['boardsData'], result['testCycles']
+    jobs = []
+    for board in sorted(boards_data):
+        channels_data = boards_data[board]
+        stats = {ch: channel_stats[(board, ch)] for ch in channels_data}
+        future = executor.submit(render_board_plot, test_cycles, channels_data, board_stats[board], stats,
+                                 True, fmt=fmt)
+        jobs.append((future, os.path.join(plot_dir, f'board_{board}.{fmt}')))
+        if which == 'all':
+            for ch in sorted(channels_data):
+                future = executor.submit(render_channel_plot, ch, channels_data[ch], test_cycles,
+                                         board_stats[board], stats[ch], True, fmt=fmt)
+                jobs.append((future, os.path.join(plot_dir, f'board_{board}_ch{ch}.{fmt}')))
+    return jobs
+
+
+def write_plots(jobs):
+    """Wait for submit_lot_plots() renders and write each image file. Returns the number written."""
+    for future, path in jobs:
+        data_url = future.result()
+        with open(path, 'wb') as f:
+            f.write(base64.b64decode(data_url.split(',', 1)[1]))
+    return len(jobs)
+
+
+def _parse_lot(spec):
+    """NAME=FOLDER,FOLDER,... or FOLDER,FOLDER,... (named after their directory)."""
+    name, sep, folders = spec.partition('=')
+    if not sep:
+        name, folders = None, spec
+    folders = [folder for folder in folders.split(',') if folder]
+    if not folders:
+        raise argparse.ArgumentTypeError(f'No folders in lot {spec!r}')
+    return name or lot_name(folders), folders
+
+
+def main(argv=None):
+    # Imported here: batch_scheduler imports this module, which may be running as __main__
+    from batch_scheduler import BatchScheduler, DEFAULT_CONCURRENT_LOTS, PROGRESS_INTERVAL
+
+    parser = argparse.ArgumentParser(description='Analyze test cycle lots without a GUI.')
+    parser.add_argument('folders', nargs='*', help='test cycle folders of one lot, in cycle order')
+    parser.add_argument('--lot', action='append', type=_parse_lot, default=[],
+                        help='a lot as NAME=FOLDER,FOLDER,... (repeatable)')
+    parser.add_argument('--manifest', help='JSON file listing lots')
+    parser.add_argument('--out', default='batch_results', help='output directory (default: batch_results)')
+    parser.add_argument('--plots', choices=PLOT_CHOICES, default='none',
+                        help="also render the board plots ('boards') or board and channel plots ('all')")
+    parser.add_argument('--plot-format', choices=EXPORT_FORMATS, default='png')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: all cores)')
+    parser.add_argument('--concurrent-lots', type=int, default=DEFAULT_CONCURRENT_LOTS,
+                        help=f'lots analyzed at once on the shared workers (default: {DEFAULT_CONCURRENT_LOTS})')
+    parser.add_argument('--restart', action='store_true',
+                        help="ignore the output directory's checkpoints and analyze every lot again")
+    parser.add_argument('--progress', type=float, default=PROGRESS_INTERVAL,
+                        help=f'seconds between throughput lines (default: {PROGRESS_INTERVAL})')
+    args = parser.parse_args(argv)
+
+    lots = list(args.lot)
+    if args.manifest:
+        lots += load_manifest(args.manifest)
+    if args.folders:
+        lots.append((lot_name(args.folders), args.folders))
+    if not lots:
+        parser.error('give test cycle folders, --lot or --manifest')
+    try:
+        check_lot_names(lots)
+    except ValueError as e:
+        parser.error(str(e))
+
+    workers = args.workers or os.cpu_count() or 1
+    set_execution_mode('process', workers)
+    render_executor = ProcessPoolExecutor(max_workers=workers) if args.plots != 'none' else None
+    scheduler = BatchScheduler(args.out, args.concurrent_lots, args.plots, args.plot_format, render_executor,
+                               restart=args.restart, progress_interval=args.progress)
+    try:
+        failed = scheduler.run(lots)
+    except KeyboardInterrupt:
+        print(f"Interrupted, run again with --out {args.out} to resume")
+        return 130
+    finally:
+        if render_executor is not None:
+            render_executor.shutdown()
+    elapsed = time.monotonic() - scheduler.start
+    files_per_s, lots_per_hour = scheduler.throughput()
+    print(f"{len(lots) - failed}/{len(lots)} lots ({scheduler.resumed} from checkpoint), "
+          f"{scheduler.files} files in {elapsed:.1f} s ({files_per_s:.0f} files/s, {lots_per_hour:.1f} lots/hour)")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    # Required for the process pools in frozen (PyInstaller) builds
+    import multiprocessing
+    multiprocessing.freeze_support()
+    sys.exit(main())
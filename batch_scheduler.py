@@ -0,0 +1,267 @@
+"""
+Multi-lot batch scheduler with checkpoint and resume (used by batch.py).
+
+Several lots are analyzed at once, each from its own thread, and all of them
+feed the one scan process pool (scan.set_execution_mode('process')), so the
+pool stays busy while a lot computes its statistics and writes its files.
+Progress is checkpointed under the output directory:
+    checkpoint.jsonl              one line per finished lot: name, folders, metrics signature,
+                                  files, channels, seconds
+    <lot>/channels.partial.jsonl  while a lot runs: a header line (folders, metrics signature),
+                                  then one line per finished channel with its CSVs
+                                  (test cycle, path, size, mtime_ns) and metrics or error
+A rerun with the same output directory skips the lots in checkpoint.jsonl
+(same folders and metrics signature) and, for a lot that was interrupted,
+reads only the channels missing from its partial file or whose CSVs changed.
+If a worker process dies the lot fails without recording the channels it was
+reading (they are not bad data), and the rerun reads them on a new pool.
+"""
+import os
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from metrics_cache import MetricsCache
+from metrics import metrics_signature
+from batch import analyze_lot, lot_statistics, write_lot, submit_lot_plots, write_plots, check_lot_names
+
+CHECKPOINT_FILE = 'checkpoint.jsonl'
+PARTIAL_FILE = 'channels.partial.jsonl'
+DEFAULT_CONCURRENT_LOTS = 2
+PROGRESS_INTERVAL = 30  # seconds between throughput lines while lots run
+
+
+def _plain(value):
+    """json.dumps default: numpy scalars as Python numbers."""
+    if hasattr(value, 'item'):
+        return value.item()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def _append_line(f, record, sync=False):
+    """
+    Append one JSON line. It is flushed right away, so a crashed process loses at
+    most the line being written; sync also waits for the disk (finished lots).
+    """
+    f.write(json.dumps(record, default=_plain) + '\n')
+    f.flush()
+    if sync:
+        os.fsync(f.fileno())
+
+
+def _read_lines(path):
+    """Records of a checkpoint file, stopping at a torn line left by a crash mid-write."""
+    records = []
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    break
+    except FileNotFoundError:
+        pass
+    return records
+
+
+def _lot_header(folders):
+    return {'folders': [os.path.abspath(folder) for folder in folders], 'metricsSignature': metrics_signature()}
+
+
+class ChannelLog:
+    """
+    Finished channels of a running lot (<lot>/channels.partial.jsonl). done holds
+    the channels recorded by an earlier run whose CSVs are unchanged, in the form
+    taken by batch.analyze_lot(done=); record() is its on_channel callback.
+    """
+
+    def __init__(self, path, folders, resume=True):
+        self.path = path
+        self.done = {}
+        self._header = _lot_header(folders)
+        self._file = None
+        records = _read_lines(path) if resume else []
+        self._resumed = bool(records) and records[0] == self._header
+        if self._resumed:
+            for record in records[1:]:
+                files = record['files']
+                if all(MetricsCache.stat_key(csv_path) == (os.path.abspath(csv_path), size, mtime_ns)
+                       for _, csv_path, size, mtime_ns in files):
+                    self.done[(record['board'], record['channel'])] = (
+                        {test_cycle: csv_path for test_cycle, csv_path, _, _ in files},
+                        record['metrics'], record['error'])
+
+    def record(self, board, ch, data, error, paths):
+        if self._file is None:
+            # Opened on the first channel, so a lot failing before that leaves no file behind
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._file = open(self.path, 'a' if self._resumed else 'w', encoding='utf-8')
+            if not self._resumed:
+                _append_line(self._file, self._header)
+        files = []
+        for test_cycle, csv_path in sorted(paths.items()):
+            key = MetricsCache.stat_key(csv_path)
+            files.append([test_cycle, csv_path] + ([key[1], key[2]] if key else [None, None]))
+        _append_line(self._file, {'board': board, 'channel': ch, 'files': files, 'metrics': data, 'error': error})
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def remove(self):
+        self.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+class Checkpoint:
+    """Finished lots of an output directory (checkpoint.jsonl)."""
+
+    def __init__(self, out_dir, restart=False):
+        os.makedirs(out_dir, exist_ok=True)
+        self.path = os.path.join(out_dir, CHECKPOINT_FILE)
+        self._lots = {} if restart else {record['lot']: record for record in _read_lines(self.path)}
+        self._file = open(self.path, 'w' if restart else 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def finished(self, name, folders):
+        """Whether lot name was finished from the same folders with the current metrics."""
+        record = self._lots.get(name)
+        return record is not None and all(record.get(key) == value for key, value in _lot_header(folders).items())
+
+    def add(self, name, folders, **counts):
+        record = dict({'lot': name}, **_lot_header(folders), **counts)
+        with self._lock:
+            _append_line(self._file, record, sync=True)
+            self._lots[name] = record
+
+    def close(self):
+        self._file.close()
+
+
+class BatchScheduler:
+    """
+    Analyze lots concurrently into out_dir with checkpoints (see module docstring).
+    Plots ('boards' or 'all') are rendered on render_executor, shared by all lots.
+    """
+
+    def __init__(self, out_dir, concurrent_lots=DEFAULT_CONCURRENT_LOTS, plots='none', plot_format='png',
+                 render_executor=None, restart=False, progress_interval=PROGRESS_INTERVAL):
+        self.out_dir = out_dir
+        self.concurrent_lots = max(1, concurrent_lots)
+        self.plots = plots
+        self.plot_format = plot_format
+        self.render_executor = render_executor
+        self.restart = restart
+        self.progress_interval = progress_interval
+        self.cancel = threading.Event()
+        self._lock = threading.Lock()
+        self.files = 0  # CSVs read in this run
+        self.lots_done = 0  # lots finished in this run
+        self.resumed = 0  # lots skipped as finished by an earlier run
+        self.failed = 0
+        self.start = None
+
+    def _count_files(self, n):
+        with self._lock:
+            self.files += n
+
+    def _run_lot(self, checkpoint, name, folders):
+        """Analyze and write one lot. Returns its report line, or None when cancelled."""
+        if self.cancel.is_set():
+            return None
+        lot_start = time.monotonic()
+        out_dir = os.path.join(self.out_dir, name)
+        log = ChannelLog(os.path.join(out_dir, PARTIAL_FILE), folders, resume=not self.restart)
+
+        def on_channel(board, ch, data, error, paths):
+            log.record(board, ch, data, error, paths)
+            self._count_files(len(paths))
+
+        try:
+            result = analyze_lot(folders, self.cancel, on_channel, log.done)
+        finally:
+            log.close()
+        if self.cancel.is_set():
+            return None
+        if not result['boardsData']:
+            raise ValueError('No valid data found')
+        board_stats, channel_stats, drift = lot_statistics(result['boardsData'])
+        plot_jobs = []
+        if self.render_executor is not None:
+            plot_jobs = submit_lot_plots(self.render_executor, out_dir, result, board_stats, channel_stats,
+                                         self.plots, self.plot_format)
+        write_lot(out_dir, name, result, board_stats, channel_stats, drift)
+        plots = write_plots(plot_jobs)
+
+        channels = sum(len(channels) for channels in result['boardsData'].values())
+        seconds = time.monotonic() - lot_start
+        checkpoint.add(name, folders, files=result['files'], channels=channels, seconds=round(seconds, 3))
+        log.remove()
+        with self._lock:
+            self.lots_done += 1
+        resumed = f", {result['resumedFiles']} files from checkpoint" if result['resumedFiles'] else ''
+        return (f"{name}: {channels} channels in {len(result['boardsData'])} boards, "
+                f"{len(result['skipped'])} skipped, {plots} plots{resumed}, {seconds:.1f} s -> {out_dir}")
+
+    def throughput(self):
+        """(files/s, lots/hour) of this run so far; lots finished by an earlier run don't count."""
+        elapsed = time.monotonic() - self.start if self.start is not None else 0
+        if not elapsed:
+            return 0.0, 0.0
+        return self.files / elapsed, self.lots_done * 3600 / elapsed
+
+    def progress(self, total):
+        files_per_s, lots_per_hour = self.throughput()
+        return (f"{self.lots_done + self.resumed}/{total} lots ({self.resumed} from checkpoint), "
+                f"{self.files} files, {files_per_s:.0f} files/s, {lots_per_hour:.1f} lots/hour")
+
+    def run(self, lots):
+        """
+        Run [(name, folders), ...], printing a line per lot and a throughput line every
+        progress_interval seconds. Returns the number of failed lots. Raises ValueError if two
+        lots share a name (see batch.check_lot_names). On KeyboardInterrupt,
+        running lots stop at their next channel (their checkpoints are kept) and it is re-raised.
+        """
+        check_lot_names(lots)
+        checkpoint = Checkpoint(self.out_dir, self.restart)
+        self.start = time.monotonic()
+        try:
+            pending = []
+            for name, folders in lots:
+                if checkpoint.finished(name, folders):
+                    self.resumed += 1
+                    print(f"{name}: finished in an earlier run, skipped")
+                else:
+                    pending.append((name, folders))
+
+            with ThreadPoolExecutor(max_workers=self.concurrent_lots, thread_name_prefix='lot') as executor:
+                futures = {executor.submit(self._run_lot, checkpoint, name, folders): name
+                           for name, folders in pending}
+                running = set(futures)
+                try:
+                    while running:
+                        finished, running = wait(running, timeout=self.progress_interval,
+                                                 return_when=FIRST_COMPLETED)
+                        if not finished:
+                            print(self.progress(len(lots)))
+                        for future in finished:
+                            try:
+                                line = future.result()
+                            except Exception as e:
+                                self.failed += 1
+                                print(f"{futures[future]}: {e}")
+                                continue
+                            if line is not None:
+                                print(line)
+                except KeyboardInterrupt:
+                    self.cancel.set()
+                    for future in running:
+                        future.cancel()
+                    raise
+        finally:
+            checkpoint.close()
+        return self.failed
@@ -0,0 +1,83 @@
+"""
+Per-plot latency of plot_render: the path before figure reuse (a fresh figure
+laid out with tight_layout() on every render), fresh figures with fixed
+margins and reused figure templates.
+
+Usage: python bench_plot_render.py [--channels 16] [--cycles 5] [--repeat 20]
+"""
+import sys
+import time
+import argparse
+import numpy as np
+import plot_render
+from plot_render import render_board_plot, render_channel_plot
+from stats import board_statistics
+
+
+def _synthetic_board(channels, cycles, seed=0):
+    rng = np.random.default_rng(seed)
+    return {
+        ch: {
+            'pf': list(640 - 2 * np.arange(cycles) + rng.normal(0, 5, cycles)),
+            'vf': list(1.95 + rng.normal(0, 0.003, cycles)),
+            'ith': list(1.05 + 0.01 * np.arange(cycles) + rng.normal(0, 0.02, cycles)),
+        }
+        for ch in range(1, channels + 1)
+    }
+
+
+def _tight_layout_template(layout):
+    """A fresh figure template that runs tight_layout() on every save, like renders before figure reuse."""
+    template = plot_render._template(layout, reuse=False)
+    if hasattr(template.fig, 'set_layout_engine'):
+        template.fig.set_layout_engine('tight')
+    else:  # matplotlib < 3.6
+        template.fig.set_tight_layout(True)
+    return template
+
+
+def _time_ms(func, repeat):
+    func()  # warm-up: font cache, first template
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark plot rendering with and without figure reuse.')
+    parser.add_argument('--channels', type=int, default=16, help='channels per board')
+    parser.add_argument('--cycles', type=int, default=5, help='test cycles per channel')
+    parser.add_argument('--repeat', type=int, default=20, help='renders per measurement')
+    args = parser.parse_args(argv)
+
+    channels_data = _synthetic_board(args.channels, args.cycles)
+    test_cycles = list(range(1, args.cycles + 1))
+    board_stats, channel_stats = board_statistics(channels_data)
+
+    dpi = plot_render.PLOT_DPI
+    cases = {
+        'board (all channels)': (
+            lambda: _tight_layout_template('board').render(
+                test_cycles, channels_data, board_stats, channel_stats, dpi, 'png'),
+            lambda reuse: render_board_plot(test_cycles, channels_data, board_stats, channel_stats, reuse=reuse),
+        ),
+        'single channel': (
+            lambda: _tight_layout_template('channel').render(
+                1, channels_data[1], test_cycles, board_stats, channel_stats[1], dpi, 'png'),
+            lambda reuse: render_channel_plot(
+                1, channels_data[1], test_cycles, board_stats, channel_stats[1], reuse=reuse),
+        ),
+    }
+    print(f"{args.channels} channels x {args.cycles} cycles, {args.repeat} renders each")
+    print(f"{'plot':<22}{'tight_layout ms':>16}{'fresh ms':>10}{'reused ms':>11}{'speedup':>9}")
+    for name, (baseline, render) in cases.items():
+        tight = _time_ms(baseline, args.repeat)
+        fresh = _time_ms(lambda: render(False), args.repeat)
+        reused = _time_ms(lambda: render(True), args.repeat)
+        print(f"{name:<22}{tight:>16.1f}{fresh:>10.1f}{reused:>11.1f}{tight / reused:>8.2f}x")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
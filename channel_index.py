@@ -0,0 +1,126 @@
+"""
+Sorted per-field indexes over every analyzed channel, for predicate and top-k queries.
+
+Each channel has one value per field: the mean, minimum and maximum over test
+cycles of Pf, Vf and Ith ('pf', 'pfMin', 'pfMax', ...) and its drift
+('pfChange', 'pfSlope', ... see stats.DriftIndex). Every field is argsorted
+once when the index is built; a predicate is then a binary search into the
+sorted values and a top-k without predicates reads the first k entries.
+
+Query (JSON-friendly, used by app.API.query_channels and web_app /jobs/<id>/query):
+    where       [[field, op, value], ...], all must hold; op is <, <=, >, >=, == or !=
+    sort        field to order by (default: board and channel)
+    descending  largest first
+    limit       maximum number of channels returned
+    boards      only these boards
+"""
+import numpy as np
+from stats import STAT_METRICS
+
+# Predicate operators: (searchsorted side, keep positions below the found one)
+_RANGE_OPS = {'<': ('left', True), '<=': ('right', True), '>': ('right', False), '>=': ('left', False)}
+_OPS = ('<', '<=', '>', '>=', '==', '!=')
+
+DEFAULT_QUERY_LIMIT = 50
+
+
+class ChannelIndex:
+    """Per-field sorted indexes over the channels of a MetricCube and its DriftIndex."""
+
+    def __init__(self, cube, drift):
+        self.keys = drift.keys  # (board, channel) per row, in cube order
+        values = cube.values[cube.channel_mask]  # (channels, cycles, metrics)
+        valid = cube.cycle_mask[cube.channel_mask][..., None]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = np.where(valid, values, 0).sum(axis=1) / valid.sum(axis=1)
+        lows = np.where(valid, values, np.inf).min(axis=1, initial=np.inf)
+        highs = np.where(valid, values, -np.inf).max(axis=1, initial=-np.inf)
+
+        self.fields = {}
+        for m, name in enumerate(STAT_METRICS):
+            self.fields[name] = means[:, m]
+            self.fields[f'{name}Min'] = np.where(np.isfinite(lows[:, m]), lows[:, m], np.nan)
+            self.fields[f'{name}Max'] = np.where(np.isfinite(highs[:, m]), highs[:, m], np.nan)
+            self.fields[f'{name}Change'] = drift.change[:, m]
+            self.fields[f'{name}Slope'] = drift.slope[:, m]
+
+        self._names = list(self.fields)
+        self._matrix = np.column_stack([self.fields[name] for name in self._names]) if self.keys else \
+            np.zeros((0, len(self._names)))
+
+        # {field: (row order, sorted values, number of non-NaN values)}; NaN sorts last
+        self._sorted = {}
+        for field, column in self.fields.items():
+            order = np.argsort(column, kind='stable')
+            self._sorted[field] = (order, column[order], int(np.count_nonzero(~np.isnan(column))))
+        self._board_rows = {}
+        for row, (board, _) in enumerate(self.keys):
+            self._board_rows.setdefault(board, []).append(row)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _check_field(self, field):
+        if field not in self.fields:
+            raise ValueError(f"Unknown field '{field}', use one of {', '.join(self.fields)}")
+
+    def _matching(self, field, op, value):
+        """Boolean row mask of one predicate, from a binary search in the field's sorted values."""
+        self._check_field(field)
+        if op not in _OPS:
+            raise ValueError(f"Unknown operator '{op}', use one of {', '.join(_OPS)}")
+        order, ordered, count = self._sorted[field]
+        mask = np.zeros(len(self.keys), dtype=bool)
+        value = float(value)
+        if op in _RANGE_OPS:
+            side, below = _RANGE_OPS[op]
+            position = int(np.searchsorted(ordered[:count], value, side=side))
+            mask[order[:position] if below else order[position:count]] = True
+        else:
+            start = np.searchsorted(ordered[:count], value, side='left')
+            stop = np.searchsorted(ordered[:count], value, side='right')
+            mask[order[start:stop]] = True
+            if op == '!=':
+                mask[order[:count]] = ~mask[order[:count]]
+        return mask
+
+    def entries(self, rows):
+        """Field values of channels: [{'board', 'channel', 'pf', 'pfMin', ...}, ...] (NaN as None)."""
+        result = []
+        for row, values in zip(rows, self._matrix[rows].tolist()):
+            board, ch = self.keys[row]
+            entry = {'board': board, 'channel': ch}
+            entry.update(zip(self._names, [None if v != v else v for v in values]))
+            result.append(entry)
+        return result
+
+    def query(self, where=None, sort=None, descending=False, limit=DEFAULT_QUERY_LIMIT, boards=None):
+        """
+        Channels matching every predicate in where, ordered by sort. Returns
+        (total number of matches, [entry, ...] of at most limit channels).
+        """
+        mask = None
+        for field, op, value in where or ():
+            matching = self._matching(field, op, value)
+            mask = matching if mask is None else mask & matching
+        if boards is not None:
+            allowed = np.zeros(len(self.keys), dtype=bool)
+            for board in boards:
+                allowed[self._board_rows.get(board, [])] = True
+            mask = allowed if mask is None else mask & allowed
+
+        if sort is None:
+            rows = np.arange(len(self.keys))
+        else:
+            self._check_field(sort)
+            order, _, count = self._sorted[sort]
+            # Descending keeps channels without a value (NaN) last
+            rows = np.concatenate([order[:count][::-1], order[count:]]) if descending else order
+        if mask is None:
+            total = len(self.keys)
+            selected = rows[:limit]
+        else:
+            matched = rows[mask[rows]]
+            total = len(matched)
+            selected = matched[:limit]
+        return total, self.entries(selected.tolist())
@@ -55,17 +55,17 @@ def chose_folders():
             update_status()
     
     def update_status():
-        status_label.config(text=f"Selected {len(folders)} folders (need 5)")
-        if len(folders) == 5:
+        status_label.config(text=f"Selected {len(folders)} folders (one per test cycle)")
+        if folders:
             done_btn.config(state=tk.NORMAL, bg="green")
         else:
             done_btn.config(state=tk.DISABLED, bg="gray")
     
     def done():
-        if len(folders) == 5:
+        if folders:
             root.destroy()
         else:
-            messagebox.showerror("Error", "Please select exactly 5 folders")
+            messagebox.showerror("Error", "Please select at least one folder")
     
     # Buttons
     btn_frame = tk.Frame(root)
@@ -74,7 +74,7 @@ def chose_folders():
     tk.Button(btn_frame, text="Add Folders", command=add_folders).pack(side=tk.LEFT, padx=5)
     tk.Button(btn_frame, text="Remove Selected", command=remove_selected).pack(side=tk.LEFT, padx=5)
     
-    status_label = tk.Label(root, text="Selected 0 folders (need 5)")
+    status_label = tk.Label(root, text="Selected 0 folders (one per test cycle)")
     status_label.pack(pady=5)
     
     done_btn = tk.Button(root, text="Done", command=done, state=tk.DISABLED, bg="gray")
@@ -85,36 +85,17 @@ def chose_folders():
 
 def run_analysis():
     test_cycle_folders = chose_folders()
-    if len(test_cycle_folders) != 5:
-        messagebox.showerror("Error", "Need exactly 5 folders")
+    if not test_cycle_folders:
+        messagebox.showerror("Error", "Need at least one folder")
         return
     
-    board_ch_csv_list = {}  # {board: {ch: [csv_paths]}}
-    for test_cycle in range(1, 6):
-        folder_path = test_cycle_folders[test_cycle - 1]
-        subfolder = os.path.join(folder_path, f"{os.path.basename(folder_path)}-1")
-        if not os.path.exists(subfolder):
-            messagebox.showerror("Error", f"Subfolder {subfolder} not found for Test Cycle {test_cycle}")
-            return
-        try:
-            csv_files = [f for f in os.listdir(subfolder) if f.endswith('.csv')]
-            if not csv_files:
-                messagebox.showerror("Error", f"No CSV files found in {subfolder}")
-                return
-            for ch_csv in csv_files:
-                # Extract board (as string)
-                board = ch_csv.split("_")[0][5:]
-                # Extract channel number
-                ch = int((ch_csv.split("_")[-1].split(".")[0])[2:])
-                
-                if board not in board_ch_csv_list:
-                    board_ch_csv_list[board] = {}
-                if ch not in board_ch_csv_list[board]:
-                    board_ch_csv_list[board][ch] = [None]
-                board_ch_csv_list[board][ch].append(os.path.join(subfolder, ch_csv))
-        except Exception as e:
-            messagebox.showerror("Error", f"Error processing folder for Test Cycle {test_cycle}: {str(e)}")
-            return
+    from scan import discover_channel_files
+    try:
+        board_ch_csv_list = discover_channel_files(test_cycle_folders)  # {board: {ch: {test_cycle: path}}}
+    except Exception as e:
+        messagebox.showerror("Error", str(e))
+        return
+    test_cycles = list(range(1, len(test_cycle_folders) + 1))
     
     # Process each board and channel
     board_data = {}
@@ -124,22 +105,21 @@ def run_analysis():
         board_data[board] = {}
         for ch in board_ch_csv_list[board]:
             try:
-                from scan import collect_data_with_test_cycle
-                temp_summary = collect_data_with_test_cycle({i: board_ch_csv_list[board][ch][i] for i in range(1, 6)})
-                vf = []
-                pf = []
-                ith = []
-                for test_cycle in range(1, 6):
-                    vf.append(temp_summary[test_cycle]["Vf"])
-                    pf.append(temp_summary[test_cycle]["Pf"])
-                    ith.append(temp_summary[test_cycle]["ith"])
-                board_data[board][ch] = {"vf": vf, "pf": pf, "ith": ith}
+                from scan import collect_summary_with_test_cycle, channel_metrics
+                path_list = board_ch_csv_list[board][ch]
+                if sorted(path_list) != test_cycles:
+                    raise ValueError("missing test cycles")
+                temp_summary = collect_summary_with_test_cycle(path_list)
+                board_data[board][ch] = channel_metrics(temp_summary)
             except Exception as e:
                 # Skip problematic channel and continue
                 skipped_channels.append(f"Board {board} Channel {ch}")
                 print(f"Warning: Skipping Board {board} Channel {ch} due to error: {str(e)}")
                 continue
     
+    from metrics_cache import get_metrics_cache
+    get_metrics_cache().flush()
+
     # Remove empty boards
     board_data = {board: channels for board, channels in board_data.items() if channels}
     
@@ -167,7 +147,7 @@ if __name__ == "__main__":
     root.geometry("400x200")
     
     tk.Label(root, text="Test Cycle Data Analyzer", font=("Arial", 16)).pack(pady=10)
-    tk.Label(root, text="Click 'Start Analysis' to select 5 test cycle folders\nand analyze the data.", justify=tk.CENTER).pack(pady=5)
+    tk.Label(root, text="Click 'Start Analysis' to select the test cycle folders\nand analyze the data.", justify=tk.CENTER).pack(pady=5)
     tk.Button(root, text="Start Analysis", command=run_analysis, font=("Arial", 12)).pack(pady=10)
     tk.Button(root, text="Quit", command=root.quit).pack(pady=5)
     
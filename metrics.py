@@ -0,0 +1,282 @@
+"""
+Registry of per-sweep metric extractors.
+
+Every registered extractor is called with the same (cur, power, voltage) numpy
+arrays of one CSV after it has been parsed once, so adding a metric costs one
+extra function call per file rather than another read. Results are stored in
+the per-file summary under 'metrics' and end up as per-cycle lists in the
+channel data next to vf/pf/ith.
+
+Extractors must be registered at import time (e.g. in this module or one
+imported by scan) to be available to worker processes in 'process' mode.
+"""
+from collections import OrderedDict
+import numpy as np
+
+# Lower/upper power bounds of the linear region used for the Ith fit
+ITH_POWER_WINDOW = (100, 500)
+
+# Drive current (A) at which Vf/Pf are reported
+OPERATING_CURRENT = 7.5
+
+# Configured operating points: the Vf/Pf current plus extra currents reported
+# as 'vf@<I>' / 'pf@<I>' metrics. Change with set_operating_points().
+_operating_current = OPERATING_CURRENT
+_extra_currents = ()
+
+# {name: (func, version)}
+_extractors = OrderedDict()
+
+
+def _least_squares(n, x_sum, y_sum, xy_sum, xx_sum, yy_sum):
+    """
+    Least-squares line from the sums over n points (scalars, or arrays with
+    one fit per element). Returns (m, b, r2); m and b are 0 where the fit is
+    degenerate (fewer than two distinct x), like scan.CalIth, and r2 is 0
+    where it is undefined.
+    """
+    sxy = n * xy_sum - x_sum * y_sum
+    sxx = n * xx_sum - x_sum ** 2
+    syy = n * yy_sum - y_sum ** 2
+    if np.ndim(sxx) == 0:
+        # Single fit (the per-file path): skip the array masking below
+        if sxx == 0:  # also true for n == 0
+            return 0.0, 0.0, 0.0
+        m = sxy / sxx
+        return m, y_sum / n - m * x_sum / n, sxy ** 2 / (sxx * syy) if syy != 0 else 0.0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ok = sxx != 0
+        m = np.where(ok, sxy / sxx, 0.0)
+        b = np.where(ok, y_sum / n - m * x_sum / n, 0.0)
+        r2 = np.where(ok & (syy != 0), sxy ** 2 / (sxx * syy), 0.0)
+    return m, b, r2
+
+
+def fit_line(x, y):
+    """Least-squares line through numpy arrays x, y. Same result as scan.CalIth, returns (m, b)."""
+    m, b, _ = _least_squares(x.size, x.sum(), y.sum(), np.dot(x, y), np.dot(x, x), np.dot(y, y))
+    return float(m), float(b)
+
+
+def ith_window(power):
+    """Mask of the points inside the Ith fit power window."""
+    low, high = ITH_POWER_WINDOW
+    return (power >= low) & (power <= high)
+
+
+def fit_lines_batch(x, y, mask):
+    """
+    Least-squares lines for many rows at once.
+
+    x, y, mask: 2-D arrays of shape (rows, points). Only points where mask is
+    True take part, so ragged rows are padded to a common width and masked.
+    Returns (m, b, r2, n) arrays with one value per row. m and b are 0 where
+    the fit is degenerate (fewer than two distinct x), like fit_line and
+    scan.CalIth; r2 is 0 where it is undefined.
+    """
+    mask = np.asarray(mask, dtype=bool)
+    x = np.where(mask, x, 0.0)
+    y = np.where(mask, y, 0.0)
+    n = mask.sum(axis=1)
+    m, b, r2 = _least_squares(n, x.sum(axis=1), y.sum(axis=1), (x * y).sum(axis=1), (x * x).sum(axis=1),
+                              (y * y).sum(axis=1))
+    return m, b, r2, n
+
+
+def fit_ith_padded(cur, power, valid):
+    """
+    Ith fit of many sweeps at once (used for archives, whose sweeps are all
+    solved in one pass). cur, power: (rows, points) arrays padded to a common
+    width, valid: mask of the real points. Returns a dict of arrays, one entry
+    per sweep: 'ith', 'slope', 'intercept', 'r2' and 'n' (number of points in
+    the power window).
+    """
+    m, b, r2, n = fit_lines_batch(cur, power, valid & ith_window(power))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ith = np.where(m != 0, -b / np.where(m != 0, m, 1), 0.0) + 0.0
+    return {'ith': ith, 'slope': m, 'intercept': b, 'r2': r2, 'n': n}
+
+
+def fit_ith(cur, power):
+    """
+    Ith fit of a single sweep, without the padding of fit_ith_padded. Same
+    results as fit_ith_padded. Returns (ith, r2, n).
+    """
+    window = ith_window(power)
+    x = cur[window]
+    y = power[window]
+    m, b, r2 = _least_squares(x.size, x.sum(), y.sum(), np.dot(x, y), np.dot(x, x), np.dot(y, y))
+    ith = -b / m if m != 0 else 0.0
+    return float(ith) + 0.0, float(r2), int(x.size)
+
+
+def set_operating_points(current=OPERATING_CURRENT, extra=()):
+    """
+    Set the drive current of Vf/Pf and any extra currents to report.
+    Cached summaries computed with other currents are recomputed.
+    """
+    global _operating_current, _extra_currents
+    current = float(current)
+    extra = tuple(sorted({float(c) for c in extra} - {current}))
+    _operating_current, _extra_currents = current, extra
+
+
+def operating_currents():
+    """Configured currents, Vf/Pf current first."""
+    return (_operating_current,) + _extra_currents
+
+
+def operating_point_name(quantity, current):
+    """Metric name of an extra operating point, e.g. operating_point_name('pf', 5.0) == 'pf@5'."""
+    return f'{quantity}@{current:g}'
+
+
+def operating_points_batch(cur, power, voltage, valid, currents=None):
+    """
+    Vf and Pf at each current for many padded sweeps at once.
+
+    cur, power, voltage, valid: (rows, points) arrays as for fit_lines_batch.
+    A sweep that has a row at exactly the current uses the last such row (the
+    original exact-match semantics); otherwise the value is linearly
+    interpolated across the first step that brackets the current. A current
+    outside the sweep gives 0. Returns (vf, pf) arrays of shape
+    (rows, len(currents)); currents defaults to operating_currents().
+    """
+    currents = operating_currents() if currents is None else tuple(currents)
+    rows, width = cur.shape
+    vf = np.zeros((rows, len(currents)))
+    pf = np.zeros((rows, len(currents)))
+    if width == 0:
+        return vf, pf
+    r = np.arange(rows)
+    for k, current in enumerate(currents):
+        exact = valid & (cur == current)
+        last = width - 1 - np.argmax(exact[:, ::-1], axis=1)
+        d = cur - current
+        crossing = valid[:, :-1] & valid[:, 1:] & (d[:, :-1] * d[:, 1:] < 0)
+        i = np.argmax(crossing, axis=1) if width > 1 else np.zeros(rows, dtype=int)
+        j = np.minimum(i + 1, width - 1)
+        has_exact = exact.any(axis=1)
+        has_crossing = crossing.any(axis=1) & ~has_exact
+        # t is nan/inf on rows without a crossing; np.where drops those
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = d[r, i] / (d[r, i] - d[r, j])
+            for out, values in ((vf, voltage), (pf, power)):
+                interpolated = values[r, i] + t * (values[r, j] - values[r, i])
+                out[:, k] = np.where(has_exact, values[r, last], np.where(has_crossing, interpolated, 0.0))
+    return vf, pf
+
+
+def sweep_operating_points(cur, power, voltage):
+    """
+    Operating points of one sweep: (vf, pf, extra) with vf/pf at the Vf/Pf
+    current and extra = {'vf@<I>': ..., 'pf@<I>': ...} for the extra currents.
+    Same results as operating_points_batch, which solves all sweeps of an
+    archive at once; CSV files come here one sweep at a time.
+    """
+    currents = operating_currents()
+    if cur.size > 1 and np.all(cur[1:] > cur[:-1]):
+        # Ascending sweep (the usual case): an exact row is the interpolation node itself
+        # and a current outside the sweep gives 0
+        vf = np.interp(currents, cur, voltage, left=0.0, right=0.0)
+        pf = np.interp(currents, cur, power, left=0.0, right=0.0)
+        return split_operating_points(vf, pf)
+    # Unsorted or repeated currents: the exact-row / first-crossing rules of the batch version
+    vf, pf = operating_points_batch(cur[None], power[None], voltage[None], np.ones((1, cur.size), dtype=bool),
+                                    currents)
+    return split_operating_points(vf[0], pf[0])
+
+
+def split_operating_points(vf, pf):
+    """Turn one row of operating_points_batch output into (vf, pf, extra)."""
+    extra = {}
+    for k, current in enumerate(_extra_currents, start=1):
+        extra[operating_point_name('vf', current)] = float(vf[k])
+        extra[operating_point_name('pf', current)] = float(pf[k])
+    return float(vf[0]), float(pf[0]), extra
+
+
+# Keys of the per-file summary and channel data that a metric name must not shadow
+_RESERVED_NAMES = ('test_cycle', 'cur', 'power', 'voltage', 'vf', 'pf', 'ith', 'date', 'metrics',
+                   'ith_r2', 'ith_n')
+
+
+def register_metric(name, func, version=1):
+    """
+    Register func(cur, power, voltage) -> float under name.
+    Bump version when func's definition changes so cached summaries are recomputed.
+    Raises ValueError if name is a summary field, an operating point name
+    ('vf@<I>', 'pf@<I>') or an already registered metric (unregister it first).
+    """
+    if name in _RESERVED_NAMES:
+        raise ValueError(f"'{name}' is a built-in summary field")
+    if name.startswith(('vf@', 'pf@')):
+        raise ValueError(f"'{name}' is reserved for operating points (see set_operating_points)")
+    if name in _extractors:
+        raise ValueError(f"Metric '{name}' is already registered")
+    _extractors[name] = (func, version)
+
+
+def unregister_metric(name):
+    _extractors.pop(name, None)
+
+
+def metric_names():
+    return list(_extractors)
+
+
+def metrics_signature():
+    """Identifies the registered extractors and operating points; part of the metrics cache signature."""
+    extractors = ','.join(f'{name}@{version}' for name, (_, version) in _extractors.items())
+    return f"{extractors};I={','.join(repr(c) for c in operating_currents())}"
+
+
+def extract_metrics(cur, power, voltage):
+    """Run every registered extractor over one sweep. A failing extractor yields 0."""
+    values = {}
+    for name, (func, _) in _extractors.items():
+        try:
+            values[name] = float(func(cur, power, voltage))
+        except Exception as e:
+            print(f"Error in metric {name}: {e}")
+            values[name] = 0.0
+    return values
+
+
+def _slope_efficiency(cur, power, voltage):
+    """dP/dI over the Ith fit window."""
+    window = ith_window(power)
+    return fit_line(cur[window], power[window])[0]
+
+
+def _series_resistance(cur, power, voltage):
+    """dV/dI fitted over the upper half of the current sweep."""
+    if cur.size == 0:
+        return 0.0
+    upper = cur >= 0.5 * cur.max()
+    return fit_line(cur[upper], voltage[upper])[0]
+
+
+def _kink(cur, power, voltage):
+    """
+    Largest relative deviation of the local dP/dI from its median above threshold.
+    0 for a perfectly linear L-I curve; larger values indicate a kink.
+    """
+    lasing = power >= ITH_POWER_WINDOW[0]
+    c, p = cur[lasing], power[lasing]
+    if c.size < 3:
+        return 0.0
+    dc = np.diff(c)
+    valid = dc != 0
+    if not valid.any():
+        return 0.0
+    local = np.diff(p)[valid] / dc[valid]
+    median = np.median(local)
+    if median == 0:
+        return 0.0
+    return float(np.max(np.abs(local - median)) / abs(median))
+
+
+register_metric('slope_eff', _slope_efficiency)
+register_metric('rs', _series_resistance)
+register_metric('kink', _kink)
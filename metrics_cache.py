@@ -0,0 +1,263 @@
+import os
+import json
+import atexit
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Persistent cache of per-file metrics, stored next to the last-path file in the home dir
+METRICS_CACHE_FILE = os.path.join(os.path.expanduser('~'), '.test_cycle_analyzer_metrics_cache.sqlite3')
+
+DEFAULT_MEMORY_ENTRIES = 20000   # in-memory LRU tier
+DEFAULT_DISK_ENTRIES = 500000    # on-disk tier, oldest entries evicted past this
+_COMMIT_EVERY = 500              # buffered disk writes before an automatic commit
+
+
+class MetricsCache:
+    """
+    Two-tier cache of per-file summaries keyed by absolute path, size and mtime.
+
+    Memory tier: an LRU OrderedDict. Disk tier: a sqlite table that survives
+    restarts. A lookup costs one os.stat(); a changed file (different size or
+    mtime) or a different signature is a miss and gets overwritten on put().
+    Puts and last-used times are buffered and written in one short transaction
+    per commit (every _COMMIT_EVERY puts and on flush()), so other processes
+    sharing the file are never kept waiting on an open write transaction.
+    Disk lookups run outside the lock on a connection per thread, so parallel
+    readers don't queue behind each other. Summaries are copied in and out.
+    """
+
+    def __init__(self, path=METRICS_CACHE_FILE, max_memory_entries=DEFAULT_MEMORY_ENTRIES,
+                 max_disk_entries=DEFAULT_DISK_ENTRIES):
+        self.path = path
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self._memory = OrderedDict()  # {abspath: (size, mtime_ns, signature, summary)}
+        self._lock = threading.Lock()
+        self._conn = None  # writes and maintenance, under the lock
+        self._local = threading.local()  # per-thread read connection (.conn)
+        self._disk_failed = path is None
+        self._writes = {}  # {abspath: row} not yet on disk
+        self._touched = {}  # {abspath: last_used} of disk hits not yet on disk
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _connect(self):
+        """Open the sqlite file on first use. Disk errors degrade to memory-only."""
+        if self._conn is None and not self._disk_failed:
+            try:
+                conn = sqlite3.connect(self.path, check_same_thread=False)
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.execute('PRAGMA synchronous=OFF')
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS metrics ('
+                    'path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, '
+                    'signature TEXT, summary TEXT, last_used REAL)'
+                )
+                conn.execute('CREATE INDEX IF NOT EXISTS metrics_last_used ON metrics(last_used)')
+                self._conn = conn
+            except Exception as e:
+                print(f"Metrics cache disabled on disk ({self.path}): {e}")
+                self._disk_failed = True
+        return self._conn
+
+    def _reader(self):
+        """This thread's connection for lookups; WAL lets it read while other threads read or write."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path)
+        return conn
+
+    def _remember(self, path, entry):
+        self._memory[path] = entry
+        self._memory.move_to_end(path)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    @staticmethod
+    def stat_key(path):
+        """Return (abspath, size, mtime_ns) for path, or None if it can't be stat'ed."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return os.path.abspath(path), st.st_size, st.st_mtime_ns
+
+    def get(self, path, signature='', key=None):
+        """Return a copy of the cached summary dict for path, or None on a miss."""
+        key = key or self.stat_key(path)
+        if key is None:
+            return None
+        abspath, size, mtime_ns = key
+        with self._lock:
+            entry = self._memory.get(abspath)
+            if entry is not None and entry[:3] == (size, mtime_ns, signature):
+                self._memory.move_to_end(abspath)
+                self.hits += 1
+                return _copy_summary(entry[3])
+            pending = self._writes.get(abspath)
+            if pending is not None and pending[1:4] != (size, mtime_ns, signature):
+                pending = None
+            # Creates the table on first use, before any reader queries it
+            disk = pending is None and self._connect() is not None
+
+        # Decoding and the disk read don't need the lock
+        row = None
+        if disk:
+            try:
+                row = self._reader().execute(
+                    'SELECT summary FROM metrics WHERE path=? AND size=? AND mtime_ns=? AND signature=?',
+                    (abspath, size, mtime_ns, signature)
+                ).fetchone()
+            except sqlite3.Error as e:
+                print(f"Metrics cache read error: {e}")
+        data = pending[4] if pending is not None else row[0] if row is not None else None
+        summary = json.loads(data) if data is not None else None
+
+        with self._lock:
+            if summary is None:
+                self.misses += 1
+                return None
+            if row is not None:
+                self._touched[abspath] = time.time()
+                self.disk_hits += 1
+            self._remember(abspath, (size, mtime_ns, signature, summary))
+            self.hits += 1
+        return _copy_summary(summary)
+
+    def put(self, path, summary, signature='', key=None):
+        """Store summary for path. key is the stat_key() taken before the file was parsed."""
+        key = key or self.stat_key(path)
+        if key is None:
+            return
+        abspath, size, mtime_ns = key
+        summary = _copy_summary(summary)
+        with self._lock:
+            self._remember(abspath, (size, mtime_ns, signature, summary))
+            if self._disk_failed:
+                return
+            self._writes[abspath] = (abspath, size, mtime_ns, signature, json.dumps(summary), time.time())
+            if len(self._writes) >= _COMMIT_EVERY:
+                try:
+                    self._commit()
+                except sqlite3.Error as e:
+                    print(f"Metrics cache write error: {e}")
+
+    def _commit(self):
+        """
+        Write buffered entries and last-used times in one transaction and evict the least
+        recently used rows past the disk limit. Caller holds the lock. On an error (e.g. the
+        file is locked by another process) the buffers are kept for the next commit.
+        """
+        if not self._writes and not self._touched:
+            return
+        conn = self._connect()
+        if conn is None:
+            self._writes.clear()
+            self._touched.clear()
+            return
+        try:
+            conn.executemany('INSERT OR REPLACE INTO metrics VALUES (?, ?, ?, ?, ?, ?)', list(self._writes.values()))
+            conn.executemany('UPDATE metrics SET last_used=? WHERE path=?',
+                             [(used, path) for path, used in self._touched.items()])
+            count = conn.execute('SELECT COUNT(*) FROM metrics').fetchone()[0]
+            excess = count - self.max_disk_entries
+            if excess > 0:
+                conn.execute(
+                    'DELETE FROM metrics WHERE path IN '
+                    '(SELECT path FROM metrics ORDER BY last_used LIMIT ?)', (excess,)
+                )
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        self._writes.clear()
+        self._touched.clear()
+
+    def flush(self):
+        """Write buffered entries to disk. Called at the end of every analysis."""
+        with self._lock:
+            try:
+                self._commit()
+            except sqlite3.Error as e:
+                print(f"Metrics cache flush error: {e}")
+
+    def clear(self, disk=True):
+        """Drop all cached entries, in memory and (by default) on disk."""
+        with self._lock:
+            self._memory.clear()
+            self._writes.clear()
+            self._touched.clear()
+            self.hits = self.disk_hits = self.misses = 0
+            if disk:
+                conn = self._connect()
+                if conn is not None:
+                    try:
+                        conn.execute('DELETE FROM metrics')
+                        conn.commit()
+                    except sqlite3.Error as e:
+                        print(f"Metrics cache clear error: {e}")
+
+    def stats(self):
+        """Return hit/miss counters and entry counts."""
+        with self._lock:
+            disk_entries = 0
+            conn = self._connect()
+            if conn is not None:
+                try:
+                    disk_entries = conn.execute('SELECT COUNT(*) FROM metrics').fetchone()[0]
+                except sqlite3.Error:
+                    pass
+            return {
+                'hits': self.hits,
+                'diskHits': self.disk_hits,
+                'misses': self.misses,
+                'memoryEntries': len(self._memory),
+                'diskEntries': disk_entries,
+            }
+
+
+def _copy_summary(summary):
+    """Copy of a summary dict, including its nested metrics dict."""
+    summary = dict(summary)
+    if 'metrics' in summary:
+        summary['metrics'] = dict(summary['metrics'])
+    return summary
+
+
+# Shared cache instance - created once, reused across calls
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_metrics_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = MetricsCache()
+                # Entry points flush after each analysis; this catches anything still buffered on exit
+                atexit.register(_flush_on_exit)
+    return _cache
+
+
+def _flush_on_exit():
+    if _cache is not None:
+        _cache.flush()
+
+
+def configure_metrics_cache(path=METRICS_CACHE_FILE, max_memory_entries=DEFAULT_MEMORY_ENTRIES,
+                            max_disk_entries=DEFAULT_DISK_ENTRIES):
+    """Replace the shared cache. Pass path=None for a memory-only cache."""
+    global _cache
+    with _cache_lock:
+        if _cache is not None:
+            _cache.flush()
+        _cache = MetricsCache(path, max_memory_entries, max_disk_entries)
+        return _cache
+
+
+def clear_metrics_cache(disk=True):
+    get_metrics_cache().clear(disk=disk)
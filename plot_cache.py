@@ -0,0 +1,201 @@
+import os
+import shutil
+import atexit
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_BYTES = 128 * 1024 * 1024        # in-memory budget for rendered plots
+DEFAULT_MAX_SPILL_BYTES = 1024 * 1024 * 1024  # temp directory budget when spilling
+
+
+class PlotCache:
+    """
+    Byte-budgeted LRU cache of rendered plots: {key: (cache_version, image data URL)}.
+
+    Memory tier: an OrderedDict kept under max_bytes (size = length of the image
+    string). With spill=True, images evicted from memory are written to a temp
+    directory (itself bounded by max_spill_bytes) and loaded back on the next get().
+    Supports the dict operations app.API uses: get, [key], [key] = value, pop, in,
+    iter, len and clear.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, spill=False, max_spill_bytes=DEFAULT_MAX_SPILL_BYTES):
+        self.max_bytes = max_bytes
+        self.max_spill_bytes = max_spill_bytes
+        self._memory = OrderedDict()  # {key: (version, image)}
+        self._bytes = 0
+        self._spilled = OrderedDict()  # {key: (version, path, size)}
+        self._spill_bytes = 0
+        self._spill_dir = None
+        self.spill = spill
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.spill_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.spills = 0
+
+    def _spill_path(self, key, version):
+        if self._spill_dir is None:
+            self._spill_dir = tempfile.mkdtemp(prefix='tca_plots_')
+            atexit.register(shutil.rmtree, self._spill_dir, True)
+        name = hashlib.sha1(repr((key, version)).encode('utf-8')).hexdigest()
+        return os.path.join(self._spill_dir, name + '.txt')
+
+    def _drop_spilled(self, key):
+        entry = self._spilled.pop(key, None)
+        if entry is not None:
+            self._spill_bytes -= entry[2]
+            try:
+                os.remove(entry[1])
+            except OSError:
+                pass
+
+    def _spill_entry(self, key, version, image):
+        """Write an evicted image to the spill directory. Caller holds the lock."""
+        try:
+            path = self._spill_path(key, version)
+            with open(path, 'w', encoding='ascii') as f:
+                f.write(image)
+        except OSError as e:
+            print(f"Plot cache spill failed, dropping {key}: {e}")
+            return
+        self._drop_spilled(key)
+        self._spilled[key] = (version, path, len(image))
+        self._spill_bytes += len(image)
+        self.spills += 1
+        self._evict_spilled()
+
+    def _evict_spilled(self):
+        """Delete the oldest spilled images until the spill tier fits max_spill_bytes. Caller holds the lock."""
+        while self._spill_bytes > self.max_spill_bytes and self._spilled:
+            self._drop_spilled(next(iter(self._spilled)))
+            self.evictions += 1
+
+    def _store(self, key, value):
+        """Put value in the memory tier and evict least recently used entries. Caller holds the lock."""
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old[1])
+        self._drop_spilled(key)
+        self._memory[key] = value
+        self._bytes += len(value[1])
+        self._evict_memory()
+
+    def _evict_memory(self):
+        """
+        Evict least recently used entries (to the spill directory if enabled)
+        until memory fits max_bytes. Caller holds the lock.
+        """
+        while self._bytes > self.max_bytes and self._memory:
+            evicted_key, evicted = self._memory.popitem(last=False)
+            self._bytes -= len(evicted[1])
+            if self.spill:
+                self._spill_entry(evicted_key, *evicted)
+            else:
+                self.evictions += 1
+
+    def get(self, key, default=None):
+        """Return (version, image) for key, loading it back from the spill directory if needed."""
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return value
+            entry = self._spilled.get(key)
+            if entry is not None:
+                try:
+                    with open(entry[1], encoding='ascii') as f:
+                        value = (entry[0], f.read())
+                except OSError:
+                    self._drop_spilled(key)
+                else:
+                    self.hits += 1
+                    self.spill_hits += 1
+                    self._store(key, value)
+                    return value
+            self.misses += 1
+            return default
+
+    def version(self, key):
+        """Cache version stored for key (memory or spilled) without loading it or counting a lookup."""
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                return value[0]
+            entry = self._spilled.get(key)
+            return entry[0] if entry is not None else None
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._store(key, value)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            value = self._memory.pop(key, None)
+            if value is not None:
+                self._bytes -= len(value[1])
+            elif key in self._spilled:
+                value = (self._spilled[key][0], None)
+            self._drop_spilled(key)
+            return default if value is None else value
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._memory or key in self._spilled
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._memory) + [key for key in self._spilled if key not in self._memory])
+
+    def __len__(self):
+        with self._lock:
+            return len(self._memory) + len(self._spilled)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._bytes = 0
+            for key in list(self._spilled):
+                self._drop_spilled(key)
+
+    def configure(self, max_bytes=None, spill=None, max_spill_bytes=None):
+        """Change the budgets or spilling; entries over a smaller budget are evicted right away."""
+        with self._lock:
+            if max_bytes is not None:
+                self.max_bytes = max_bytes
+            if spill is not None:
+                self.spill = spill
+                if not spill:
+                    for key in list(self._spilled):
+                        self._drop_spilled(key)
+            if max_spill_bytes is not None:
+                self.max_spill_bytes = max_spill_bytes
+            # In place, so the recency order is kept
+            self._evict_memory()
+            self._evict_spilled()
+
+    def stats(self):
+        """Return hit/miss/eviction counters and sizes."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'spillHits': self.spill_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'spills': self.spills,
+                'memoryEntries': len(self._memory),
+                'memoryBytes': self._bytes,
+                'maxBytes': self.max_bytes,
+                'spilledEntries': len(self._spilled),
+                'spilledBytes': self._spill_bytes,
+            }
@@ -0,0 +1,192 @@
+"""
+Matplotlib rendering of the desktop app's plots as PNG data URLs.
+
+Pure functions of plain data (no API state, no pyplot), so they can run in
+worker processes: app.API pre-renders every board and channel plot on a
+process pool after an analysis.
+
+Building a figure (axes, labels, grid, reference lines, layout) costs more
+than drawing the data, so each thread keeps one pre-laid-out figure per
+layout and a render only updates line data, titles and reference lines.
+
+Renders take dpi and fmt: app.API shows a quick low-dpi (or SVG) preview
+while the full PNG renders, and exports in any of EXPORT_FORMATS.
+"""
+import io
+import base64
+import threading
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib.figure import Figure
+
+# (key, axis label) of the three panels, top to bottom
+PANELS = (('pf', 'Pf'), ('vf', 'Vf'), ('ith', 'Ith'))
+
+# Line colors of the single channel panels
+_CHANNEL_COLORS = {'pf': '#667eea', 'vf': '#764ba2', 'ith': '#f093fb'}
+
+# Resolution of displayed plots and of the quick previews shown while they render
+PLOT_DPI = 120
+PREVIEW_DPI = 48
+
+# Previews of charts with at most this many points (lines x test cycles) are SVG
+SVG_PREVIEW_MAX_POINTS = 100
+
+# Output formats: PNG, SVG and lossless WebP
+EXPORT_FORMATS = ('png', 'svg', 'webp')
+_MIME_TYPES = {'png': 'image/png', 'svg': 'image/svg+xml', 'webp': 'image/webp'}
+
+# Per-thread figure templates: {layout name: template}
+_local = threading.local()
+
+
+def figure_bytes(fig, fmt='png', dpi=PLOT_DPI):
+    """Encode a figure as fmt (one of EXPORT_FORMATS); WebP is lossless."""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown plot format '{fmt}', use one of {', '.join(EXPORT_FORMATS)}")
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format=fmt, dpi=dpi, **({'pil_kwargs': {'lossless': True}} if fmt == 'webp' else {}))
+    return buffer.getvalue()
+
+
+def mime_type(fmt):
+    return _MIME_TYPES[fmt]
+
+
+def _to_data_url(fig, fmt='png', dpi=PLOT_DPI):
+    image_base64 = base64.b64encode(figure_bytes(fig, fmt, dpi)).decode()
+    return f'data:{_MIME_TYPES[fmt]};base64,{image_base64}'
+
+
+class _FigureTemplate:
+    """
+    Three stacked panels with labels, grid, board mean and ±2σ lines laid out once.
+    Margins are fixed instead of tight_layout() so the layout never has to be recomputed.
+    """
+
+    def __init__(self, figsize):
+        self.fig = Figure(figsize=figsize)
+        self.axs = self.fig.subplots(3, 1)
+        self.fig.subplots_adjust(left=0.1, right=0.97, bottom=0.05, top=0.96, hspace=0.3)
+        self.refs = []  # (mean, upper, lower) reference lines per panel
+        for ax, (_, label) in zip(self.axs, PANELS):
+            ax.set_xlabel('Test Cycle')
+            ax.set_ylabel(label)
+            ax.grid(True, alpha=0.3)
+            self.refs.append((
+                ax.axhline(y=0, color='red', linestyle='--', alpha=0.5, label='Overall Mean'),
+                ax.axhline(y=0, color='orange', linestyle=':', alpha=0.5, label='±2σ'),
+                ax.axhline(y=0, color='orange', linestyle=':', alpha=0.5),
+            ))
+
+    def set_reference(self, panel, mean, std):
+        ref_mean, upper, lower = self.refs[panel]
+        ref_mean.set_ydata([mean, mean])
+        upper.set_ydata([mean + 2*std, mean + 2*std])
+        lower.set_ydata([mean - 2*std, mean - 2*std])
+
+    def finish(self, panel, scalex=True, **legend_kwargs):
+        """Rescale a panel to its visible artists and rebuild its legend."""
+        ax = self.axs[panel]
+        ax.relim(visible_only=True)
+        ax.autoscale_view(scalex=scalex)
+        ax.legend(loc='best', **legend_kwargs)
+
+
+class _BoardTemplate(_FigureTemplate):
+    """All channels of a board; line artists are pooled and hidden when a board has fewer channels."""
+
+    def __init__(self):
+        super().__init__((10, 14))
+        self.lines = [[] for _ in PANELS]
+
+    def line(self, panel, index):
+        pool = self.lines[panel]
+        while len(pool) <= index:
+            pool.append(self.axs[panel].plot([], [], marker='o', color=f'C{len(pool) % 10}')[0])
+        return pool[index]
+
+    def render(self, test_cycles, channels_data, board_stats, channel_stats, dpi, fmt):
+        channels = sorted(channels_data.keys())
+        for panel, (name, label) in enumerate(PANELS):
+            mean = board_stats.get(f'{name}_mean', 0)
+            std = board_stats.get(f'{name}_std', 0)
+            ax = self.axs[panel]
+            ax.set_title(f'{label} over Test (Mean: {mean:.2f} ± {std:.2f})')
+            ax.set_xlim(0.5, len(test_cycles) + 0.5)
+            self.set_reference(panel, mean, std)
+
+            for index, ch in enumerate(channels):
+                is_outlier = channel_stats.get(ch, {}).get(f'is_outlier_{name}', False)
+                line = self.line(panel, index)
+                line.set_data(test_cycles, channels_data[ch][name])
+                line.set_visible(True)
+                # Only show label for outliers
+                line.set_label(f'Channel {ch} (outlier)' if is_outlier else '_nolegend_')
+                line.set_linestyle('--' if is_outlier else '-')
+                line.set_linewidth(3 if is_outlier else 2)
+                line.set_markeredgewidth(2 if is_outlier else 1)
+                line.set_markeredgecolor('red' if is_outlier else line.get_color())
+            for line in self.lines[panel][len(channels):]:
+                line.set_visible(False)
+                line.set_label('_nolegend_')
+
+            self.finish(panel, scalex=False, fontsize=8)
+        return _to_data_url(self.fig, fmt, dpi)
+
+
+class _ChannelTemplate(_FigureTemplate):
+    """One channel against its board's mean and ±2σ band."""
+
+    def __init__(self):
+        super().__init__((8, 12))
+        self.lines = [
+            ax.plot([], [], marker='o', linewidth=2, color=_CHANNEL_COLORS[name], markersize=8)[0]
+            for ax, (name, _) in zip(self.axs, PANELS)
+        ]
+
+    def render(self, channel, data, test_cycles, board_stats, ch_stats, dpi, fmt):
+        for panel, (name, label) in enumerate(PANELS):
+            is_outlier = ch_stats.get(f'is_outlier_{name}', False)
+            title_suffix = " ⚠️ OUTLIER" if is_outlier else ""
+            self.axs[panel].set_title(f'{label} over Test Cycles - Channel {channel}{title_suffix}')
+            self.set_reference(panel, board_stats.get(f'{name}_mean', 0), board_stats.get(f'{name}_std', 0))
+
+            line = self.lines[panel]
+            line.set_data(test_cycles, data[name])
+            line.set_markeredgewidth(2 if is_outlier else 1)
+            line.set_markeredgecolor('red' if is_outlier else _CHANNEL_COLORS[name])
+            self.finish(panel)
+        return _to_data_url(self.fig, fmt, dpi)
+
+
+def _template(layout, reuse):
+    """The calling thread's template for layout ('board' or 'channel'); a new one if not reuse."""
+    cls = _BoardTemplate if layout == 'board' else _ChannelTemplate
+    if not reuse:
+        return cls()
+    templates = _local.__dict__.setdefault('templates', {})
+    if layout not in templates:
+        templates[layout] = cls()
+    return templates[layout]
+
+
+def render_board_plot(test_cycles, channels_data, board_stats, channel_stats, reuse=True, dpi=PLOT_DPI, fmt='png'):
+    """
+    Pf/Vf/Ith of every channel of a board, with the board mean and ±2σ band, as a data URL.
+    channel_stats is {ch: outlier flags} (see stats.board_statistics).
+    reuse=False builds a fresh figure instead of updating this thread's template.
+    """
+    return _template('board', reuse).render(list(test_cycles), channels_data, board_stats, channel_stats, dpi, fmt)
+
+
+def render_channel_plot(channel, data, test_cycles, board_stats, ch_stats, reuse=True, dpi=PLOT_DPI, fmt='png'):
+    """Pf/Vf/Ith of one channel against its board's mean and ±2σ band, as a data URL."""
+    return _template('channel', reuse).render(channel, data, list(test_cycles), board_stats, ch_stats, dpi, fmt)
+
+
+def preview_format(points):
+    """(dpi, fmt) of the quick preview of a chart with this many points."""
+    if points <= SVG_PREVIEW_MAX_POINTS:
+        return PLOT_DPI, 'svg'
+    return PREVIEW_DPI, 'png'
@@ -1,8 +1,9 @@
 from matplotlib import pyplot as plt
 
 def plot_basic(data):
-    #x axis as 5 time test cycles, y axis as Vf, Pf, Ith
-    test_cycles = [1, 2, 3, 4, 5]
+    #x axis as test cycles 1..N, y axis as Vf, Pf, Ith
+    n_cycles = max((len(data[ch]["pf"]) for ch in data), default=0)
+    test_cycles = list(range(1, n_cycles + 1))
     
     fig, axs = plt.subplots(3, 1, figsize=(8, 12))
     axs[0].set_title(f'Pf over Test')
@@ -25,7 +26,7 @@ def plot_basic(data):
     plt.show()
 
 def plot_with_ch(vf, pf, ith):
-    test_cycles = [1, 2, 3, 4, 5]
+    test_cycles = list(range(1, len(pf) + 1))
     fig, axs = plt.subplots(3, 1, figsize=(8, 12))
     axs[0].set_title(f'Pf over Test Cycles')
     axs[0].set_xlabel('Test Cycle')
@@ -1,25 +1,259 @@
 import csv
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import os
+import threading
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import (ThreadPoolExecutor, ProcessPoolExecutor, BrokenExecutor, as_completed, wait,
+                                FIRST_COMPLETED)
+from metrics_cache import get_metrics_cache
+
+try:
+    import numpy as np
+    from sweep_archive import lookup_sweep, lookup_raw_sweep, lookup_batch
+    from metrics import (fit_ith, extract_metrics, metrics_signature, sweep_operating_points,
+                         operating_currents, set_operating_points)
+except ImportError:  # numpy is optional here; fall back to the pure-Python parser
+    np = None
+    lookup_sweep = None
+    lookup_raw_sweep = None
+    lookup_batch = None
+    extract_metrics = None
+
+# Number of header rows before the numeric (cur, power, voltage) block
+HEADER_ROWS = 9
+
+# Parser engine used by _read_single_csv: 'numpy' (bulk load) or 'python' (csv module)
+_parser_engine = 'numpy' if np is not None else 'python'
+
+# Bump when the per-file summary changes so cached entries from older versions are ignored
+SUMMARY_VERSION = 3
 
 # Reusable thread pool for CSV reading - created once, reused across calls
 _executor = None
+_executor_workers = 0
+
+# Execution mode for iter_channel_summaries: 'thread' or 'process' (bypasses the GIL)
+_execution_mode = 'thread'
+_requested_workers = None  # None = default worker count for the mode
+_process_executor = None
+_process_workers = 0
+# Guards the execution mode and pools: the batch scheduler analyzes several lots from
+# threads at once. Reentrant so a caller can read the mode and get its pool in one step.
+_pool_lock = threading.RLock()
+# Callers currently using each pool; a pool replaced by set_execution_mode while in use
+# is kept in _retired_pools and shut down when its last caller is done with it
+_pool_users = {}
+_retired_pools = set()
+
+# Queued file reads per worker in iter_channel_summaries; bounds memory on big lots
+_IN_FLIGHT_PER_WORKER = 4
+
+# CSV paths handed to a worker process at once
+_PROCESS_BATCH_SIZE = 32
 
 def _get_executor():
-    global _executor
-    if _executor is None:
-        import os
-        # Use number of CPUs, but cap at 8 to avoid overwhelming the system
-        max_workers = min(os.cpu_count() or 4, 8)
-        _executor = ThreadPoolExecutor(max_workers=max_workers)
-    return _executor
-
-def _read_single_csv(args):
-    """Read a single CSV file and return raw data. Runs in thread pool."""
+    global _executor, _executor_workers
+    with _pool_lock:
+        if _executor is None:
+            # Use number of CPUs, but cap at 8 to avoid overwhelming the system
+            _executor_workers = _requested_workers or min(os.cpu_count() or 4, 8)
+            _executor = ThreadPoolExecutor(max_workers=_executor_workers)
+        return _executor
+
+def _get_process_executor():
+    global _process_executor, _process_workers
+    with _pool_lock:
+        if _process_executor is not None and _process_executor._broken:
+            # A worker died (killed, out of memory); the pool refuses all new work, so replace it
+            _retire_pool(_process_executor)
+            _process_executor = None
+        if _process_executor is None:
+            # Parsing is CPU bound, so default to one process per core
+            _process_workers = _requested_workers or os.cpu_count() or 4
+            _process_executor = ProcessPoolExecutor(max_workers=_process_workers)
+        return _process_executor
+
+
+def _retire_pool(pool):
+    """Shut pool down now if no caller is using it, else once the last one is done (under _pool_lock)."""
+    if pool in _pool_users:
+        _retired_pools.add(pool)
+    else:
+        pool.shutdown(wait=False)
+
+
+@contextmanager
+def _using_pool(processes=None):
+    """
+    Hold the current thread (or process) pool for the with block and yield
+    (executor, workers); processes=None follows the execution mode.
+    set_execution_mode may replace the pool meanwhile; the held one keeps
+    running its jobs and is shut down after the block.
+    """
+    with _pool_lock:
+        if processes is None:
+            processes = _execution_mode == 'process'
+        if processes:
+            executor, workers = _get_process_executor(), _process_workers
+        else:
+            executor, workers = _get_executor(), _executor_workers
+        _pool_users[executor] = _pool_users.get(executor, 0) + 1
+    try:
+        yield executor, workers
+    finally:
+        with _pool_lock:
+            _pool_users[executor] -= 1
+            if not _pool_users[executor]:
+                del _pool_users[executor]
+                if executor in _retired_pools:
+                    _retired_pools.discard(executor)
+                    executor.shutdown(wait=False)
+
+
+def set_execution_mode(mode='thread', workers=None):
+    """
+    Select how iter_channel_summaries parses files: 'thread' (default) or
+    'process'. workers overrides the pool size (None = default for the mode).
+    Later calls get new pools; analyses already running finish on the old
+    ones, which are shut down when they are done.
+    """
+    global _execution_mode, _requested_workers, _executor, _process_executor
+    if mode not in ('thread', 'process'):
+        raise ValueError(f"Unknown execution mode: {mode}")
+    if workers is not None and workers < 1:
+        raise ValueError("workers must be at least 1")
+    # Same lock as pool creation, so no caller picks up a pool while it is being replaced
+    with _pool_lock:
+        _execution_mode = mode
+        _requested_workers = workers
+        for pool in (_executor, _process_executor):
+            if pool is not None:
+                _retire_pool(pool)
+        _executor = None
+        _process_executor = None
+
+
+def set_parser_engine(engine):
+    """Select the CSV parser engine: 'numpy' or 'python'."""
+    global _parser_engine
+    if engine not in ('numpy', 'python'):
+        raise ValueError(f"Unknown parser engine: {engine}")
+    if engine == 'numpy' and np is None:
+        raise ValueError("numpy is not installed")
+    _parser_engine = engine
+
+
+def _read_single_csv(args, batch=None):
+    """
+    Read a single CSV file and return raw data. Runs in thread pool.
+    Sweeps are taken from the folder's binary archive when one exists and is
+    up to date (see sweep_archive.py); otherwise the CSV is parsed.
+    batch: the file's SweepArchive.batch_results() when the caller already has
+    it (process mode), so the worker doesn't solve the whole archive again.
+    """
+    if lookup_sweep is not None:
+        if batch is not None:
+            archived = lookup_raw_sweep(args[0])
+            if archived is not None:
+                archived += (batch,)
+        else:
+            archived = lookup_sweep(args[0])
+        if archived is not None:
+            cur, power, voltage, date, batch = archived
+            return _summarize_sweep(args[1], cur, power, voltage, date, batch)
+    if _parser_engine == 'numpy':
+        result = _read_single_csv_numpy(args)
+        if result is not None:
+            return result
+    return _read_single_csv_python(args)
+
+
+def _read_single_csv_numpy(args):
+    """
+    Read a single CSV file with one bulk numpy load of the numeric block.
+    Returns the same dict as _read_single_csv_python, with numpy arrays for
+    cur/power/voltage, or None if the file can't be bulk-loaded (the caller
+    then falls back to the csv module parser).
+    """
+    path, test_cycle = args
+    sweep = _load_sweep_numpy(path)
+    if sweep is None:
+        return None
+    return _summarize_sweep(test_cycle, *sweep)
+
+
+def _load_sweep_numpy(path):
+    """(cur, power, voltage, date) of a CSV from one bulk numpy load, or None if it can't be bulk-loaded."""
+    try:
+        with open(path, "r") as f:
+            f.readline()
+            date = next(csv.reader([f.readline()]))[0].split(" ")[-2]
+            block = np.loadtxt(f, delimiter=",", skiprows=HEADER_ROWS - 2,
+                               usecols=(0, 1, 2), ndmin=2)
+    except Exception:
+        return None
+    return block[:, 0], block[:, 1], block[:, 2], date
+
+
+def _read_raw_sweep(path):
+    """
+    (cur, power, voltage, date) of one CSV without computing any metric, for plotting:
+    an archive slice, a bulk numpy load or, failing those, the csv module.
+    """
+    if lookup_raw_sweep is not None:
+        archived = lookup_raw_sweep(path)
+        if archived is not None:
+            return archived
+    if _parser_engine == 'numpy':
+        sweep = _load_sweep_numpy(path)
+        if sweep is not None:
+            return sweep
+    return _load_sweep_python(path)
+
+
+def _load_sweep_python(path):
+    """(cur, power, voltage, date) of a CSV as lists, parsed with the csv module."""
+    with open(path, "r") as f:
+        data = list(csv.reader(f))
+    rows = data[HEADER_ROWS:]
+    return ([float(row[0]) for row in rows], [float(row[1]) for row in rows],
+            [float(row[2]) for row in rows], data[1][0].split(" ")[-2])
+
+
+def _summarize_sweep(test_cycle, cur, power, voltage, date, batch=None):
+    """
+    Compute Vf/Pf/Ith from numpy sweep arrays. Returns the _read_single_csv result dict.
+    batch holds values already computed for a whole archive in one pass:
+    {'ith': (ith, r2, n), 'points': (vf, pf, extra operating points)}.
+    """
+    batch = batch or {}
+    result = {
+        'test_cycle': test_cycle,
+        'cur': cur, 'power': power, 'voltage': voltage,
+        'vf': 0, 'pf': 0, 'date': date, 'ith': 0
+    }
+    # Vf/Pf at the operating current: exact row if the sweep has one, else interpolated
+    vf, pf, points = batch.get('points') or sweep_operating_points(cur, power, voltage)
+    result['vf'] = vf
+    result['pf'] = pf
+    # Calculate Ith using linear regression on filtered data (power 100-500)
+    ith, r2, n = batch.get('ith') or fit_ith(cur, power)
+    result['ith'] = ith
+    # Registered extractors (metrics.py) run over the same arrays; fit quality flags bad Ith fits
+    result['metrics'] = extract_metrics(cur, power, voltage)
+    result['metrics']['ith_r2'] = r2
+    result['metrics']['ith_n'] = n
+    result['metrics'].update(points)
+    return result
+
+
+def _read_single_csv_python(args):
+    """Read a single CSV file with the csv module, one row at a time."""
     path, test_cycle = args
     result = {
         'test_cycle': test_cycle,
         'cur': [], 'power': [], 'voltage': [],
-        'vf': 0, 'pf': 0, 'date': '', 'ith': 0
+        'vf': 0, 'pf': 0, 'date': '', 'ith': 0, 'metrics': {}
     }
     try:
         with open(path, "r") as f:
@@ -42,44 +276,345 @@ def _read_single_csv(args):
         ith_pow = [result['power'][i] for i in range(len(result['power'])) if 500 >= result['power'][i] >= 100]
         ith_corr = CalIth(ith_cur, ith_pow)
         result['ith'] = -ith_corr[1] / ith_corr[0] if ith_corr[0] != 0 else 0
+        if extract_metrics is not None:
+            cur, power, voltage = np.asarray(result['cur']), np.asarray(result['power']), np.asarray(result['voltage'])
+            result['metrics'] = extract_metrics(cur, power, voltage)
+            _, result['metrics']['ith_r2'], result['metrics']['ith_n'] = fit_ith(cur, power)
+            # Configured operating points replace the exact 7.5 A match above
+            result['vf'], result['pf'], points = sweep_operating_points(cur, power, voltage)
+            result['metrics'].update(points)
     except Exception as e:
         print(f"Error reading {path}: {e}")
+        result['error'] = str(e)
     return result
 
 
-def collect_data_with_test_cycle(path_list: dict):
+def _summary_signature():
+    """Identifies how cached summaries were computed; a mismatch is a cache miss."""
+    if extract_metrics is None:
+        return f"v{SUMMARY_VERSION}"
+    return f"v{SUMMARY_VERSION}:{metrics_signature()}"
+
+
+def _file_summary(result):
+    """The per-file summary kept in the metrics cache: vf, pf, ith, date and extra metrics."""
+    return {
+        'vf': result['vf'],
+        'pf': result['pf'],
+        'ith': result['ith'],
+        'date': result['date'],
+        'metrics': result.get('metrics', {}),
+    }
+
+
+def _cycle_entry(summary):
+    """A file summary in the per-test-cycle format of collect_summary_with_test_cycle."""
+    return {
+        'Vf': summary['vf'],
+        'Pf': summary['pf'],
+        'ith': summary['ith'],
+        'date': summary['date'],
+        'metrics': summary.get('metrics', {}),
+    }
+
+
+def _read_csv_summary(args):
+    """
+    Return only the per-file summary (vf, pf, ith, date, metrics) for one CSV.
+    Unchanged files (same path, size and mtime) are served from the metrics cache.
+    """
+    path, test_cycle = args
+    cache = get_metrics_cache()
+    signature = _summary_signature()
+    key = cache.stat_key(path)
+    cached = cache.get(path, signature, key=key)
+    if cached is not None:
+        return dict(cached, test_cycle=test_cycle)
+
+    result = _read_single_csv(args)
+    summary = _file_summary(result)
+    if key is not None and 'error' not in result:
+        cache.put(path, summary, signature, key=key)
+    return dict(summary, test_cycle=test_cycle)
+
+
+def discover_channel_files(folders, first_cycle=1):
     """
-    Read 5 CSV files in parallel using thread pool.
-    path_list: dict with keys 1-5 mapping to file paths.
-    Returns: dict with keys 1-5 containing summary data for each test cycle.
+    Map the CSVs of test cycle folders to {board: {ch: {test_cycle: path}}}.
+    folders[i] is test cycle first_cycle + i and must contain <folder>-1/*.csv.
+    CSVs whose names don't encode a board and channel are skipped with a warning.
+    Raises FileNotFoundError for a missing subfolder or a folder without CSVs.
     """
-    executor = _get_executor()
+    board_ch_csv_list = {}
+    for offset, folder_path in enumerate(folders):
+        test_cycle = first_cycle + offset
+        subfolder = os.path.join(folder_path, f"{os.path.basename(os.path.normpath(folder_path))}-1")
+        if not os.path.exists(subfolder):
+            raise FileNotFoundError(f'Subfolder {subfolder} not found for Test Cycle {test_cycle}')
 
-    # Submit all 5 CSV reads in parallel
-    args_list = [(path_list[tc], tc) for tc in range(1, 6)]
-    futures = {executor.submit(_read_single_csv, args): args for args in args_list}
+        csv_files = [f for f in os.listdir(subfolder) if f.endswith('.csv')]
+        if not csv_files:
+            raise FileNotFoundError(f'No CSV files found in {subfolder}')
 
-    temp_summary = {x: {} for x in range(1, 6)}
+        for ch_csv in csv_files:
+            try:
+                # Extract board (as string)
+                board = ch_csv.split("_")[0][5:]
+                # Extract channel number
+                ch = int((ch_csv.split("_")[-1].split(".")[0])[2:])
+            except (ValueError, IndexError):
+                print(f"Warning: Skipping invalid CSV filename: {ch_csv}")
+                continue
+            board_ch_csv_list.setdefault(board, {}).setdefault(ch, {})[test_cycle] = os.path.join(subfolder, ch_csv)
+    return board_ch_csv_list
 
-    # Collect results as they complete
-    for future in as_completed(futures):
-        result = future.result()
-        tc = result['test_cycle']
-        temp_summary[tc] = {
-            'Cur': result['cur'],
-            'Power': result['power'],
-            'Voltage': result['voltage'],
-            'Vf': result['vf'],
-            'Pf': result['pf'],
-            'ith': result['ith'],
-            'date': result['date'],
-            'ithCor': [0, 0],
-            'fpoint': 0
+
+class RawCurve:
+    """Lazy handle to one test cycle's raw sweep. Nothing is read until load() is called."""
+    __slots__ = ('path', 'test_cycle')
+
+    def __init__(self, path, test_cycle):
+        self.path = path
+        self.test_cycle = test_cycle
+
+    def load(self):
+        """Read the sweep (from the folder's archive if any) and return Cur/Power/Voltage and date."""
+        cur, power, voltage, date = _read_raw_sweep(self.path)
+        return {
+            'Cur': cur,
+            'Power': power,
+            'Voltage': voltage,
+            'date': date,
         }
 
+
+def collect_data_with_test_cycle(path_list: dict, summary_only=False):
+    """
+    Read one CSV file per test cycle in parallel using thread pool.
+    path_list: dict mapping test cycle numbers (1..N) to file paths.
+    Returns: dict with the same keys containing summary data for each test cycle.
+    With summary_only=True the raw sweeps are never kept: each cycle holds
+    Vf/Pf/ith/date plus a 'raw' RawCurve handle to load its sweep later.
+    """
+    if summary_only:
+        temp_summary = collect_summary_with_test_cycle(path_list)
+        for tc in temp_summary:
+            temp_summary[tc]['raw'] = RawCurve(path_list[tc], tc)
+        return temp_summary
+
+    temp_summary = {x: {} for x in sorted(path_list)}
+    with _using_pool(processes=False) as (executor, _):
+        # Submit all CSV reads in parallel
+        args_list = [(path_list[tc], tc) for tc in sorted(path_list)]
+        futures = {executor.submit(_read_single_csv, args): args for args in args_list}
+
+        # Collect results as they complete
+        for future in as_completed(futures):
+            result = future.result()
+            tc = result['test_cycle']
+            temp_summary[tc] = {
+                'Cur': result['cur'],
+                'Power': result['power'],
+                'Voltage': result['voltage'],
+                'Vf': result['vf'],
+                'Pf': result['pf'],
+                'ith': result['ith'],
+                'date': result['date'],
+                'metrics': result.get('metrics', {}),
+                'ithCor': [0, 0],
+                'fpoint': 0
+            }
+
     return temp_summary
 
 
+def collect_summary_with_test_cycle(path_list: dict):
+    """
+    Like collect_data_with_test_cycle, but only returns the per-cycle summary
+    (Vf, Pf, ith, date, metrics) and serves unchanged files from the metrics cache.
+    """
+    temp_summary = {x: {} for x in sorted(path_list)}
+    with _using_pool(processes=False) as (executor, _):
+        futures = [executor.submit(_read_csv_summary, (path_list[tc], tc)) for tc in sorted(path_list)]
+        for future in as_completed(futures):
+            result = future.result()
+            temp_summary[result['test_cycle']] = _cycle_entry(result)
+    return temp_summary
+
+
+def channel_metrics(temp_summary):
+    """
+    Collapse a channel's per-cycle summary into vf, pf, ith lists ordered by test cycle,
+    plus one list per registered extra metric (see metrics.py).
+    """
+    vf = []
+    pf = []
+    ith = []
+    extra = {}
+    for test_cycle in sorted(temp_summary):
+        vf.append(temp_summary[test_cycle]["Vf"])
+        pf.append(temp_summary[test_cycle]["Pf"])
+        ith.append(temp_summary[test_cycle]["ith"])
+        for name, value in temp_summary[test_cycle].get("metrics", {}).items():
+            extra.setdefault(name, []).append(value)
+    result = {
+        'vf': vf,
+        'pf': pf,
+        'ith': ith
+    }
+    for name, values in extra.items():
+        if len(values) == len(vf):
+            result[name] = values
+    return result
+
+
+def _read_summary_batch(batch, currents=None):
+    """
+    Process-pool worker: parse a batch of (path, test_cycle, archive batch
+    results or None) and return one compact (summary, ok) pair per file, so
+    no sweep data is pickled. currents is the parent's operating_currents(),
+    applied here first.
+    """
+    if currents is not None and currents != operating_currents():
+        set_operating_points(currents[0], currents[1:])
+    out = []
+    for path, test_cycle, archived in batch:
+        result = _read_single_csv((path, test_cycle), archived)
+        out.append((_file_summary(result), 'error' not in result))
+    return out
+
+
+def iter_channel_summaries(channel_tasks, test_cycles=None, cancel=None):
+    """
+    Read every (board, channel, test cycle) file through one bounded work queue.
+
+    channel_tasks: iterable of (board, ch, path_list), path_list as in
+    collect_data_with_test_cycle. test_cycles lists the cycles every channel
+    must have (a channel missing one fails); None means whatever path_list has. All file reads go straight into one pool (no
+    per-channel pool), with at most a few reads per worker queued at a time.
+    In 'process' mode (see set_execution_mode) cache hits are served here and
+    misses are parsed in batches by worker processes. Yields (board, ch,
+    temp_summary, error) as soon as the last cycle of a channel completes;
+    temp_summary is the collect_summary_with_test_cycle dict, or None if the
+    channel failed.
+    cancel: optional threading.Event. Once set, queued reads are cancelled,
+    nothing new is submitted and the generator stops; reads already running
+    finish in the background and are discarded.
+    Raises concurrent.futures.BrokenExecutor if a worker process dies; the
+    next call gets a new pool.
+    """
+    # Hold the pool until the generator is done, so set_execution_mode can't shut it down under it
+    with _using_pool() as (executor, workers):
+        yield from _channel_summaries_on(executor, workers * _IN_FLIGHT_PER_WORKER,
+                                         channel_tasks, test_cycles, cancel)
+
+
+def _channel_summaries_on(executor, max_in_flight, channel_tasks, test_cycles, cancel):
+    """iter_channel_summaries on executor, with at most max_in_flight units of work queued."""
+    use_processes = isinstance(executor, ProcessPoolExecutor)
+    if use_processes:
+        cache = get_metrics_cache()
+        signature = _summary_signature()
+
+    pending_reads = iter(
+        (board, ch, tc, path_list.get(tc), cycles)
+        for board, ch, path_list in channel_tasks
+        for cycles in [list(test_cycles) if test_cycles is not None else sorted(path_list)]
+        for tc in cycles
+    )
+    channels = {}  # {(board, ch): [remaining reads, temp_summary, error]}
+    in_flight = {}  # {future: [(board, ch, tc, path, stat key), ...]}
+    finished = deque()  # completed channels waiting to be yielded
+
+    def record(key, tc, summary):
+        channels[key][1][tc] = _cycle_entry(summary)
+
+    def complete(key, error=None):
+        state = channels[key]
+        state[0] -= 1
+        if error is not None:
+            state[2] = error
+        if state[0] == 0:
+            del channels[key]
+            finished.append((key[0], key[1], state[1] if state[2] is None else None, state[2]))
+
+    def submit_next():
+        """Submit one more unit of work (a read, or a batch in process mode). False when exhausted."""
+        batch = []
+        for board, ch, tc, path, cycles in pending_reads:
+            key = (board, ch)
+            if key not in channels:
+                channels[key] = [len(cycles), {x: {} for x in cycles}, None]
+            if path is None:
+                complete(key, f'missing file for test cycle {tc}')
+                continue
+            if not use_processes:
+                in_flight[executor.submit(_read_csv_summary, (path, tc))] = [(board, ch, tc, path, None)]
+                return True
+            stat_key = cache.stat_key(path)
+            cached = cache.get(path, signature, key=stat_key)
+            if cached is not None:
+                record(key, tc, cached)
+                complete(key)
+                continue
+            batch.append((board, ch, tc, path, stat_key))
+            if len(batch) >= _PROCESS_BATCH_SIZE:
+                break
+        if batch:
+            # Archived files get their archive-wide fits here, solved once per archive in this
+            # process instead of once per worker
+            work = [(path, tc, lookup_batch(path) if lookup_batch is not None else None)
+                    for board, ch, tc, path, stat_key in batch]
+            in_flight[executor.submit(_read_summary_batch, work, operating_currents())] = batch
+            return True
+        return False
+
+    def fill():
+        while len(in_flight) < max_in_flight and submit_next():
+            pass
+
+    fill()
+    while in_flight or finished:
+        if cancel is not None and cancel.is_set():
+            for future in in_flight:
+                future.cancel()
+            return
+        if in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                items = in_flight.pop(future)
+                try:
+                    results = future.result()
+                except BrokenExecutor:
+                    # Not the files' fault: fail the whole run rather than report its channels as bad
+                    for other in in_flight:
+                        other.cancel()
+                    raise
+                except Exception as e:
+                    for board, ch, tc, path, stat_key in items:
+                        complete((board, ch), str(e))
+                    continue
+                if not use_processes:
+                    board, ch, tc = items[0][:3]
+                    record((board, ch), tc, results)
+                    complete((board, ch))
+                    continue
+                for (board, ch, tc, path, stat_key), (summary, ok) in zip(items, results):
+                    if ok and stat_key is not None:
+                        cache.put(path, summary, signature, key=stat_key)
+                    record((board, ch), tc, summary)
+                    complete((board, ch))
+            fill()
+        while finished:
+            if cancel is not None and cancel.is_set():
+                for future in in_flight:
+                    future.cancel()
+                return
+            yield finished.popleft()
+        if not in_flight:
+            fill()
+
+
 def CalIth(LD, PD):
     """
     Calculate the Ith value using the given LD and PD lists.
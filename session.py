@@ -0,0 +1,127 @@
+"""
+Saved analysis sessions: everything app.API needs to show an analysis again
+without reading a CSV.
+
+A session file (.tcsession) is an uncompressed numpy .npz archive:
+    header        JSON (as uint8): version, folders, test cycles, current board, metric names,
+                  channel keys, CSV paths per channel, CSV (size, mtime_ns) at analysis time,
+                  metrics signature and the keys/MIME types of saved plots
+    values        float64 (channels, cycles, metrics) per-channel metrics, NaN-padded
+    present       bool (channels, metrics): the channel has this metric
+    lengths       int64 (channels,) test cycles per channel
+    plot_data     uint8, the saved plot images back to back
+    plot_offsets  int64 (plots + 1,) start of each image in plot_data
+
+Statistics are not stored: they are recomputed in one vectorized pass on load
+(stats.MetricCube), which is cheaper than reading them.
+"""
+import os
+import json
+import base64
+import numpy as np
+
+SESSION_SUFFIX = '.tcsession'
+SESSION_VERSION = 1
+
+
+def save_session(path, state, plots=None):
+    """
+    Write a session file. state has 'selected_folders', 'analyzed_folders', 'test_cycles',
+    'current_board', 'boards_data' ({board: {ch: {metric: [values per cycle]}}}),
+    'channel_paths' ({(board, ch): {test_cycle: csv_path}}), 'csv_stats'
+    ({csv_path: (size, mtime_ns)}) and 'metrics_signature'. plots is
+    {(board, view): data URL} of rendered plots to keep.
+    """
+    keys = [(board, ch) for board in sorted(state['boards_data'], key=str)
+            for ch in sorted(state['boards_data'][board])]
+    entries = [state['boards_data'][board][ch] for board, ch in keys]
+    names = sorted({name for data in entries for name in data})
+    int_names = [name for name in names
+                 if all(isinstance(v, int) for data in entries for v in data.get(name, ()))]
+    lengths = np.array([max((len(values) for values in data.values()), default=0) for data in entries],
+                       dtype=np.int64)
+    values = np.full((len(keys), int(lengths.max()) if lengths.size else 0, len(names)), np.nan)
+    present = np.zeros((len(keys), len(names)), dtype=bool)
+    for i, data in enumerate(entries):
+        for m, name in enumerate(names):
+            column = data.get(name)
+            if column is not None:
+                values[i, :len(column), m] = column
+                present[i, m] = True
+
+    plot_keys, mime_types, blobs = [], [], []
+    for key, data_url in sorted((plots or {}).items()):
+        prefix, encoded = data_url.split(',', 1)
+        plot_keys.append(list(key))
+        mime_types.append(prefix[len('data:'):-len(';base64')])
+        blobs.append(np.frombuffer(base64.b64decode(encoded), dtype=np.uint8))
+    plot_offsets = np.cumsum([0] + [len(blob) for blob in blobs], dtype=np.int64)
+
+    header = {
+        'version': SESSION_VERSION,
+        'selectedFolders': state['selected_folders'],
+        'analyzedFolders': state['analyzed_folders'],
+        'testCycles': state['test_cycles'],
+        'currentBoard': state['current_board'],
+        'metricsSignature': state['metrics_signature'],
+        'metrics': names,
+        'intMetrics': int_names,
+        'channels': [[board, ch] for board, ch in keys],
+        'channelPaths': [sorted(state['channel_paths'].get(key, {}).items()) for key in keys],
+        'csvStats': sorted([path, size, mtime_ns] for path, (size, mtime_ns) in state['csv_stats'].items()),
+        'plots': plot_keys,
+        'plotTypes': mime_types,
+    }
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(f,
+                 header=np.frombuffer(json.dumps(header).encode('utf-8'), dtype=np.uint8),
+                 values=values, present=present, lengths=lengths,
+                 plot_data=np.concatenate(blobs) if blobs else np.zeros(0, dtype=np.uint8),
+                 plot_offsets=plot_offsets)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_session(path):
+    """
+    Read a session file. Returns the state dict taken by save_session, plus
+    'plots' ({(board, view): data URL}).
+    """
+    with np.load(path, allow_pickle=False) as archive:
+        header = json.loads(archive['header'].tobytes().decode('utf-8'))
+        if header.get('version') != SESSION_VERSION:
+            raise ValueError(f"Unsupported session version {header.get('version')} in {path}")
+        values, present, lengths = archive['values'], archive['present'], archive['lengths']
+        plot_data, plot_offsets = archive['plot_data'], archive['plot_offsets']
+
+    names = header['metrics']
+    int_names = set(header['intMetrics'])
+    boards_data, channel_paths = {}, {}
+    rows = values.tolist()
+    for i, ((board, ch), paths) in enumerate(zip(header['channels'], header['channelPaths'])):
+        length = int(lengths[i])
+        data = {}
+        for m, name in enumerate(names):
+            if present[i, m]:
+                column = [row[m] for row in rows[i][:length]]
+                data[name] = [int(v) for v in column] if name in int_names else column
+        boards_data.setdefault(board, {})[ch] = data
+        channel_paths[(board, ch)] = {int(test_cycle): csv_path for test_cycle, csv_path in paths}
+
+    plots = {}
+    for i, (key, mime) in enumerate(zip(header['plots'], header['plotTypes'])):
+        encoded = base64.b64encode(plot_data[plot_offsets[i]:plot_offsets[i + 1]].tobytes()).decode()
+        plots[tuple(key)] = f'data:{mime};base64,{encoded}'
+
+    return {
+        'selected_folders': header['selectedFolders'],
+        'analyzed_folders': header['analyzedFolders'],
+        'test_cycles': header['testCycles'],
+        'current_board': header['currentBoard'],
+        'metrics_signature': header['metricsSignature'],
+        'boards_data': boards_data,
+        'channel_paths': channel_paths,
+        'csv_stats': {csv_path: (size, mtime_ns) for csv_path, size, mtime_ns in header['csvStats']},
+        'plots': plots,
+    }
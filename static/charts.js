@@ -0,0 +1,208 @@
+// Canvas charts of Pf / Vf / Ith over test cycles, drawn in the browser from the
+// compact series built by stats.chart_payload(). Served by web_app as
+// /static/charts.js and inlined into the desktop page by app.get_html().
+
+const CHART_METRICS = [['pf', 'Pf'], ['vf', 'Vf'], ['ith', 'Ith']];
+const CHART_COLORS = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd',
+                      '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf'];
+const SINGLE_CHANNEL_COLORS = {pf: '#667eea', vf: '#764ba2', ith: '#f093fb'};
+const CHART_HEIGHT = 320;
+const CHART_MARGIN = {left: 64, right: 16, top: 34, bottom: 42};
+
+// Draw the three metric charts of one board into container.
+// channel is 'all' (every channel of the board) or a channel number.
+function renderCharts(container, payload, channel = 'all') {
+    container.innerHTML = '';
+    container.classList.add('chart-container');
+    container._chartArgs = [payload, channel];
+    const single = channel !== 'all';
+    const channels = single ? payload.channels.filter(c => c.channel === Number(channel)) : payload.channels;
+    CHART_METRICS.forEach(([key, label]) => {
+        const canvas = document.createElement('canvas');
+        canvas.className = 'chart-canvas';
+        canvas.style.width = '100%';
+        canvas.style.height = `${CHART_HEIGHT}px`;
+        canvas.style.display = 'block';
+        container.appendChild(canvas);
+        const stats = payload.stats[key];
+        const outlier = single && channels.length && channels[0].outlier[key];
+        drawMetricChart(canvas, {
+            title: single
+                ? `${label} over Test Cycles - Channel ${channel}${outlier ? ' ⚠️ OUTLIER' : ''}`
+                : `${label} over Test (Mean: ${stats.mean.toFixed(2)} ± ${stats.std.toFixed(2)})`,
+            label: label,
+            cycles: payload.testCycles,
+            mean: stats.mean,
+            std: stats.std,
+            sigma: payload.sigma,
+            series: channels.map((c, i) => ({
+                name: `Channel ${c.channel}`,
+                values: c[key],
+                outlier: c.outlier[key],
+                color: single ? SINGLE_CHANNEL_COLORS[key] : CHART_COLORS[i % CHART_COLORS.length],
+            })),
+            single: single,
+        });
+    });
+}
+
+// Redraw every chart container at its new width
+window.addEventListener('resize', () => {
+    document.querySelectorAll('.chart-container').forEach(container => {
+        if (container._chartArgs) {
+            renderCharts(container, ...container._chartArgs);
+        }
+    });
+});
+
+function niceTicks(min, max, count) {
+    const span = max - min;
+    const raw = span / count;
+    const magnitude = Math.pow(10, Math.floor(Math.log10(raw)));
+    const step = [1, 2, 2.5, 5, 10].map(f => f * magnitude).find(s => span / s <= count) || 10 * magnitude;
+    const ticks = [];
+    for (let v = Math.ceil(min / step) * step; v <= max + step * 1e-9; v += step) {
+        ticks.push(Math.abs(v) < step * 1e-9 ? 0 : v);
+    }
+    return {ticks, step};
+}
+
+function drawMetricChart(canvas, opts) {
+    const ratio = window.devicePixelRatio || 1;
+    const width = canvas.clientWidth || 800;
+    const height = CHART_HEIGHT;
+    canvas.width = width * ratio;
+    canvas.height = height * ratio;
+    const ctx = canvas.getContext('2d');
+    ctx.scale(ratio, ratio);
+    ctx.clearRect(0, 0, width, height);
+
+    const m = CHART_MARGIN;
+    const plotW = width - m.left - m.right;
+    const plotH = height - m.top - m.bottom;
+    const n = opts.cycles.length;
+
+    // Y range covers every point and the ±sigma band
+    const band = opts.sigma * opts.std;
+    let lo = opts.mean - band, hi = opts.mean + band;
+    opts.series.forEach(s => s.values.forEach(v => { lo = Math.min(lo, v); hi = Math.max(hi, v); }));
+    if (hi - lo < 1e-12) { lo -= 1; hi += 1; }
+    const pad = (hi - lo) * 0.05;
+    lo -= pad; hi += pad;
+
+    const x = cycle => m.left + (cycle - 0.5) / n * plotW;
+    const y = value => m.top + (hi - value) / (hi - lo) * plotH;
+
+    // Title
+    ctx.fillStyle = '#333';
+    ctx.font = '14px sans-serif';
+    ctx.textAlign = 'center';
+    ctx.fillText(opts.title, m.left + plotW / 2, 20);
+
+    // Grid and axes
+    const {ticks, step} = niceTicks(lo, hi, 6);
+    const decimals = (String(+step.toPrecision(6)).split('.')[1] || '').length;
+    ctx.font = '11px sans-serif';
+    ctx.strokeStyle = 'rgba(0, 0, 0, 0.1)';
+    ctx.lineWidth = 1;
+    ctx.textAlign = 'right';
+    ctx.textBaseline = 'middle';
+    ctx.fillStyle = '#555';
+    ticks.forEach(t => {
+        ctx.beginPath();
+        ctx.moveTo(m.left, y(t));
+        ctx.lineTo(m.left + plotW, y(t));
+        ctx.stroke();
+        ctx.fillText(t.toFixed(decimals), m.left - 6, y(t));
+    });
+    ctx.textAlign = 'center';
+    ctx.textBaseline = 'top';
+    const every = Math.ceil(n / Math.max(1, Math.floor(plotW / 40)));
+    opts.cycles.forEach((c, i) => {
+        ctx.beginPath();
+        ctx.moveTo(x(i + 1), m.top);
+        ctx.lineTo(x(i + 1), m.top + plotH);
+        ctx.stroke();
+        if (i % every === 0) {
+            ctx.fillText(String(c), x(i + 1), m.top + plotH + 6);
+        }
+    });
+    ctx.strokeStyle = '#333';
+    ctx.strokeRect(m.left, m.top, plotW, plotH);
+    ctx.fillText('Test Cycle', m.left + plotW / 2, height - 16);
+    ctx.save();
+    ctx.translate(14, m.top + plotH / 2);
+    ctx.rotate(-Math.PI / 2);
+    ctx.textBaseline = 'middle';
+    ctx.fillText(opts.label, 0, 0);
+    ctx.restore();
+
+    // Board mean and ±sigma band
+    const hline = (value, color, dash) => {
+        ctx.save();
+        ctx.globalAlpha = 0.5;
+        ctx.strokeStyle = color;
+        ctx.setLineDash(dash);
+        ctx.beginPath();
+        ctx.moveTo(m.left, y(value));
+        ctx.lineTo(m.left + plotW, y(value));
+        ctx.stroke();
+        ctx.restore();
+    };
+    hline(opts.mean, 'red', [6, 4]);
+    hline(opts.mean + band, 'orange', [2, 3]);
+    hline(opts.mean - band, 'orange', [2, 3]);
+
+    // Channel series; outliers dashed, thicker and with red markers
+    ctx.save();
+    ctx.beginPath();
+    ctx.rect(m.left, m.top, plotW, plotH);
+    ctx.clip();
+    opts.series.forEach(s => {
+        ctx.strokeStyle = s.color;
+        ctx.lineWidth = s.outlier && !opts.single ? 3 : 2;
+        ctx.setLineDash(s.outlier && !opts.single ? [6, 4] : []);
+        ctx.beginPath();
+        s.values.forEach((v, i) => (i ? ctx.lineTo : ctx.moveTo).call(ctx, x(i + 1), y(v)));
+        ctx.stroke();
+        ctx.setLineDash([]);
+        s.values.forEach((v, i) => {
+            ctx.beginPath();
+            ctx.arc(x(i + 1), y(v), opts.single ? 5 : 4, 0, 2 * Math.PI);
+            ctx.fillStyle = s.color;
+            ctx.fill();
+            if (s.outlier) {
+                ctx.strokeStyle = 'red';
+                ctx.lineWidth = 2;
+                ctx.stroke();
+            }
+        });
+    });
+    ctx.restore();
+
+    // Legend: mean, band and outlier channels
+    const entries = [['Overall Mean', 'red', [6, 4]], [`±${opts.sigma}σ`, 'orange', [2, 3]]];
+    if (!opts.single) {
+        opts.series.filter(s => s.outlier).forEach(s => entries.push([`${s.name} (outlier)`, s.color, [6, 4]]));
+    }
+    ctx.font = '11px sans-serif';
+    ctx.textAlign = 'left';
+    ctx.textBaseline = 'middle';
+    const legendW = Math.max(...entries.map(e => ctx.measureText(e[0]).width)) + 40;
+    const legendX = m.left + plotW - legendW - 8;
+    ctx.fillStyle = 'rgba(255, 255, 255, 0.85)';
+    ctx.fillRect(legendX, m.top + 6, legendW, entries.length * 16 + 6);
+    entries.forEach(([text, color, dash], i) => {
+        const ly = m.top + 15 + i * 16;
+        ctx.strokeStyle = color;
+        ctx.lineWidth = 2;
+        ctx.setLineDash(dash);
+        ctx.beginPath();
+        ctx.moveTo(legendX + 6, ly);
+        ctx.lineTo(legendX + 28, ly);
+        ctx.stroke();
+        ctx.setLineDash([]);
+        ctx.fillStyle = '#333';
+        ctx.fillText(text, legendX + 34, ly);
+    });
+}
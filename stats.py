@@ -0,0 +1,239 @@
+"""
+Board statistics shared by the desktop app and the web app.
+
+Per board: the mean and std of the per-channel means of Pf, Vf and Ith, and
+per channel a flag for each metric whose mean lies more than OUTLIER_SIGMA
+standard deviations from the board mean. Robust counterparts use the median
+and MAD (median absolute deviation) of the channel means, which a few bad
+channels can't drag along.
+
+All channels of all boards are packed into one MetricCube
+(board x channel x cycle x metric) and solved in one vectorized pass.
+DriftIndex ranks every channel by how much it degrades over the test cycles.
+"""
+import warnings
+import numpy as np
+
+# Channels further than this many std from the board mean are outliers
+OUTLIER_SIGMA = 2
+
+# Direction in which each metric degrades over test cycles (Pf falls, Vf and Ith rise)
+DEGRADATION_SIGN = {'pf': -1, 'vf': 1, 'ith': 1}
+
+# Channels whose robust z-score (0.6745 * deviation from the median / MAD, or deviation /
+# (1.2533 * mean absolute deviation) when MAD is 0) exceeds this are robust outliers
+ROBUST_SIGMA = 3.5
+_MAD_SCALE = 0.6745  # MAD of a normal distribution in units of its std
+_MEAN_AD_SCALE = 1.2533  # std of a normal distribution in units of its mean absolute deviation
+
+# Metrics that get board statistics and outlier flags
+STAT_METRICS = ('pf', 'vf', 'ith')
+
+
+class MetricCube:
+    """
+    STAT_METRICS of every channel of every board in one array.
+
+    values is float64 (boards, channels, cycles, metrics); boards with fewer
+    channels or channels with fewer cycles are padded and masked out by
+    channel_mask (boards, channels) and cycle_mask (boards, channels, cycles).
+    boards is the board order along axis 0, channels[b] the channel numbers of
+    board b along axis 1.
+    """
+
+    def __init__(self, boards_data, boards=None):
+        self.boards = sorted(boards_data) if boards is None else [b for b in boards if boards_data.get(b)]
+        self.channels = [sorted(boards_data[board]) for board in self.boards]
+        entries = [boards_data[board][ch] for board, chs in zip(self.boards, self.channels) for ch in chs]
+        lengths = np.array([len(data[STAT_METRICS[0]]) for data in entries], dtype=np.int64)
+        n_boards = len(self.boards)
+        n_channels = max((len(chs) for chs in self.channels), default=0)
+        n_cycles = int(lengths.max()) if lengths.size else 0
+
+        # Flat (board, channel) positions of every entry
+        board_index = np.repeat(np.arange(n_boards), [len(chs) for chs in self.channels])
+        channel_index = np.concatenate([np.arange(len(chs)) for chs in self.channels]) if entries else np.zeros(0, int)
+
+        self.values = np.zeros((n_boards, n_channels, n_cycles, len(STAT_METRICS)))
+        self.channel_mask = np.zeros((n_boards, n_channels), dtype=bool)
+        self.channel_mask[board_index, channel_index] = True
+        self.cycle_mask = np.zeros((n_boards, n_channels, n_cycles), dtype=bool)
+        self.cycle_mask[board_index, channel_index] = np.arange(n_cycles) < lengths[:, None]
+        if entries and (lengths == n_cycles).all():
+            # Common case: every channel has every cycle - one conversion for the whole lot
+            flat = np.array([[data[name] for name in STAT_METRICS] for data in entries], dtype=np.float64)
+            self.values[board_index, channel_index] = flat.transpose(0, 2, 1)
+        else:
+            for b, c, data, length in zip(board_index, channel_index, entries, lengths):
+                self.values[b, c, :length] = np.array([data[name] for name in STAT_METRICS], dtype=np.float64).T
+
+    def channel_means(self):
+        """Mean over cycles of every channel and metric: (boards, channels, metrics), NaN for padding."""
+        counts = self.cycle_mask.sum(axis=2)[..., None]
+        sums = np.where(self.cycle_mask[..., None], self.values, 0).sum(axis=2)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.channel_mask[..., None], sums / counts, np.nan)
+
+    def statistics(self, threshold=OUTLIER_SIGMA, robust_threshold=ROBUST_SIGMA):
+        """
+        Board and channel statistics of every board in one pass. Returns
+        (board_stats, channel_stats) as {board: {'pf_mean', 'pf_std', 'pf_median', 'pf_mad', ...}}
+        and {(board, ch): {'pf_mean', 'pf_robust_z', 'is_outlier_pf', 'is_robust_outlier_pf', ...}}.
+        """
+        means = self.channel_means()
+        mask = self.channel_mask[..., None]
+        counts = self.channel_mask.sum(axis=1)[:, None]
+        # Boards whose channel means are all NaN get NaN statistics, without numpy's warnings
+        with np.errstate(invalid='ignore', divide='ignore'), warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            board_mean = np.where(mask, means, 0).sum(axis=1) / counts
+            deviation = means - board_mean[:, None]
+            board_std = np.sqrt(np.where(mask, deviation ** 2, 0).sum(axis=1) / counts)
+            board_median = _median_over_channels(means)
+            abs_deviation = np.abs(means - board_median[:, None])
+            board_mad = _median_over_channels(abs_deviation)
+            # MAD is 0 once more than half the channels share the median; the scaled mean
+            # absolute deviation still sees the others (both 0 only if all channels are equal)
+            valid = mask & ~np.isnan(abs_deviation)
+            mean_ad = np.where(valid, abs_deviation, 0).sum(axis=1) / valid.sum(axis=1)
+            scale = np.where(board_mad > 0, board_mad / _MAD_SCALE, _MEAN_AD_SCALE * mean_ad)
+            robust_z = (means - board_median[:, None]) / scale[:, None]
+        robust_z = np.where(np.isfinite(robust_z), robust_z, 0.0)
+        is_outlier = np.abs(deviation) > threshold * board_std[:, None]
+        is_robust_outlier = np.abs(robust_z) > robust_threshold
+
+        board_stats = {}
+        for b, board in enumerate(self.boards):
+            stats = {}
+            for m, name in enumerate(STAT_METRICS):
+                stats[f'{name}_mean'] = float(board_mean[b, m])
+                stats[f'{name}_std'] = float(board_std[b, m])
+                stats[f'{name}_median'] = float(board_median[b, m])
+                stats[f'{name}_mad'] = float(board_mad[b, m])
+            board_stats[board] = stats
+
+        # One row of values per channel, zipped with the key names - this loop runs per channel
+        keys = ([f'{name}_mean' for name in STAT_METRICS] + [f'{name}_robust_z' for name in STAT_METRICS] +
+                [f'is_outlier_{name}' for name in STAT_METRICS] + [f'is_robust_outlier_{name}' for name in STAT_METRICS])
+        rows = zip(means.tolist(), robust_z.tolist(), is_outlier.tolist(), is_robust_outlier.tolist())
+        channel_stats = {}
+        for (board, chs), (means_b, z_b, outlier_b, robust_b) in zip(zip(self.boards, self.channels), rows):
+            for ch, *values in zip(chs, means_b, z_b, outlier_b, robust_b):
+                channel_stats[(board, ch)] = dict(zip(keys, [v for row in values for v in row]))
+        return board_stats, channel_stats
+
+
+class DriftIndex:
+    """
+    Cross-cycle drift of every channel of a MetricCube: per metric the least
+    squares slope over test cycles and the percent change from the first to
+    the last cycle. Channels are ranked once per metric and measure at build
+    time, so worst(metric, k) only reads the first k entries of the ranking.
+
+    Degradation is a falling Pf or a rising Vf or Ith (DEGRADATION_SIGN);
+    channels with fewer than two cycles or a zero first value rank last.
+    """
+
+    def __init__(self, cube):
+        # Flat channel list: (board, channel) of each row of the arrays below
+        self.keys = [(board, ch) for board, chs in zip(cube.boards, cube.channels) for ch in chs]
+        flat = cube.channel_mask
+        values = cube.values[flat]  # (channels, cycles, metrics)
+        valid = cube.cycle_mask[flat]  # (channels, cycles)
+        counts = valid.sum(axis=1)
+
+        x = np.arange(1, values.shape[1] + 1, dtype=np.float64)[None, :, None]
+        w = valid[..., None]
+        n = counts[:, None]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            x_mean = np.where(w, x, 0).sum(axis=1) / n
+            y_mean = np.where(w, values, 0).sum(axis=1) / n
+            dx = np.where(w, x - x_mean[:, None], 0)
+            self.slope = (dx * np.where(w, values - y_mean[:, None], 0)).sum(axis=1) / (dx ** 2).sum(axis=1)
+            first = values[:, 0] if values.shape[1] else np.zeros((0, len(STAT_METRICS)))
+            last = np.take_along_axis(values, np.maximum(counts - 1, 0)[:, None, None], axis=1)[:, 0]
+            self.change = (last - first) / np.abs(first) * 100
+        self.slope[counts < 2] = np.nan
+        self.change[counts < 2] = np.nan
+        self.change[~np.isfinite(self.change)] = np.nan
+
+        sign = np.array([DEGRADATION_SIGN[name] for name in STAT_METRICS])
+        self._order = {}
+        for measure, array in (('change', self.change), ('slope', self.slope)):
+            score = array * sign
+            for m, name in enumerate(STAT_METRICS):
+                # Stable descending sort, NaN last
+                self._order[(name, measure)] = np.argsort(np.where(np.isnan(score[:, m]), np.inf, -score[:, m]),
+                                                          kind='stable')
+
+    def __len__(self):
+        return len(self.keys)
+
+    def entry(self, i):
+        """Drift of flat channel i: {'board', 'channel', 'pfSlope', 'pfChange', ...} (NaN as None)."""
+        board, ch = self.keys[i]
+        entry = {'board': board, 'channel': ch}
+        for m, name in enumerate(STAT_METRICS):
+            slope, change = self.slope[i, m], self.change[i, m]
+            entry[f'{name}Slope'] = None if np.isnan(slope) else float(slope)
+            entry[f'{name}Change'] = None if np.isnan(change) else float(change)
+        return entry
+
+    def worst(self, metric='pf', k=10, by='change'):
+        """The k channels degrading most in metric, ranked by 'change' (percent) or 'slope'."""
+        if metric not in STAT_METRICS:
+            raise ValueError(f"Unknown metric '{metric}', use one of {', '.join(STAT_METRICS)}")
+        if by not in ('change', 'slope'):
+            raise ValueError(f"Unknown drift measure '{by}', use 'change' or 'slope'")
+        return [self.entry(i) for i in self._order[(metric, by)][:k]]
+
+
+def _median_over_channels(values):
+    """
+    NaN-ignoring median over axis 1 of (boards, channels, metrics). Same as
+    np.nanmedian, which loops in Python over small slices; here one sort
+    pushes NaNs (padding) to the end and the middle elements are picked.
+    """
+    ordered = np.sort(values, axis=1)
+    count = (~np.isnan(values)).sum(axis=1, keepdims=True)
+    lower = np.take_along_axis(ordered, np.maximum(count - 1, 0) // 2, axis=1)
+    upper = np.take_along_axis(ordered, count // 2, axis=1) if ordered.shape[1] else lower
+    return np.where(count > 0, (lower + upper) / 2, np.nan)[:, 0]
+
+
+def board_statistics(channels_data, threshold=OUTLIER_SIGMA):
+    """
+    Statistics of one board. channels_data is {ch: {'pf': [...], 'vf': [...], 'ith': [...]}}.
+    Returns (board_stats, channel_stats): {'pf_mean', 'pf_std', 'vf_mean', ...} and
+    {ch: {'is_outlier_pf', 'is_outlier_vf', 'is_outlier_ith', ...}} (see MetricCube.statistics).
+    """
+    if not channels_data:
+        return {}, {}
+    board_stats, channel_stats = MetricCube({None: channels_data}).statistics(threshold)
+    return board_stats[None], {ch: stats for (_, ch), stats in channel_stats.items()}
+
+
+def chart_payload(board, channels_data, test_cycles, board_stats, channel_stats, threshold=OUTLIER_SIGMA):
+    """
+    Compact JSON-ready series of one board for client-side charts (static/charts.js):
+    the test cycles, board mean/std per metric and each channel's values and outlier flags.
+    channel_stats is {ch: flags} as returned by board_statistics.
+    """
+    return {
+        'board': board,
+        'testCycles': list(test_cycles),
+        'sigma': threshold,
+        'stats': {
+            name: {'mean': float(board_stats.get(f'{name}_mean', 0)), 'std': float(board_stats.get(f'{name}_std', 0))}
+            for name in STAT_METRICS
+        },
+        'channels': [
+            dict(
+                {name: [float(v) for v in channels_data[ch][name]] for name in STAT_METRICS},
+                channel=ch,
+                outlier={name: bool(channel_stats.get(ch, {}).get(f'is_outlier_{name}', False))
+                         for name in STAT_METRICS},
+            )
+            for ch in sorted(channels_data)
+        ],
+    }
@@ -0,0 +1,268 @@
+"""
+Compact binary archive of the raw (cur, power, voltage) sweeps of one test cycle folder.
+
+Layout of <folder>/<folder>.tcsweep:
+    8 bytes   magic b'TCSWEEP1'
+    8 bytes   little-endian uint64 length of the JSON header
+    N bytes   JSON header: dtype, total row count, per-file index
+    padding   to a 64-byte boundary (the data offset is derived from N)
+    data      three contiguous columns (cur, power, voltage), each `rows` values long
+
+Each index entry records the CSV name, board, channel, date, its row offset and
+count in the columns, and the CSV size/mtime at ingest time. Readers memory-map
+the columns, so a sweep is a zero-copy view instead of a CSV parse.
+
+Usage: python sweep_archive.py FOLDER [FOLDER ...] [--float32]
+"""
+import os
+import sys
+import json
+import struct
+import threading
+import argparse
+import numpy as np
+from metrics import fit_ith_padded, operating_points_batch, operating_currents, split_operating_points
+
+MAGIC = b'TCSWEEP1'
+ARCHIVE_SUFFIX = '.tcsweep'
+_ALIGN = 64
+
+
+def archive_path_for(folder_path):
+    """Archive file for a test cycle folder: <folder>/<basename>.tcsweep"""
+    folder_path = os.path.normpath(folder_path)
+    return os.path.join(folder_path, os.path.basename(folder_path) + ARCHIVE_SUFFIX)
+
+
+def _data_offset(header_len):
+    """Start of the column data: magic + length + header, rounded up to _ALIGN."""
+    return -(-(len(MAGIC) + 8 + header_len) // _ALIGN) * _ALIGN
+
+
+def _parse_board_channel(csv_name):
+    """Board string and channel number from a CSV name, or (None, None)."""
+    try:
+        board = csv_name.split("_")[0][5:]
+        ch = int((csv_name.split("_")[-1].split(".")[0])[2:])
+        return board, ch
+    except (ValueError, IndexError):
+        return None, None
+
+
+class SweepArchive:
+    """Read-only, memory-mapped view of one .tcsweep file."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"Not a sweep archive: {path}")
+            (header_len,) = struct.unpack('<Q', f.read(8))
+            header = json.loads(f.read(header_len).decode('utf-8'))
+        self.dtype = np.dtype(header['dtype'])
+        self.rows = header['rows']
+        self.files = {entry['name']: entry for entry in header['files']}
+        self._batch = None  # (operating_currents(), {csv_name: batch results})
+        self._batch_lock = threading.Lock()
+        data_offset = _data_offset(header_len)
+        if self.rows:
+            self._columns = np.memmap(path, dtype=self.dtype, mode='r',
+                                      offset=data_offset, shape=(3, self.rows))
+        else:
+            self._columns = np.zeros((3, 0), dtype=self.dtype)
+
+    def sweep(self, csv_name):
+        """Return (cur, power, voltage, date) views for one CSV, or None if not archived."""
+        entry = self.files.get(csv_name)
+        if entry is None:
+            return None
+        start, stop = entry['offset'], entry['offset'] + entry['count']
+        cols = self._columns[:, start:stop]
+        return cols[0], cols[1], cols[2], entry['date']
+
+    def batch_results(self, csv_name):
+        """
+        Ith fit and operating points of one archived sweep. Every sweep in the
+        archive is solved in one vectorized pass on first use (and again after
+        the operating currents change); in 'process' mode this runs in the
+        parent, which passes each worker the results of its files. Returns
+        {'ith': (ith, r2, n), 'points': (vf, pf, extra)} as taken by
+        scan._summarize_sweep.
+        """
+        currents = operating_currents()
+        with self._batch_lock:
+            if self._batch is None or self._batch[0] != currents:
+                names = list(self.files)
+                offsets = np.array([self.files[name]['offset'] for name in names], dtype=np.int64)
+                counts = np.array([self.files[name]['count'] for name in names], dtype=np.int64)
+                width = int(counts.max()) if counts.size else 0
+                steps = np.arange(width)
+                valid = steps < counts[:, None]
+                index = np.where(valid, offsets[:, None] + steps, 0)
+                cur, power, voltage = (self._columns[k][index].astype(np.float64) for k in range(3))
+                fit = fit_ith_padded(cur, power, valid)
+                vf, pf = operating_points_batch(cur, power, voltage, valid, currents)
+                self._batch = (currents, {
+                    name: {
+                        'ith': (float(fit['ith'][i]), float(fit['r2'][i]), int(fit['n'][i])),
+                        'points': split_operating_points(vf[i], pf[i]),
+                    }
+                    for i, name in enumerate(names)
+                })
+            return self._batch[1][csv_name]
+
+    def entries(self):
+        """Index entries sorted by board and channel."""
+        return sorted(self.files.values(), key=lambda e: (str(e['board']), e['ch'] or 0, e['name']))
+
+
+# Open archives: {archive_path: (archive_mtime_ns, SweepArchive or None)}
+_open_archives = {}
+_open_lock = threading.Lock()
+
+
+def open_archive(folder_path):
+    """Return the SweepArchive for a test cycle folder, or None if it has none."""
+    path = archive_path_for(folder_path)
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    with _open_lock:
+        cached = _open_archives.get(path)
+        if cached is not None and cached[0] == mtime_ns:
+            return cached[1]
+        try:
+            archive = SweepArchive(path)
+        except Exception as e:
+            print(f"Error opening sweep archive {path}: {e}")
+            archive = None
+        _open_archives[path] = (mtime_ns, archive)
+        return archive
+
+
+def _archived(csv_path):
+    """(archive, csv name) of an archived, unchanged CSV, or None."""
+    subfolder, csv_name = os.path.split(csv_path)
+    archive = open_archive(os.path.dirname(subfolder))
+    if archive is None:
+        return None
+    entry = archive.files.get(csv_name)
+    if entry is None:
+        return None
+    try:
+        st = os.stat(csv_path)
+        if st.st_size != entry['size'] or st.st_mtime_ns != entry['mtime_ns']:
+            return None
+    except OSError:
+        pass  # CSV removed after ingest - the archive is the only copy
+    return archive, csv_name
+
+
+def lookup_sweep(csv_path):
+    """
+    Return (cur, power, voltage, date, batch) for a CSV path from its folder's
+    archive, or None if there's no archive, the file isn't in it, or the CSV
+    changed since ingest. batch is SweepArchive.batch_results() of the CSV.
+    csv_path is <folder>/<folder>-1/<name>.csv.
+    """
+    archived = _archived(csv_path)
+    if archived is None:
+        return None
+    archive, csv_name = archived
+    return archive.sweep(csv_name) + (archive.batch_results(csv_name),)
+
+
+def lookup_batch(csv_path):
+    """Only the batch of lookup_sweep: SweepArchive.batch_results() of an archived CSV, or None."""
+    archived = _archived(csv_path)
+    if archived is None:
+        return None
+    archive, csv_name = archived
+    return archive.batch_results(csv_name)
+
+
+def lookup_raw_sweep(csv_path):
+    """Like lookup_sweep but only (cur, power, voltage, date): no archive-wide fits are run."""
+    archived = _archived(csv_path)
+    if archived is None:
+        return None
+    archive, csv_name = archived
+    return archive.sweep(csv_name)
+
+
+def build_archive(folder_path, dtype=np.float64):
+    """
+    Convert every <folder>/<folder>-1/*.csv into one archive file.
+    Returns (archive_path, number of files archived).
+    """
+    from scan import _load_sweep_numpy, _load_sweep_python
+
+    folder_path = os.path.normpath(folder_path)
+    subfolder = os.path.join(folder_path, f"{os.path.basename(folder_path)}-1")
+    if not os.path.isdir(subfolder):
+        raise FileNotFoundError(f"Subfolder {subfolder} not found")
+
+    names = sorted(f for f in os.listdir(subfolder) if f.endswith('.csv'))
+    entries, columns, offset = [], [], 0
+    for name in names:
+        csv_path = os.path.join(subfolder, name)
+        st = os.stat(csv_path)
+        # Only the raw sweep: metrics are computed when the archive is read
+        sweep = _load_sweep_numpy(csv_path)
+        if sweep is None:
+            try:
+                sweep = _load_sweep_python(csv_path)
+            except Exception as e:
+                print(f"Warning: not archiving {csv_path}: {e}")
+                continue
+        cur, power, voltage, date = sweep
+        block = np.array([cur, power, voltage], dtype=dtype)
+        board, ch = _parse_board_channel(name)
+        entries.append({
+            'name': name, 'board': board, 'ch': ch, 'date': date,
+            'offset': offset, 'count': block.shape[1],
+            'size': st.st_size, 'mtime_ns': st.st_mtime_ns,
+        })
+        columns.append(block)
+        offset += block.shape[1]
+
+    data = np.concatenate(columns, axis=1) if columns else np.zeros((3, 0), dtype=dtype)
+    header_bytes = json.dumps({'dtype': np.dtype(dtype).str, 'rows': offset, 'files': entries}).encode('utf-8')
+    data_offset = _data_offset(len(header_bytes))
+
+    path = archive_path_for(folder_path)
+    tmp_path = path + '.tmp'
+    # Drop our own memory map of the old archive so it can be replaced (required on Windows)
+    with _open_lock:
+        _open_archives.pop(path, None)
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<Q', len(header_bytes)))
+        f.write(header_bytes)
+        f.write(b'\0' * (data_offset - len(MAGIC) - 8 - len(header_bytes)))
+        f.write(np.ascontiguousarray(data).tobytes())
+    os.replace(tmp_path, path)
+    return path, len(entries)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Ingest test cycle folders into binary sweep archives.')
+    parser.add_argument('folders', nargs='+', help='test cycle folders (each containing <folder>-1/*.csv)')
+    parser.add_argument('--float32', action='store_true', help='store sweeps as float32 instead of float64')
+    args = parser.parse_args(argv)
+
+    dtype = np.float32 if args.float32 else np.float64
+    failed = 0
+    for folder in args.folders:
+        try:
+            path, count = build_archive(folder, dtype=dtype)
+            print(f"{folder}: archived {count} files -> {path}")
+        except Exception as e:
+            failed += 1
+            print(f"{folder}: {e}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,24 @@
+from stats import MetricCube, ROBUST_SIGMA
+
+
+def _board(pf_means):
+    """One board whose channels have these Pf means; Vf and Ith are the same on every channel."""
+    return {'A': {ch: {'pf': [pf, pf], 'vf': [2.0, 2.0], 'ith': [1.0, 1.0]}
+                  for ch, pf in enumerate(pf_means, start=1)}}
+
+
+def test_robust_outlier_when_mad_is_zero():
+    # Most channels share the median exactly, so MAD is 0
+    board_stats, channel_stats = MetricCube(_board([640.0] * 15 + [600.0])).statistics()
+    assert board_stats['A']['pf_mad'] == 0
+    assert channel_stats[('A', 16)]['is_robust_outlier_pf']
+    assert channel_stats[('A', 16)]['pf_robust_z'] < -ROBUST_SIGMA
+    assert not any(channel_stats[('A', ch)]['is_robust_outlier_pf'] for ch in range(1, 16))
+    assert channel_stats[('A', 1)]['pf_robust_z'] == 0
+
+
+def test_identical_channels_are_not_outliers():
+    _, channel_stats = MetricCube(_board([640.0] * 8)).statistics()
+    for stats in channel_stats.values():
+        assert stats['pf_robust_z'] == 0 and stats['vf_robust_z'] == 0
+        assert not stats['is_robust_outlier_pf']
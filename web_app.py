@@ -1,16 +1,44 @@
 import os
-from flask import Flask, render_template, request, jsonify, send_file
-import json
-from scan import collect_data_with_test_cycle
-from plotter import plot_basic
+import time
+import base64
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, render_template, request, jsonify, make_response, url_for
+from scan import iter_channel_summaries, channel_metrics, discover_channel_files
+from metrics_cache import get_metrics_cache
+from stats import MetricCube, DriftIndex, chart_payload
+from channel_index import ChannelIndex, DEFAULT_QUERY_LIMIT
+from plot_render import render_channel_plot, mime_type, EXPORT_FORMATS
 import matplotlib
 matplotlib.use('Agg')  # Use non-interactive backend
-import matplotlib.pyplot as plt
-import io
-import base64
 
 app = Flask(__name__)
 
+# Analyses running at once; further /analyze requests wait in the queue
+ANALYZE_WORKERS = int(os.environ.get('TCA_ANALYZE_WORKERS', '2'))
+
+# Finished jobs are kept this long (seconds) so their results can be fetched
+JOB_TTL = 3600
+
+# Job pool - created once, reused across requests
+_job_executor = None
+
+# {job_id: {'state', 'folders', 'created', 'done', 'total', 'error', 'cancel', 'future',
+#           'channels': {(board, ch): ch_data}, 'test_cycles', 'charts': {board: chart payload}, 'drift', 'index',
+#           'board_stats', 'channel_stats',
+#           'images': {(board, ch, fmt): image bytes}}}
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+
+def _get_job_executor():
+    global _job_executor
+    if _job_executor is None:
+        _job_executor = ThreadPoolExecutor(max_workers=ANALYZE_WORKERS, thread_name_prefix='analyze')
+    return _job_executor
+
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -41,97 +69,215 @@ def list_folders():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
+def _expire_jobs():
+    """Drop finished jobs older than JOB_TTL. Caller holds _jobs_lock."""
+    cutoff = time.time() - JOB_TTL
+    for job_id in [job_id for job_id, job in _jobs.items()
+                   if job['state'] not in ('queued', 'running') and job['created'] < cutoff]:
+        del _jobs[job_id]
+
+
+def _run_analysis(job_id):
+    """Job body: parse every channel of the job's folders. Plots are rendered on request by /plot."""
+    job = _jobs[job_id]
+    if job['cancel'].is_set():
+        job['state'] = 'cancelled'
+        return
+    job['state'] = 'running'
+    try:
+        folders = job['folders']
+        try:
+            board_ch_csv_list = discover_channel_files(folders)
+        except FileNotFoundError as e:
+            job['error'] = str(e)
+            job['state'] = 'failed'
+            return
+
+        test_cycles = list(range(1, len(folders) + 1))
+        tasks = [(board, ch, board_ch_csv_list[board][ch])
+                 for board in sorted(board_ch_csv_list) for ch in sorted(board_ch_csv_list[board])]
+        job['total'] = len(tasks)
+
+        channels = {}
+        for board, ch, temp_summary, error in iter_channel_summaries(tasks, test_cycles, job['cancel']):
+            job['done'] += 1
+            if temp_summary is None:
+                print(f"Warning: Skipping Board {board} Channel {ch}: {error}")
+                continue
+            channels[(board, ch)] = channel_metrics(temp_summary)
+        # Commit this job's new summaries so other processes sharing the cache see them
+        get_metrics_cache().flush()
+
+        if job['cancel'].is_set():
+            job['state'] = 'cancelled'
+            return
+        # Board statistics for the client-side charts
+        boards_data = {}
+        for (board, ch), data in channels.items():
+            boards_data.setdefault(board, {})[ch] = data
+        cube = MetricCube(boards_data)
+        board_stats, channel_stats = cube.statistics()
+        charts = {
+            board: chart_payload(board, board_channels, test_cycles, board_stats[board],
+                                 {ch: channel_stats[(board, ch)] for ch in board_channels})
+            for board, board_channels in sorted(boards_data.items())
+        }
+        job['channels'] = channels
+        job['test_cycles'] = test_cycles
+        job['charts'] = charts
+        job['board_stats'] = board_stats
+        job['channel_stats'] = channel_stats
+        job['drift'] = DriftIndex(cube)
+        job['index'] = ChannelIndex(cube, job['drift'])
+        job['state'] = 'done'
+    except Exception as e:
+        job['error'] = str(e)
+        job['state'] = 'failed'
+
+
+def _job_status(job_id, job):
+    status = {
+        'success': True,
+        'jobId': job_id,
+        'state': job['state'],
+        'done': job['done'],
+        'total': job['total'],
+    }
+    if job['error'] is not None:
+        status['error'] = job['error']
+    return status
+
+
 @app.route('/analyze', methods=['POST'])
 def analyze():
-    """Analyze the selected folders"""
+    """Queue an analysis of the selected folders and return its job id"""
     data = request.json
     folders = data.get('folders', [])
     
-    if len(folders) != 5:
-        return jsonify({'success': False, 'error': 'Need exactly 5 folders'})
+    if not folders:
+        return jsonify({'success': False, 'error': 'Select at least one test cycle folder'})
     
+    job_id = uuid.uuid4().hex
+    with _jobs_lock:
+        _expire_jobs()
+        _jobs[job_id] = {
+            'state': 'queued', 'folders': list(folders), 'created': time.time(),
+            'done': 0, 'total': 0, 'error': None,
+            'cancel': threading.Event(), 'future': None,
+            'channels': {}, 'test_cycles': [], 'charts': {}, 'images': {},
+        }
+        _jobs[job_id]['future'] = _get_job_executor().submit(_run_analysis, job_id)
+    return jsonify({'success': True, 'jobId': job_id, 'state': 'queued'}), 202
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Progress of an analysis job: queued/running/done/failed/cancelled"""
+    job = _jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Unknown job'}), 404
+    return jsonify(_job_status(job_id, job))
+
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    """Plots of a finished analysis job"""
+    job = _jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Unknown job'}), 404
+    if job['state'] == 'failed':
+        return jsonify({'success': False, 'error': job['error']})
+    if job['state'] != 'done':
+        return jsonify(dict(_job_status(job_id, job), success=False, error=f"Job is {job['state']}")), 409
+    plots = [{
+        'board': board,
+        'channel': ch,
+        'url': url_for('plot_image', job_id=job_id, board=board, channel=ch, fmt='png'),
+        'data': ch_data
+    } for (board, ch), ch_data in sorted(job['channels'].items())]
+    return jsonify({'success': True, 'testCycles': job['test_cycles'], 'boards': job['charts'], 'plots': plots})
+
+
+@app.route('/jobs/<job_id>/drift', methods=['GET'])
+def job_drift(job_id):
+    """Channels degrading most over the test cycles: ?metric=pf|vf|ith&by=change|slope&k=20"""
+    job = _jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Unknown job'}), 404
+    if job['state'] != 'done':
+        return jsonify(dict(_job_status(job_id, job), success=False, error=f"Job is {job['state']}")), 409
+    metric = request.args.get('metric', 'pf')
+    by = request.args.get('by', 'change')
     try:
-        ch_csv_list = {}
-        for test_cycle in range(1, 6):
-            folder_path = folders[test_cycle - 1]
-            subfolder = os.path.join(folder_path, f"{os.path.basename(folder_path)}-1")
-            
-            if not os.path.exists(subfolder):
-                return jsonify({
-                    'success': False, 
-                    'error': f'Subfolder {subfolder} not found for Test Cycle {test_cycle}'
-                })
-            
-            csv_files = [f for f in os.listdir(subfolder) if f.endswith('.csv')]
-            if not csv_files:
-                return jsonify({
-                    'success': False,
-                    'error': f'No CSV files found in {subfolder}'
-                })
-            
-            for ch_csv in csv_files:
-                ch = int((ch_csv.split("_")[-1].split(".")[0])[2:])
-                if ch not in ch_csv_list:
-                    ch_csv_list[ch] = [None]
-                ch_csv_list[ch].append(os.path.join(subfolder, ch_csv))
-        
-        # Generate plots for each channel
-        plots = []
-        for ch in ch_csv_list:
-            temp_summary = collect_data_with_test_cycle({i: ch_csv_list[ch][i] for i in range(1, 6)})
-            vf = []
-            pf = []
-            ith = []
-            for test_cycle in range(1, 6):
-                vf.append(temp_summary[test_cycle]["Vf"])
-                pf.append(temp_summary[test_cycle]["Pf"])
-                ith.append(temp_summary[test_cycle]["ith"])
-            
-            # Create plot
-            test_cycles = [1, 2, 3, 4, 5]
-            fig, axs = plt.subplots(3, 1, figsize=(8, 12))
-            
-            axs[0].set_title(f'Pf over Test Cycles - Channel {ch}')
-            axs[0].set_xlabel('Test Cycle')
-            axs[0].set_ylabel('Pf')
-            axs[0].plot(test_cycles, pf, marker='o')
-            
-            axs[1].set_title(f'Vf over Test Cycles - Channel {ch}')
-            axs[1].set_xlabel('Test Cycle')
-            axs[1].set_ylabel('Vf')
-            axs[1].plot(test_cycles, vf, marker='o')
-            
-            axs[2].set_title(f'Ith over Test Cycles - Channel {ch}')
-            axs[2].set_xlabel('Test Cycle')
-            axs[2].set_ylabel('Ith')
-            axs[2].plot(test_cycles, ith, marker='o')
-            
-            plt.tight_layout()
-            
-            # Convert plot to base64 image
-            buffer = io.BytesIO()
-            plt.savefig(buffer, format='png')
-            buffer.seek(0)
-            image_base64 = base64.b64encode(buffer.read()).decode()
-            plt.close(fig)
-            
-            plots.append({
-                'channel': ch,
-                'image': f'data:image/png;base64,{image_base64}',
-                'data': {
-                    'vf': vf,
-                    'pf': pf,
-                    'ith': ith
-                }
-            })
-        
-        return jsonify({
-            'success': True,
-            'plots': plots
-        })
-        
-    except Exception as e:
-        return jsonify({'success': False, 'error': str(e)})
+        channels = job['drift'].worst(metric, request.args.get('k', 20, type=int), by)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return jsonify({'success': True, 'metric': metric, 'by': by, 'channels': channels})
+
+
+@app.route('/jobs/<job_id>/query', methods=['POST'])
+def job_query(job_id):
+    """
+    Channels matching metric predicates, as JSON
+    {"where": [["pf", "<", 600]], "sort": "ith", "descending": true, "limit": 20, "boards": [...]}
+    """
+    job = _jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Unknown job'}), 404
+    if job['state'] != 'done':
+        return jsonify(dict(_job_status(job_id, job), success=False, error=f"Job is {job['state']}")), 409
+    query = request.get_json(silent=True) or {}
+    try:
+        limit = query.get('limit', DEFAULT_QUERY_LIMIT)
+        total, channels = job['index'].query(query.get('where'), query.get('sort'), bool(query.get('descending')),
+                                             None if limit is None else int(limit), query.get('boards'))
+    except (ValueError, TypeError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return jsonify({'success': True, 'total': total, 'channels': channels})
+
+
+@app.route('/plot/<job_id>/<board>/<int:channel>.<fmt>', methods=['GET'])
+def plot_image(job_id, board, channel, fmt):
+    """
+    One channel's plot as .png, .svg or .webp (lossless). Rendered on first request
+    and kept with the job; a job's data never changes, so the ETag is fixed and
+    browsers may reuse the image.
+    """
+    job = _jobs.get(job_id)
+    if job is None or job['state'] != 'done' or (board, channel) not in job['channels'] or fmt not in EXPORT_FORMATS:
+        return jsonify({'success': False, 'error': 'Unknown plot'}), 404
+
+    etag = f'{job_id}-{board}-{channel}-{fmt}'
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+    else:
+        image = job['images'].get((board, channel, fmt))
+        if image is None:
+            # The desktop app's channel plot, so web and desktop images stay the same
+            data_url = render_channel_plot(channel, job['channels'][(board, channel)], job['test_cycles'],
+                                           job['board_stats'][board], job['channel_stats'][(board, channel)],
+                                           fmt=fmt)
+            image = base64.b64decode(data_url.split(',', 1)[1])
+            job['images'][(board, channel, fmt)] = image
+        response = make_response(image)
+        response.mimetype = mime_type(fmt)
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.max_age = JOB_TTL
+    return response
+
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Cancel a queued or running analysis job"""
+    job = _jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Unknown job'}), 404
+    if job['state'] in ('queued', 'running'):
+        job['cancel'].set()
+        if job['future'].cancel():
+            job['state'] = 'cancelled'
+    return jsonify(_job_status(job_id, job))
 
 if __name__ == '__main__':
     app.run(debug=True, port=5000)